@@ -0,0 +1,283 @@
+import gzip
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from config import ARCHIVE_DIR, ARCHIVE_AFTER_DAYS, ARCHIVE_INDEX_CACHE
+from database import load_db, remove_record, list_by_status, ensure_seq
+from executors import get_pool
+
+# =========================
+# ARSIP DATA SETTLED (HOT / COLD)
+# =========================
+# Topup / withdraw yang sudah approved / rejected, order buy yang sudah
+# confirmed / failed / refunded dan record _used_tx yang lebih tua dari
+# ARCHIVE_AFTER_DAYS dipindah dari DB ke segment:
+#   archive/topups-2026-02.jsonl.gz   (append-only, 1 gzip member per run)
+#   archive/topups-2026-02.idx.jsonl  (id → offset member gzip, per segment)
+# archive/index.jsonl hanya katalog segment + rentang id per run (kecil,
+# dibaca sekali). Index per segment dibaca saat dicari saja dan yang
+# disimpan di memory maksimal ARCHIVE_INDEX_CACHE segment (lihat lookup),
+# jadi memory tidak tumbuh dengan total volume arsip.
+# Hash _used_tx tetap ada di index dedupe, jadi anti double sell aman.
+
+# status final per tabel (order "sent" / "stuck" / escrow "holding" tetap di DB)
+SETTLED_STATUS = {
+    "topups": ("approved", "rejected"),
+    "withdraws": ("approved", "rejected"),
+    "orders": ("confirmed", "failed", "refunded"),
+}
+INDEX_FILE = "index.jsonl"
+
+# nama pendek untuk command admin
+TABLE_ALIASES = {
+    "topup": "topups",
+    "withdraw": "withdraws",
+    "wd": "withdraws",
+    "order": "orders",
+    "buy": "orders",
+    "tx": "_used_tx",
+}
+
+
+def _settled_at(rec):
+    ts = (
+        rec.get("approved_at")
+        or rec.get("rejected_at")
+        or rec.get("confirmed_at")
+        or rec.get("failed_at")
+        or rec.get("refunded_at")
+        or rec.get("time")
+        or rec.get("created")
+    )
+    try:
+        return datetime.fromisoformat(ts)
+    except (TypeError, ValueError):
+        return None
+
+
+def collect(db, cutoff):
+    """
+    Pilih record settled yang lebih tua dari cutoff.
+    Return {(table, "YYYY-MM"): [(id, record), ...]}
+    """
+    segments = {}
+
+    candidates = []
+    for table, statuses in SETTLED_STATUS.items():
+        for status in statuses:
+            candidates += [(table, k, rec) for k, rec in list_by_status(db, table, status)]
+    candidates += [("_used_tx", k, rec) for k, rec in db["_used_tx"].items()]
+
+    for table, key, rec in candidates:
+        if table == "orders" and rec.get("type") != "buy":
+            continue
+        settled = _settled_at(rec)
+        if settled is None or settled >= cutoff:
+            continue
+        segments.setdefault((table, settled.strftime("%Y-%m")), []).append((key, rec))
+
+    return segments
+
+
+def _segment_name(table, month):
+    return f"{table.lstrip('_')}-{month}.jsonl.gz"
+
+
+def _index_name(segment):
+    return segment.replace(".jsonl.gz", ".idx.jsonl")
+
+
+def _id_range(keys):
+    """
+    (terkecil, terbesar) untuk id angka; None kalau bukan angka (hash tx)
+    """
+    if not all(str(k).isdigit() for k in keys):
+        return None, None
+    ids = [int(k) for k in keys]
+    return min(ids), max(ids)
+
+
+def _append_lines(path, lines):
+    with open(path, "a") as f:
+        f.writelines(lines)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def write_segments(segments):
+    """
+    Tulis segment + index ke disk (jalan di thread, bukan di event loop)
+    """
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+
+    catalog = []
+
+    for (table, month), rows in segments.items():
+        name = _segment_name(table, month)
+        with open(os.path.join(ARCHIVE_DIR, name), "ab") as raw:
+            # 1 run = 1 member gzip baru, offset awalnya dicatat di index segment
+            offset = raw.tell()
+            with gzip.GzipFile(fileobj=raw, mode="ab") as f:
+                for key, rec in rows:
+                    f.write(json.dumps({"id": key, "v": rec}, separators=(",", ":")).encode() + b"\n")
+            raw.flush()
+            os.fsync(raw.fileno())
+
+        keys = [str(key) for key, _ in rows]
+        lo, hi = _id_range(keys)
+        catalog.append({"t": table, "seg": name, "lo": lo, "hi": hi})
+
+        # lock: lookup tidak membaca index segment yang sedang ditulis
+        with _index_lock:
+            _append_lines(
+                os.path.join(ARCHIVE_DIR, _index_name(name)),
+                [json.dumps({"id": key, "off": offset}) + "\n" for key in keys]
+            )
+            cached = _seg_cache.get(name)
+            if cached is not None:
+                cached.update((key, offset) for key in keys)
+
+    _append_lines(os.path.join(ARCHIVE_DIR, INDEX_FILE), [json.dumps(e) + "\n" for e in catalog])
+
+    with _index_lock:
+        if _catalog is not None:
+            for e in catalog:
+                _catalog_add(_catalog, e)
+
+
+async def run_archive(max_age_days=ARCHIVE_AFTER_DAYS):
+    """
+    Pindahkan record settled ke arsip. Return jumlah record yang dipindah.
+    """
+    db = load_db()
+    cutoff = datetime.now() - timedelta(days=max_age_days)
+    segments = collect(db, cutoff)
+    if not segments:
+        return 0
+
+    # tulis dulu ke arsip (durable), baru hapus dari DB
+    await get_pool("disk").run(write_segments, segments)
+
+    for table in SETTLED_STATUS:
+        ensure_seq(db, table)
+
+    moved = 0
+    for (table, _), rows in segments.items():
+        for key, _ in rows:
+            if remove_record(db, table, key) is not None:
+                moved += 1
+    return moved
+
+
+async def archive_job(context):
+    moved = await run_archive()
+    if moved:
+        print(f"📦 {moved} record settled dipindah ke arsip")
+
+
+# =========================
+# LOOKUP ARSIP
+# =========================
+_catalog = None   # table → {segment: [id terkecil, id terbesar, format lama?]}
+_seg_cache = OrderedDict()   # segment → {id: offset member gzip} (LRU)
+_index_lock = threading.Lock()
+
+
+def _catalog_add(catalog, e):
+    # baris format lama (1 baris per record, tanpa rentang) → segment
+    # dibaca dari awal kalau id tidak ada di index segment
+    legacy = "id" in e
+    lo, hi = e.get("lo"), e.get("hi")
+    span = catalog.setdefault(e["t"], {}).get(e["seg"])
+    if span is None:
+        catalog[e["t"]][e["seg"]] = [lo, hi, legacy]
+        return
+    if span[0] is None or lo is None:
+        span[0] = span[1] = None
+    else:
+        span[0], span[1] = min(span[0], lo), max(span[1], hi)
+    span[2] = span[2] or legacy
+
+
+def _load_catalog():
+    """
+    Baca katalog index.jsonl sekali, setelah itu dijaga write_segments.
+    Baris format lama (1 baris per record) hanya dipakai untuk tahu segmentnya.
+    """
+    global _catalog
+    with _index_lock:
+        if _catalog is None:
+            catalog = {}
+            try:
+                with open(os.path.join(ARCHIVE_DIR, INDEX_FILE), "r") as f:
+                    for line in f:
+                        _catalog_add(catalog, json.loads(line))
+            except FileNotFoundError:
+                pass
+            _catalog = catalog
+        return _catalog
+
+
+def _segment_index(segment):
+    """
+    {id: offset} satu segment, dibaca dari disk saat dibutuhkan (LRU).
+    None kalau segment belum punya index (arsip format lama).
+    """
+    with _index_lock:
+        index = _seg_cache.get(segment)
+        if index is not None:
+            _seg_cache.move_to_end(segment)
+            return index
+
+        index = {}
+        try:
+            with open(os.path.join(ARCHIVE_DIR, _index_name(segment)), "r") as f:
+                for line in f:
+                    e = json.loads(line)
+                    index[e["id"]] = e["off"]
+        except FileNotFoundError:
+            return None
+
+        _seg_cache[segment] = index
+        while len(_seg_cache) > ARCHIVE_INDEX_CACHE:
+            _seg_cache.popitem(last=False)
+    return index
+
+
+def _read_member(segment, offset, record_id):
+    with open(os.path.join(ARCHIVE_DIR, segment), "rb") as raw:
+        raw.seek(offset)
+        with gzip.GzipFile(fileobj=raw, mode="rb") as f:
+            for line in f:
+                row = json.loads(line)
+                if row["id"] == record_id:
+                    return row["v"]
+    return None
+
+
+def lookup(table, record_id):
+    """
+    Cari record di arsip: katalog → segment yang rentang id-nya cocok
+    (terbaru dulu) → index segment → buka 1 member gzip saja
+    """
+    table = TABLE_ALIASES.get(table, table)
+    record_id = str(record_id)
+    numeric = int(record_id) if record_id.isdigit() else None
+
+    segments = sorted(_load_catalog().get(table, {}).items(), reverse=True)
+    for segment, (lo, hi, legacy) in segments:
+        if numeric is not None and lo is not None and not lo <= numeric <= hi:
+            continue
+
+        index = _segment_index(segment)
+        if index is not None and record_id in index:
+            found = _read_member(segment, index[record_id], record_id)
+        elif index is None or legacy:
+            found = _read_member(segment, 0, record_id)   # format lama: baca dari awal
+        else:
+            continue
+        if found is not None:
+            return found
+    return None
@@ -1,14 +1,76 @@
+import asyncio
 from telegram.ext import ApplicationBuilder
-from config import BOT_TOKEN
+from config import (
+    BOT_TOKEN,
+    CONCURRENT_UPDATES,
+    ARCHIVE_INTERVAL,
+    PRICE_REFRESH_INTERVAL,
+    PRICE_HISTORY_SAVE_INTERVAL
+)
 from handlers import register
-from database import load_db, save_db
+from database import init_db, flush_db, flush_loop
+from archive import archive_job
+from pricing import start_price_refresher, price_history_save_job
+from price_history import price_history
+from http_client import http
+from fee_oracle import start_fee_oracle
+from liquidity import start_liquidity_refresher
+from deposits import start_deposit_watcher
+from receipts import receipts
+from wallet import warm_up
+from chain import chain
+from executors import get_pool, shutdown_all
+
+
+# =========================
+# LIFECYCLE
+# =========================
+async def on_start(app):
+    warm_up()
+    app.bot_data["db_flusher"] = asyncio.create_task(flush_loop())
+    app.job_queue.run_repeating(archive_job, interval=ARCHIVE_INTERVAL, first=300)
+    start_price_refresher(app, PRICE_REFRESH_INTERVAL)
+    start_fee_oracle(app)
+    start_liquidity_refresher(app)
+    start_deposit_watcher(app)
+    receipts.start(app)
+    app.job_queue.run_repeating(
+        price_history_save_job,
+        interval=PRICE_HISTORY_SAVE_INTERVAL,
+        first=PRICE_HISTORY_SAVE_INTERVAL
+    )
+
+
+async def on_stop(app):
+    task = app.bot_data.pop("db_flusher", None)
+    if task:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    # flush terakhir sebelum proses keluar
+    await flush_db()
+    await get_pool("disk").run(price_history.save)
+    await http.close()
+    await chain.close()
+    shutdown_all()
+
 
 def main():
-    # pastikan database siap saat bot start
-    db = load_db()
-    save_db(db)
+    # load database sekali, semua handler baca dari memory
+    init_db()
+    price_history.load()
 
-    app = ApplicationBuilder().token(BOT_TOKEN).build()
+    app = (
+        ApplicationBuilder()
+        .token(BOT_TOKEN)
+        .concurrent_updates(CONCURRENT_UPDATES)
+        .post_init(on_start)
+        .post_shutdown(on_stop)
+        .build()
+    )
     register(app)
 
     print("🤖 Bot running...")
@@ -12,11 +12,16 @@ from config import (
     BUY_FEE_PERCENT,
     BUY_FEE_MIN,
     RPC_ARB,
-    RPC_BY_NETWORK,
-    get_realtime_price
+    get_realtime_price_async
 )
-from database import load_db, save_db, get_user
-from wallet import send_token, get_hot_wallet_token_balance
+from database import load_db, save_db, get_user, add_balance, deduct_balance, create_buy_order
+from payouts import payouts
+from receipts import receipts
+from liquidity import liquidity, refresh_balance
+from executors import rpc_executor, PoolBusy, BUSY_MESSAGE
+from nonce import BroadcastUnknown
+from locks import per_user
+from pricing import price_note, get_trade_price, PriceUnavailable, PRICE_UNAVAILABLE_MESSAGE
 from states import (
     BUY_TOKEN, BUY_NETWORK, BUY_AMOUNT, BUY_WALLET, BUY_CONFIRM
 )
@@ -47,8 +52,9 @@ async def buy(update, context):
     ]
 
     try:
-        rates = get_realtime_price()
+        rates = await get_realtime_price_async()
         rate_text = "\n".join([f"{t}: Rp {int(rates.get(t,0)):,}" for t in CRYPTO_LIST])
+        rate_text += price_note(list(CRYPTO_LIST))
     except Exception:
         rate_text = "⚠️ Gagal fetch harga realtime"
 
@@ -182,29 +188,34 @@ async def buy_amount(update, context):
     network = context.user_data["network"]
 
     try:
-        rates = get_realtime_price()
+        rates = await get_realtime_price_async()
         rate = rates.get(token, 0)
         token_amount = amount / rate if rate > 0 else 0
     except:
         token_amount = 0
 
-    try:
-        token_data = TOKEN_CONTRACTS[token][network]
-    except KeyError:
+    if network not in TOKEN_CONTRACTS.get(token, {}):
         await update.message.reply_text("❌ Data token/network tidak ditemukan.")
         context.user_data.clear()
         return
 
-    from wallet import get_hot_wallet_token_balance
-    hot_balance = get_hot_wallet_token_balance(
-        token_data["address"],
-        token_data["decimals"],
-        rpc=ARB_RPC if network == "ARB_TEST" else None
-    )
-
+    # saldo hot wallet dari cache liquidity (RPC hanya kalau belum pernah dibaca)
+    if liquidity.balance(network, token) is None:
+        try:
+            await refresh_balance(network, token)
+        except PoolBusy:
+            await update.message.reply_text(BUSY_MESSAGE)
+            return
+        except Exception as e:
+            print("⚠️ Error cek saldo hot wallet:", e)
+            await update.message.reply_text("❌ Gagal cek saldo hot wallet, coba lagi.")
+            return
+
+    # reservasi: buy lain yang belum terkirim ikut dihitung
+    reserved, hot_balance = liquidity.reserve(network, token, token_amount, uid)
 
     # 🔴 JIKA HOT WALLET TIDAK CUKUP
-    if token_amount > hot_balance:
+    if not reserved:
         await update.message.reply_text(
             "⚠️ *Likuiditas Hot Wallet Tidak Mencukupi*\n\n"
             f"Permintaan estimasi : *{token_amount:.6f} {token}*\n"
@@ -252,12 +263,14 @@ async def buy_wallet(update, context):
 # =========================
 # CONFIRM & EXECUTE
 # =========================
+@per_user
 async def buy_confirm(update, context):
     if context.user_data.get("state") != BUY_CONFIRM:
         return
 
     if update.message.text.upper() != "YA":
         await update.message.reply_text("❌ Transaksi dibatalkan")
+        liquidity.release_all(str(update.effective_user.id))
         context.user_data.clear()
         return
 
@@ -284,68 +297,123 @@ async def buy_confirm(update, context):
     # =========================
     if user["balance"] < amount_rp:
         await update.message.reply_text("❌ Saldo tidak cukup")
+        liquidity.release(network, token, uid)
         context.user_data.clear()
         return
 
-  # =========================
-    # POTONG SALDO (LOCK)
-    # =========================
-    user["balance"] -= amount_rp
-    save_db(db)
+    # RPC network penuh → tolak sebelum saldo dipotong
+    if rpc_executor(network).busy():
+        await update.message.reply_text(BUSY_MESSAGE)
+        return
 
     # =========================
     # HITUNG TOKEN (PAKAI NET)
     # =========================
+    # harga dulu, baru potong saldo: harga basi / 0 → batal tanpa sentuh saldo
     try:
-        rates = get_realtime_price()
-        rate = rates.get(token, 0)
-        token_amount = net_amount / rate if rate > 0 else 0
-    except Exception:
+        token_amount = net_amount / await get_trade_price(token)
+    except PriceUnavailable:
         token_amount = 0
 
+    if token_amount <= 0:
+        await update.message.reply_text(PRICE_UNAVAILABLE_MESSAGE)
+        liquidity.release(network, token, uid)
+        context.user_data.clear()
+        return
+
+  # =========================
+    # POTONG SALDO (LOCK)
+    # =========================
+    deduct_balance(db, uid, amount_rp, reason="buy", ref=f"buy:{token}:{network}:{wallet_to}")
+    save_db(db)
+
+    # perbarui reservasi dengan jumlah final (harga bisa bergeser sejak quote)
+    reserved, hot_balance = liquidity.reserve(network, token, token_amount, uid)
+    if not reserved:
+        add_balance(db, uid, amount_rp, reason="buy_rollback")
+        save_db(db)
+        liquidity.release(network, token, uid)
+        await update.message.reply_text(
+            "⚠️ Likuiditas hot wallet tidak mencukupi\n"
+            f"Saldo tersedia: {hot_balance:.6f} {token}"
+        )
+        context.user_data.clear()
+        return
+
     try:
         token_data = TOKEN_CONTRACTS[token][network]
     except KeyError:
         await update.message.reply_text("❌ Data token/network tidak ditemukan")
-        user["balance"] += amount_rp  # rollback
+        add_balance(db, uid, amount_rp, reason="buy_rollback")  # rollback
         save_db(db)
+        liquidity.release(network, token, uid)
         context.user_data.clear()
         return
 
     try:
-        tx_hash = send_token(
+        # dikumpulkan sebentar lalu dibayar 1 tx disperse bersama buy lain
+        # (order besar / network tanpa kontrak disperse → transfer langsung)
+        payout = await payouts.pay(
             token_address=token_data["address"],
             to=wallet_to,
             amount=token_amount,
             decimals=token_data["decimals"],
-            rpc=RPC_BY_NETWORK.get(network)
+            network=network,
+            ref=f"buy:{uid}:{token}:{network}:{wallet_to}",
+            amount_rp=amount_rp
         )
+        tx_hash = payout["tx_hash"]
+        uncertain = False
 
+    except BroadcastUnknown as e:
+        # timeout / koneksi putus saat kirim: tx mungkin sudah di mempool →
+        # JANGAN rollback, order tetap "sent" dan diputuskan oleh receipt
+        print(f"⚠️ Payout buy {uid} belum pasti terkirim:", e)
+        payout = {"tx_hash": e.tx_hash, "nonce": e.nonce, "batched": e.batched, "index": e.index}
+        tx_hash = e.tx_hash
+        uncertain = True
 
     except Exception as e:
         # =========================
         # ROLLBACK
         # =========================
-        user["balance"] += amount_rp
+        add_balance(db, uid, amount_rp, reason="buy_rollback")
         save_db(db)
+        liquidity.release(network, token, uid)
         await update.message.reply_text(f"❌ Transaksi gagal\n{str(e)}")
         context.user_data.clear()
         return
 
     context.user_data.clear()
 
+    # =========================
+    # CATAT ORDER + LACAK RECEIPT
+    # =========================
+    # hash sudah ada tapi belum tentu masuk blok; receipts yang
+    # mengabari user setelah konfirmasi (atau refund kalau revert)
+    oid = create_buy_order(
+        db, uid, token, network, wallet_to, token_amount, amount_rp, tx_hash,
+        batched=payout["batched"], index=payout["index"], nonce=payout.get("nonce")
+    )
+    save_db(db)
+    liquidity.spent(network, token, token_amount, oid, owner=uid)
+    receipts.track(network, tx_hash, oid)
+
     # =========================
     # OUTPUT USER
     # =========================
     await update.message.reply_text(
-        "✅ *BELI BERHASIL*\n\n"
+        ("⏳ *BELI DIPROSES*\n\n" if uncertain else "⏳ *BELI DIKIRIM*\n\n")
+        + f"Order        : #{oid}\n"
         f"Token        : {token}\n"
         f"Jumlah       : {token_amount:.6f}\n"
         f"Network      : {network}\n"
         f"Nominal      : Rp {amount_rp:,}\n"
         f"Fee admin    : Rp {fee:,}\n"
         f"Nilai beli   : Rp {net_amount:,}\n\n"
-        f"TX Hash:\n`{tx_hash}`",
+        f"TX Hash:\n`{tx_hash}`\n\n"
+        + ("Koneksi RPC terputus saat mengirim, status TX dicek otomatis.\n" if uncertain else "")
+        + "Menunggu konfirmasi blok, notifikasi menyusul.",
         parse_mode="Markdown"
     )
 
@@ -356,6 +424,7 @@ async def buy_confirm(update, context):
         await context.bot.send_message(
             TRANSACTION_CHANNEL_ID,
             "💰 *BUY*\n"
+            f"Order : #{oid}\n"
             f"User : `{uid}`\n"
             f"Nominal : Rp {amount_rp:,}\n"
             f"Fee     : Rp {fee:,}\n"
@@ -0,0 +1,133 @@
+from web3 import Web3
+from config import BOT_WALLET
+from rpc_pool import web3_pool
+from wallet import resolve_rpc, build_transfer, sign, checksum, token_contract
+from nonce import nonces, is_nonce_error, is_rejected, BroadcastUnknown
+from fee_oracle import fee_oracle
+from executors import rpc_executor
+
+# =========================
+# CHAIN CLIENT ASYNC
+# =========================
+# Versi async dari wallet.py (AsyncWeb3 + AsyncHTTPProvider), dipakai
+# langsung dari handler Telegram: selama payout / verifikasi satu user
+# menunggu RPC, event loop tetap melayani user lain.
+# Client (AsyncWeb3 + aiohttp.ClientSession per URL) diambil dari rpc_pool,
+# jadi health-nya tampil di /rpc dan dibuat ulang setelah gagal / reset.
+# nonce dan fee dibagi dengan versi sync (nonce.py, fee_oracle.py), tx
+# dibangun + ditandatangani oleh engine yang sama (wallet.build_transfer / sign).
+# Jumlah request bersamaan per network dibatasi pool rpc:<network>
+# (executors.py), kalau penuh → PoolBusy.
+# Kirim tx return {"tx_hash", "nonce"}; nonce disimpan di order supaya
+# payout yang macet bisa dicek aman sebelum di-refund (receipts.py).
+
+
+class AsyncChain:
+    async def w3(self, network=None, rpc=None):
+        return await web3_pool.get_async(*resolve_rpc(network, rpc))
+
+    def _limit(self, network=None, rpc=None):
+        return rpc_executor(resolve_rpc(network, rpc)[1]).slot()
+
+    async def batch(self, calls, network=None, rpc=None):
+        """
+        Beberapa call JSON-RPC dalam 1 request (lihat Web3Pool.batch_async)
+        """
+        url, network = resolve_rpc(network, rpc)
+        async with self._limit(network, rpc):
+            return await web3_pool.batch_async(url, calls, network)
+
+    async def close(self):
+        await web3_pool.close_async()
+
+    # =========================
+    # SEND TOKEN / NATIVE
+    # =========================
+    async def _send_with_nonce(self, w3, network, rpc, build_tx):
+        """
+        build_tx(nonce, chain_id, gas_params) → tx dict, lalu sign + kirim.
+        Return {"tx_hash", "nonce"}; raise BroadcastUnknown kalau hasil kirim
+        tidak pasti (tx mungkin sudah di mempool).
+        """
+        async with self._limit(network, rpc):
+            nonce = await nonces.allocate_async(w3)
+            try:
+                chain_id = await fee_oracle.chain_id_async(w3)
+                gas_params = await fee_oracle.params_async(w3)
+                raw = sign(await build_tx(nonce, chain_id, gas_params))
+            except Exception:
+                # belum dikirim sama sekali → nonce dipakai kirim berikutnya
+                nonces.release(w3, nonce)
+                raise
+
+            # hash dihitung sendiri, jadi tetap diketahui walau jawaban node hilang
+            tx_hash = Web3.to_hex(Web3.keccak(raw))
+            try:
+                await w3.eth.send_raw_transaction(raw)
+            except Exception as e:
+                if is_nonce_error(e):
+                    await nonces.resync_async(w3)
+                    raise
+                if is_rejected(e):
+                    # ditolak node → tidak masuk mempool
+                    nonces.release(w3, nonce)
+                    raise
+                # timeout / koneksi putus: tx mungkin sudah tersiar, nonce
+                # jangan dipakai ulang begitu saja → ikut hitungan "pending"
+                try:
+                    await nonces.resync_async(w3)
+                except Exception:
+                    nonces.forget(w3)
+                raise BroadcastUnknown(tx_hash, nonce, e) from e
+
+            return {"tx_hash": tx_hash, "nonce": nonce}
+
+    async def send_token(self, token_address, to, amount, decimals, network=None, rpc=None):
+        w3 = await self.w3(network, rpc)
+
+        async def build_tx(nonce, chain_id, gas_params):
+            return build_transfer(token_address, to, amount, decimals, nonce, chain_id, gas_params)
+
+        return await self._send_with_nonce(w3, network, rpc, build_tx)
+
+    async def send_call(self, make_call, gas, value=0, network=None, rpc=None):
+        """
+        Kirim tx ke fungsi kontrak. make_call(w3) → ContractFunction
+        """
+        w3 = await self.w3(network, rpc)
+
+        async def build_tx(nonce, chain_id, gas_params):
+            return await make_call(w3).build_transaction({
+                "from": BOT_WALLET,
+                "value": value,
+                "nonce": nonce,
+                "gas": gas,
+                "chainId": chain_id,
+                **gas_params
+            })
+
+        return await self._send_with_nonce(w3, network, rpc, build_tx)
+
+    async def call(self, make_call, network=None, rpc=None):
+        """
+        eth_call read-only. make_call(w3) → ContractFunction
+        """
+        w3 = await self.w3(network, rpc)
+        async with self._limit(network, rpc):
+            return await make_call(w3).call()
+
+    # =========================
+    # HOT WALLET BALANCE
+    # =========================
+    async def get_hot_wallet_token_balance(self, token_address, decimals, network=None, rpc=None):
+        w3 = await self.w3(network, rpc)
+
+        async with self._limit(network, rpc):
+            if token_address is None:
+                return Web3.from_wei(await w3.eth.get_balance(BOT_WALLET), "ether")
+
+            raw = await token_contract(w3, token_address).functions.balanceOf(checksum(BOT_WALLET)).call()
+            return raw / (10 ** decimals)
+
+
+chain = AsyncChain()
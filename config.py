@@ -1,6 +1,5 @@
 import os
 from dotenv import load_dotenv
-import requests
 
 load_dotenv()
 
@@ -20,6 +19,9 @@ ADMIN_IDS = list(
     )
 )
 
+# jumlah update yang diproses paralel (lock per user di locks.py)
+CONCURRENT_UPDATES = int(os.getenv("CONCURRENT_UPDATES", "64"))
+
 TRANSACTION_CHANNEL_ID = int(                                                                                                                               os.getenv("TRANSACTION_CHANNEL_ID", "-1003747216192")
 )
 
@@ -27,7 +29,32 @@ TRANSACTION_CHANNEL_ID = int(
 # =========================
 # DATABASE
 # =========================
-DB_FILE = "db.json"
+DB_FILE = "db.json"                 # snapshot
+DB_JOURNAL_FILE = "db.journal"      # append-only journal
+DB_GROUP_COMMIT_MS = 5              # write dalam window ini berbagi 1 fsync
+DB_COMPACT_EVERY = 5000             # compact journal → snapshot tiap N record
+DB_FLUSH_INTERVAL = 1.0             # detik, write-behind DB resident ke disk
+
+# ledger saldo per user (ledger/<uid>.log) + snapshot tiap N entry
+LEDGER_DIR = "ledger"
+LEDGER_SNAPSHOT_EVERY = 100
+
+# index tx hash yang sudah dipakai sell (Bloom + file hash biner)
+DEDUPE_DIR = "dedupe"
+DEDUPE_CAPACITY = 5_000_000     # ukuran Bloom, ±9 MB di memory
+DEDUPE_FP_RATE = 0.001
+DEDUPE_BUCKET_CACHE = 32         # bucket (set hash) yang disimpan di memory untuk cek positif Bloom
+
+# arsip topup / withdraw / sell yang sudah settled
+ARCHIVE_DIR = "archive"
+ARCHIVE_AFTER_DAYS = 30
+ARCHIVE_INTERVAL = 6 * 3600     # detik, jadwal job arsip
+ARCHIVE_INDEX_CACHE = 4         # index segment (id → offset) yang disimpan di memory
+
+# "journal" (db.json + db.journal) atau "sqlite" (WAL, tabel ber-index)
+# migrasi: python sqlite_store.py db.json db.sqlite3
+DB_BACKEND = os.getenv("DB_BACKEND", "journal")
+DB_SQLITE_FILE = os.getenv("DB_SQLITE_FILE", "db.sqlite3")
 
 # =========================
 # WALLET / BLOCKCHAIN
@@ -46,6 +73,84 @@ RPC_BY_NETWORK = {
 }
 
 
+# pool koneksi Web3 (lihat rpc_pool.py)
+RPC_POOL_SIZE = int(os.getenv("RPC_POOL_SIZE", "10"))   # koneksi HTTP per RPC
+RPC_POOL_SIZES = {
+    "BEP20": RPC_POOL_SIZE,
+    "ARB": 5
+}
+RPC_TIMEOUT = float(os.getenv("RPC_TIMEOUT", "10"))
+RPC_MAX_FAILURES = 3   # gagal berturut-turut → client dibuat ulang
+
+# thread pool per resource (lihat executors.py): nama → (worker, antrian maks)
+EXECUTOR_POOLS = {
+    "rpc": (8, 32),      # per network: rpc:BEP20, rpc:ARB
+    "disk": (2, 64),
+    "price": (1, 2),
+}
+EXECUTOR_DEFAULT = (4, 16)
+
+# payout batch via kontrak disperse (lihat payouts.py), kosong = transfer biasa
+DISPERSE_CONTRACTS = {
+    "BEP20": os.getenv("DISPERSE_BEP20"),
+    "ARB": os.getenv("DISPERSE_ARB")
+}
+PAYOUT_BATCH_WINDOW = float(os.getenv("PAYOUT_BATCH_WINDOW", "3"))   # detik kumpulkan payout
+PAYOUT_BATCH_MAX = 50                                              # penerima maks per tx
+PAYOUT_DIRECT_MIN_RP = int(os.getenv("PAYOUT_DIRECT_MIN_RP", "5000000"))  # order >= ini langsung dikirim
+
+# Multicall3 (lihat treasury.py), alamat sama di hampir semua chain
+MULTICALL3_CONTRACTS = {
+    "default": os.getenv("MULTICALL3_ADDRESS", "0xcA11bde05977b3631167028862bE2a173976CA11"),
+}
+
+# likuiditas hot wallet (lihat liquidity.py)
+LIQUIDITY_REFRESH_INTERVAL = float(os.getenv("LIQUIDITY_REFRESH_INTERVAL", "30"))  # detik
+LIQUIDITY_RESERVE_TTL = 600   # detik, reservasi buy yang tidak dikonfirmasi dilepas
+
+# fee oracle (lihat fee_oracle.py)
+FEE_POLL_INTERVAL = float(os.getenv("FEE_POLL_INTERVAL", "6"))  # detik
+FEE_HISTORY_BLOCKS = 20          # jumlah blok terakhir yang disimpan
+FEE_MAX_AGE = 60                 # detik, data lebih lama → fetch ulang saat kirim
+FEE_PRIORITY_PERCENTILE = 50     # 25 / 50 / 75
+FEE_DEFAULT_PRIORITY_GWEI = 2
+
+# deposit watcher / auto sell (lihat deposits.py)
+DEPOSIT_POLL_INTERVAL = float(os.getenv("DEPOSIT_POLL_INTERVAL", "15"))  # detik
+DEPOSIT_CONFIRMATIONS = {        # blok, transfer baru dikredit setelah sedalam ini
+    "BEP20": 15,
+    "ARB": 20,
+    "default": 12,
+}
+DEPOSIT_BLOCK_RANGE = 2000       # blok maks per eth_getLogs
+DEPOSIT_NATIVE_RANGE = 20        # blok maks per batch eth_getBlockByNumber (native)
+DEPOSIT_MAX_RANGES = 5           # range maks per network per putaran (kejar ketinggalan)
+DEPOSIT_LOOKBACK = {             # blok maks di belakang head yang masih discan (cursor tidak lompat)
+    "BEP20": 1200,
+    "ARB": 2400,
+    "default": 600,
+}
+DEPOSIT_TAG_DECIMALS = {         # kode unik sell ditaruh di digit desimal ke-N (maks 9999 x 10^-N)
+    "USDT": 6,
+    "ETH": 9,
+    "default": 8,
+}
+DEPOSIT_CURSOR_FILE = "deposit_cursor.json"
+DEPOSIT_INTENTS_FILE = "deposit_intents.json"   # intent sell + kode unik (tahan restart)
+SELL_INTENT_TTL = 7200           # detik, intent sell tanpa transfer dibuang
+
+# receipt tracker payout buy (lihat receipts.py)
+BLOCK_TIMES = {                  # detik per blok, dasar interval polling receipt
+    "BEP20": 3,
+    "ARB": 0.25,
+    "default": 3,
+}
+RECEIPT_MIN_INTERVAL = 1         # detik, polling tidak lebih cepat dari ini
+RECEIPT_MAX_BACKOFF = 8          # interval maks = dasar x ini kalau belum ada receipt
+RECEIPT_BATCH_MAX = 100          # hash per request batch JSON-RPC
+RECEIPT_TIMEOUT = 1800           # detik tanpa receipt → order ditandai "stuck"
+
+
 # =========================
 # BACKWARD COMPATIBILITY
 # =========================
@@ -104,12 +209,64 @@ COINGECKO_IDS = {
     # bisa ditambahkan token lain: "BTC": "bitcoin", "ETH": "ethereum"
 }
 
+# sumber harga (lihat price_sources.py), urutan = prioritas
+PRICE_SOURCES = os.getenv("PRICE_SOURCES", "coingecko,indodax,coinbase,cmc")
+PRICE_QUORUM = int(os.getenv("PRICE_QUORUM", "2"))               # jumlah sumber yang harus sepakat
+PRICE_HEDGE_DELAY = float(os.getenv("PRICE_HEDGE_DELAY", "0.4"))  # detik, lewat ini tanya sumber cadangan
+PRICE_FETCH_TIMEOUT = float(os.getenv("PRICE_FETCH_TIMEOUT", "4"))
+PRICE_OUTLIER_PCT = float(os.getenv("PRICE_OUTLIER_PCT", "3"))    # % selisih dari median → dibuang
+
+COINGECKO_URL = os.getenv("COINGECKO_URL", "https://api.coingecko.com/api/v3/simple/price")
+INDODAX_URL = os.getenv("INDODAX_URL", "https://indodax.com/api/ticker_all")
+COINBASE_URL = os.getenv("COINBASE_URL", "https://api.coinbase.com/v2/exchange-rates")
+CMC_URL = os.getenv("CMC_URL", "https://pro-api.coinmarketcap.com/v1/cryptocurrency/quotes/latest")
+CMC_API_KEY = os.getenv("CMC_API_KEY_CMC")
+
+# cache harga (lihat pricing.py)
+PRICE_CACHE_TTL = float(os.getenv("PRICE_CACHE_TTL", "30"))     # detik, harga dianggap fresh
+PRICE_MAX_STALE = float(os.getenv("PRICE_MAX_STALE", "600"))    # detik, batas harga lama masih dipakai
+PRICE_REFRESH_INTERVAL = float(os.getenv("PRICE_REFRESH_INTERVAL", "15"))  # detik, job refresh harga
+PRICE_STALE_AFTER = float(os.getenv("PRICE_STALE_AFTER", "120"))  # detik, lewat ini pakai RATE_RP
+
+# riwayat harga (lihat price_history.py)
+PRICE_HISTORY_SIZE = int(os.getenv("PRICE_HISTORY_SIZE", "5760"))   # titik per token (24 jam @ 15 detik)
+PRICE_HISTORY_FILE = os.getenv("PRICE_HISTORY_FILE", "price_history.npz")
+PRICE_HISTORY_SAVE_INTERVAL = 300   # detik, simpan riwayat ke disk
+PRICE_USE_TWAP = os.getenv("PRICE_USE_TWAP", "0") == "1"         # buy/sell pakai TWAP, bukan harga spot
+PRICE_TWAP_WINDOW = float(os.getenv("PRICE_TWAP_WINDOW", "300"))  # detik
+
+# HTTP client async (http_client.py)
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "3"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "2"))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "2"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+
 def get_realtime_price(symbols=None):
     """
-    Ambil harga token dari Coingecko dalam IDR.
+    Ambil harga token dalam IDR (lewat cache TTL di pricing.py).
     symbols: list token atau single token (default None → semua token di COINGECKO_IDS)
     Return: dict {symbol: price_idr} atau float kalau single symbol
     """
+    from pricing import price_cache
+
+    if symbols is None:
+        symbols = list(COINGECKO_IDS.keys())
+
+    single = False
+    if isinstance(symbols, str):
+        symbols = [symbols]
+        single = True
+
+    result = price_cache.get(symbols)
+    return result[symbols[0]] if single else result
+
+
+async def get_realtime_price_async(symbols=None):
+    """
+    Sama seperti get_realtime_price, tapi awaitable (HTTP async, tidak block loop)
+    """
+    from pricing import price_cache
+
     if symbols is None:
         symbols = list(COINGECKO_IDS.keys())
 
@@ -118,27 +275,8 @@ def get_realtime_price(symbols=None):
         symbols = [symbols]
         single = True
 
-    result = {}
-    try:
-        ids = [COINGECKO_IDS.get(s, s.lower()) for s in symbols]
-        url = "https://api.coingecko.com/api/v3/simple/price"
-        params = {"ids": ",".join(ids), "vs_currencies": "idr"}
-        res = requests.get(url, params=params, timeout=5)
-        data = res.json()
-
-        for s in symbols:
-            cg_id = COINGECKO_IDS.get(s, s.lower())
-            price = data.get(cg_id, {}).get("idr")
-            if price is None:
-                price = RATE_RP.get(s, 0)
-            result[s] = float(price)
-
-        return result[symbols[0]] if single else result
-
-    except Exception as e:
-        print("⚠️ Error fetch price Coingecko:", e)
-        # fallback
-        return RATE_RP.get(symbols[0], 0) if single else {s: RATE_RP.get(s, 0) for s in symbols}
+    result = await price_cache.get_async(symbols)
+    return result[symbols[0]] if single else result
 
   # =========================
 # FEATURE SWITCH (admin toggle)
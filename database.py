@@ -1,42 +1,279 @@
-import json
-import os
-from config import DB_FILE
+from config import (
+    DB_FILE,
+    DB_JOURNAL_FILE,
+    DB_GROUP_COMMIT_MS,
+    DB_COMPACT_EVERY,
+    DB_BACKEND,
+    DB_SQLITE_FILE,
+    DB_FLUSH_INTERVAL
+)
+import asyncio
+import copy
 from datetime import datetime
+from journal import JournalStore
+import ledger
+from dedupe import get_dedupe
+from executors import get_pool
 
 # =========================
 # CORE DB
 # =========================
 
+class DB(dict):
+    """
+    Dict database biasa + daftar record yang berubah sejak load.
+    save_db hanya menulis record ini ke journal, bukan seluruh file.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pending = {}
+        self.status_index = None
+
+
+_store = None
+_resident = None
+
+
+def _get_store():
+    global _store
+    if _store is None and DB_BACKEND == "sqlite":
+        from sqlite_store import SqliteStore
+        _store = SqliteStore(DB_SQLITE_FILE)
+    elif _store is None:
+        _store = JournalStore(
+            DB_FILE,
+            DB_JOURNAL_FILE,
+            group_commit_ms=DB_GROUP_COMMIT_MS,
+            compact_every=DB_COMPACT_EVERY
+        )
+    return _store
+
+
 def _default_db():
     return {
         "users": {},
         "topups": {},
         "withdraws": {},
         "orders": {},
+        "_used_tx": {},
+        "_seq": {},      # counter ID per tabel
         "maintenance": None  # ⚡ Tambahan untuk fitur maintenance
     }
 
 
-def load_db():
-    if not os.path.exists(DB_FILE):
-        return _default_db()
-
-    with open(DB_FILE, "r") as f:
-        try:
-            data = json.load(f)
-        except json.JSONDecodeError:
-            return _default_db()
+def _read_db():
+    """
+    Journal: snapshot + replay journal.
+    SQLite: tabel lazy, record diambil per key saat diakses.
+    """
+    data = _get_store().load() or _default_db()
 
     # pastikan semua key default ada
     for k in _default_db():
         data.setdefault(k, None if k == "maintenance" else {})
 
-    return data
+    return DB(data)
+
+
+def load_db():
+    """
+    Kalau init_db() sudah dipanggil (bot jalan) → DB resident di memory,
+    tidak ada akses disk. Script lain tetap baca langsung dari store.
+    """
+    if _resident is not None:
+        return _resident
+    return _read_db()
+
+
+def touch(db, table, key=None):
+    """
+    Tandai record sebagai berubah (dipakai setelah edit in-place).
+    key None → nilai tunggal seperti "maintenance".
+    """
+    if key is None:
+        db.pending[(table, None)] = {"t": table, "v": db.get(table)}
+    else:
+        key = str(key)
+        db.pending[(table, key)] = {"t": table, "k": key, "v": db[table][key]}
+
+
+def remove_record(db, table, key):
+    """
+    Hapus record dari DB (dipakai archiver), dicatat sebagai delete di store
+    """
+    key = str(key)
+    rec = db[table].get(key)
+    if rec is None:
+        return None
+
+    db[table].pop(key)
+    if db.status_index is not None and table in db.status_index:
+        db.status_index[table].get(rec.get("status"), set()).discard(key)
+    db.pending[(table, key)] = {"t": table, "k": key, "d": 1}
+    return rec
 
 
 def save_db(db):
-    with open(DB_FILE, "w") as f:
-        json.dump(db, f, indent=2)
+    """
+    Commit semua record yang berubah ke journal (group commit).
+    DB resident: write-behind, record dikirim ke disk oleh flush_loop().
+    """
+    if db is _resident:
+        return
+    if db.pending:
+        _get_store().append(list(db.pending.values()))
+        db.pending = {}
+    ledger.flush()
+    get_dedupe().flush()
+
+
+def compact_db():
+    """
+    Gulung journal ke snapshot db.json
+    """
+    _get_store().compact()
+
+
+# =========================
+# RESIDENT DB (WRITE-BEHIND)
+# =========================
+
+def init_db():
+    """
+    Load DB sekali saat bot start, simpan di memory untuk semua handler
+    """
+    global _resident
+    db = _read_db()
+
+    if DB_BACKEND == "sqlite":
+        from sqlite_store import SqliteTable
+        for table in db.values():
+            if isinstance(table, SqliteTable):
+                table.preload()
+
+    _status_index(db)
+    ledger.load()
+    get_dedupe().seed(db["_used_tx"].keys())
+    _resident = db
+    return db
+
+
+async def flush_db():
+    """
+    Kirim record dirty ke store. Copy dibuat di event loop,
+    tulis file / fsync jalan di thread supaya loop tidak ke-block.
+    """
+    if _resident is None:
+        return
+
+    disk = get_pool("disk")
+    await disk.run(ledger.flush)
+    await disk.run(get_dedupe().flush)
+
+    if not _resident.pending:
+        return
+
+    pending = _resident.pending
+    _resident.pending = {}
+    records = copy.deepcopy(list(pending.values()))
+
+    try:
+        await disk.run(_get_store().append, records)
+    except Exception as e:
+        print("⚠️ Gagal flush DB:", e)
+        # kembalikan ke antrian, kecuali sudah ada versi lebih baru
+        for k, rec in pending.items():
+            _resident.pending.setdefault(k, rec)
+
+
+async def flush_loop(interval=DB_FLUSH_INTERVAL):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await flush_db()
+        except Exception as e:
+            # coba lagi di putaran berikutnya
+            print("⚠️ Gagal flush DB:", e)
+
+
+# =========================
+# ID SEQUENCE & STATUS INDEX
+# =========================
+
+INDEXED_TABLES = ("topups", "withdraws", "orders")
+
+
+def ensure_seq(db, table):
+    """
+    Pertama kali: counter lanjut dari ID terbesar yang sudah ada.
+    Wajib dipanggil sebelum record dihapus / diarsip.
+    """
+    seq = db["_seq"]
+    if table not in seq:
+        seq[table] = max((int(k) for k in db[table] if str(k).isdigit()), default=0)
+        touch(db, "_seq", table)
+    return seq
+
+
+def next_id(db, table):
+    """
+    ID monotonic per tabel, tidak bentrok walau record diarsip / dihapus
+    """
+    seq = ensure_seq(db, table)
+    seq[table] += 1
+    touch(db, "_seq", table)
+    return str(seq[table])
+
+
+def _status_index(db):
+    """
+    Index status → set ID (pending, approved, rejected, need_fix_name, ...).
+    Dibangun sekali dari isi tabel, lalu dijaga oleh helper.
+    """
+    if db.status_index is None:
+        index = {}
+        for table in INDEXED_TABLES:
+            by_status = index[table] = {}
+            for key, rec in db[table].items():
+                by_status.setdefault(rec.get("status"), set()).add(key)
+        db.status_index = index
+    return db.status_index
+
+
+def _index_move(db, table, key, old, new):
+    if db.status_index is None:
+        return
+    by_status = db.status_index[table]
+    if old is not None and old in by_status:
+        by_status[old].discard(key)
+    by_status.setdefault(new, set()).add(key)
+
+
+def set_status(db, table, key, status, **fields):
+    """
+    Ubah status record + field tambahan (approved_by, approved_at, ...)
+    """
+    key = str(key)
+    rec = db[table][key]
+    old = rec.get("status")
+    rec["status"] = status
+    rec.update(fields)
+    _index_move(db, table, key, old, status)
+    touch(db, table, key)
+
+
+def list_by_status(db, table, status):
+    """
+    Ambil record dengan status tertentu tanpa scan seluruh tabel.
+    DB resident → index status di memory (ikut perubahan write-behind),
+    SQLite tanpa index memory → query lewat index status tabel SQL.
+    """
+    by_status = getattr(db[table], "by_status", None)
+    if db.status_index is None and by_status is not None:
+        return by_status(status)
+
+    ids = _status_index(db)[table].get(status, ())
+    return [(k, db[table][k]) for k in sorted(ids, key=int)]
 
 
 # =========================
@@ -51,19 +288,28 @@ def get_user(db, user_id):
             "balance": 0,
             "wallet": None
         }
+        touch(db, "users", uid)
 
     return db["users"][uid]
 
 
-def add_balance(db, user_id, amount):
-    get_user(db, user_id)["balance"] += amount
+def add_balance(db, user_id, amount, reason="lainnya", ref=None):
+    """
+    reason / ref dicatat di ledger (topup, sell, buy_rollback, ...)
+    """
+    user = get_user(db, user_id)
+    user["balance"] += amount
+    touch(db, "users", user_id)
+    ledger.record(user_id, amount, user["balance"], reason, ref)
 
 
-def deduct_balance(db, user_id, amount):
+def deduct_balance(db, user_id, amount, reason="lainnya", ref=None):
     user = get_user(db, user_id)
     if user["balance"] < amount:
         return False
     user["balance"] -= amount
+    touch(db, "users", user_id)
+    ledger.record(user_id, -amount, user["balance"], reason, ref)
     return True
 
 
@@ -71,15 +317,22 @@ def deduct_balance(db, user_id, amount):
 # TOPUP
 # =========================
 
-def create_topup(db, user_id, amount, method):
-    tid = str(len(db["topups"]) + 1)
+def create_topup(db, user_id, amount, method, **extra):
+    """
+    extra: field tambahan, misalnya sender_name dan bukti
+    """
+    tid = next_id(db, "topups")
 
     db["topups"][tid] = {
         "user_id": str(user_id),
         "amount": amount,
         "method": method,
-        "status": "pending"
+        **extra,
+        "status": "pending",
+        "created": datetime.now().isoformat()
     }
+    _index_move(db, "topups", tid, None, "pending")
+    touch(db, "topups", tid)
 
     return tid
 
@@ -89,7 +342,7 @@ def create_topup(db, user_id, amount, method):
 # =========================
 
 def create_withdraw(db, user_id, amount, method, target, name):
-    wid = str(len(db["withdraws"]) + 1)
+    wid = next_id(db, "withdraws")
 
     db["withdraws"][wid] = {
         "user_id": str(user_id),
@@ -97,8 +350,11 @@ def create_withdraw(db, user_id, amount, method, target, name):
         "method": method,
         "target": target,
         "name": name,
-        "status": "pending"
+        "status": "pending",
+        "created": datetime.now().isoformat()
     }
+    _index_move(db, "withdraws", wid, None, "pending")
+    touch(db, "withdraws", wid)
 
     return wid
 
@@ -108,18 +364,68 @@ def create_withdraw(db, user_id, amount, method, target, name):
 # =========================
 
 def create_order(db, buyer_id, seller_id, amount):
-    oid = str(len(db["orders"]) + 1)
+    oid = next_id(db, "orders")
 
     db["orders"][oid] = {
         "buyer_id": str(buyer_id),
         "seller_id": str(seller_id),
         "amount": amount,
-        "status": "holding"
+        "status": "holding",
+        "created": datetime.now().isoformat()
     }
+    _index_move(db, "orders", oid, None, "holding")
+    touch(db, "orders", oid)
 
     return oid
 
 
+def create_buy_order(db, user_id, token, network, wallet, token_amount, amount_rp, tx_hash, batched=False, index=0, nonce=None):
+    """
+    Payout buy yang sudah terkirim, status "sent" sampai receipt dibaca
+    (lihat receipts.py) → "confirmed" / "failed" / "stuck" ("refunded").
+    nonce tx payout dicatat untuk cek aman sebelum refund order stuck.
+    """
+    oid = next_id(db, "orders")
+
+    db["orders"][oid] = {
+        "type": "buy",
+        "user_id": str(user_id),
+        "token": token,
+        "network": network,
+        "wallet": wallet,
+        "token_amount": token_amount,
+        "amount_rp": amount_rp,
+        "tx_hash": tx_hash,
+        "batched": batched,
+        "index": index,
+        "nonce": nonce,
+        "status": "sent",
+        "created": datetime.now().isoformat()
+    }
+    _index_move(db, "orders", oid, None, "sent")
+    touch(db, "orders", oid)
+
+    return oid
+
+
+# =========================
+# USED TX (ANTI DOUBLE SELL)
+# =========================
+
+def is_tx_used(tx_hash):
+    """
+    Cek lewat Bloom filter + index hash biner, tanpa load DB
+    """
+    return get_dedupe().contains(tx_hash)
+
+
+def lock_tx(db, tx_hash, info):
+    db.setdefault("_used_tx", {})
+    db["_used_tx"][tx_hash] = info
+    touch(db, "_used_tx", tx_hash)
+    get_dedupe().add(tx_hash)
+
+
 # =========================
 # MAINTENANCE
 # =========================
@@ -134,6 +440,7 @@ def set_maintenance(db, start_time: datetime, end_time: datetime, reason=""):
         "end": end_time.isoformat(),
         "reason": reason
     }
+    touch(db, "maintenance")
     save_db(db)
 
 
@@ -149,4 +456,5 @@ def clear_maintenance(db):
     Hapus status maintenance
     """
     db["maintenance"] = None
+    touch(db, "maintenance")
     save_db(db)
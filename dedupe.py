@@ -0,0 +1,236 @@
+import math
+import os
+import threading
+from collections import OrderedDict
+from config import DEDUPE_DIR, DEDUPE_CAPACITY, DEDUPE_FP_RATE, DEDUPE_BUCKET_CACHE
+
+# =========================
+# DEDUPE TX HASH (ANTI DOUBLE SELL)
+# =========================
+# Bloom filter di memory + index di disk berisi hash biner 32 byte.
+#   - Bloom bilang "tidak ada" → pasti belum dipakai, tanpa I/O disk.
+#   - Bloom bilang "mungkin"   → cek file bucket dedupe/<byte pertama>.bin.
+# Memory tetap (ukuran Bloom dihitung dari capacity + fp rate),
+# disk 32 byte per hash, dibagi 256 bucket supaya lookup positif kecil.
+# Bucket yang pernah dibaca di-cache (LRU, DEDUPE_BUCKET_CACHE bucket).
+# Hash baru tetap di _pending sampai bucket-nya selesai fsync, jadi
+# selama / setelah flush gagal contains() tetap True.
+
+RECORD_SIZE = 32
+
+
+def to_bytes(tx_hash):
+    """
+    "0xABCD..." → 32 byte. Return None kalau format bukan tx hash.
+    """
+    h = tx_hash.strip().lower()
+    if h.startswith("0x"):
+        h = h[2:]
+    if len(h) != 64:
+        return None
+    try:
+        return bytes.fromhex(h)
+    except ValueError:
+        return None
+
+
+def normalize(tx_hash):
+    """
+    Bentuk baku "0x" + 64 hex lowercase (sama dengan yang diindex), None kalau invalid
+    """
+    key = to_bytes(tx_hash)
+    return "0x" + key.hex() if key is not None else None
+
+
+class BloomFilter:
+    def __init__(self, capacity, fp_rate):
+        self.size = max(8, int(-capacity * math.log(fp_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key):
+        # keccak sudah acak merata → double hashing langsung dari byte hash
+        h1 = int.from_bytes(key[:8], "big")
+        h2 = int.from_bytes(key[8:16], "big") | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, key):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key):
+        for pos in self._positions(key):
+            if not self.bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+        return True
+
+
+class TxDedupe:
+    def __init__(self, directory, capacity, fp_rate, cache_size=DEDUPE_BUCKET_CACHE):
+        self.directory = directory
+        self.bloom = BloomFilter(capacity, fp_rate)
+        self.count = 0
+        self.cache_size = cache_size
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending = set()         # sudah dipakai tapi belum ditulis ke disk
+        self._cache = OrderedDict()   # path bucket → set hash (LRU)
+        self._gen = {}                # path bucket → versi, naik tiap bucket ditulis
+        self._load()
+
+    def _bucket(self, key):
+        return os.path.join(self.directory, f"{key[0]:02x}.bin")
+
+    def _load(self):
+        """
+        Bangun ulang Bloom dari semua bucket (baca sekuensial saat start)
+        """
+        if not os.path.isdir(self.directory):
+            return
+        for name in os.listdir(self.directory):
+            if not name.endswith(".bin"):
+                continue
+            with open(os.path.join(self.directory, name), "rb") as f:
+                data = f.read()
+            usable = len(data) - len(data) % RECORD_SIZE
+            for i in range(0, usable, RECORD_SIZE):
+                self.bloom.add(data[i:i + RECORD_SIZE])
+                self.count += 1
+
+    def _read_bucket(self, path):
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return set()
+        # record terakhir yang belum utuh (tulis terpotong) diabaikan
+        usable = len(data) - len(data) % RECORD_SIZE
+        return {data[i:i + RECORD_SIZE] for i in range(0, usable, RECORD_SIZE)}
+
+    def _bucket_keys(self, path):
+        """
+        Isi bucket dari cache, baca file hanya kalau belum ada di cache
+        """
+        with self._lock:
+            keys = self._cache.get(path)
+            if keys is not None:
+                self._cache.move_to_end(path)
+                return keys
+            gen = self._gen.get(path, 0)
+
+        keys = self._read_bucket(path)
+
+        with self._lock:
+            # bucket ditulis flush selama dibaca → hasil baca bisa basi, jangan di-cache
+            if self._gen.get(path, 0) == gen:
+                self._cache[path] = keys
+                self._cache.move_to_end(path)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return keys
+
+    # =========================
+    # API
+    # =========================
+    def contains(self, tx_hash):
+        key = to_bytes(tx_hash)
+        if key is None:
+            return False
+
+        with self._lock:
+            if key not in self.bloom:
+                return False
+            if key in self._pending:
+                return True
+
+        # tidak di _pending → sudah fsync ke bucket sebelum dibuang dari _pending
+        return key in self._bucket_keys(self._bucket(key))
+
+    def add(self, tx_hash):
+        key = to_bytes(tx_hash)
+        if key is None:
+            return
+        with self._lock:
+            self.bloom.add(key)
+            self._pending.add(key)
+            self.count += 1
+
+    def seed(self, tx_hashes):
+        """
+        Migrasi: masukkan hash lama (dari db["_used_tx"]) yang belum ada di index.
+        Dikelompokkan per bucket → tiap file bucket dibaca sekali.
+        """
+        buckets = {}
+        for tx_hash in tx_hashes:
+            key = to_bytes(tx_hash)
+            if key is not None:
+                buckets.setdefault(self._bucket(key), set()).add(key)
+
+        for path, keys in buckets.items():
+            with self._lock:
+                maybe = {k for k in keys if k in self.bloom}
+            on_disk = self._read_bucket(path) if maybe else set()
+
+            with self._lock:
+                for key in keys - on_disk - self._pending:
+                    self.bloom.add(key)
+                    self._pending.add(key)
+                    self.count += 1
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                pending = set(self._pending)
+            if not pending:
+                return
+
+            os.makedirs(self.directory, exist_ok=True)
+            buckets = {}
+            for key in pending:
+                buckets.setdefault(self._bucket(key), []).append(key)
+
+            # bucket gagal → hash-nya tetap di _pending, ditulis lagi flush berikutnya
+            for path, keys in buckets.items():
+                is_new = not os.path.exists(path)
+                with open(path, "ab") as f:
+                    f.write(b"".join(keys))
+                    f.flush()
+                    os.fsync(f.fileno())
+                if is_new:
+                    _fsync_dir(self.directory)
+
+                with self._lock:
+                    self._gen[path] = self._gen.get(path, 0) + 1
+                    cached = self._cache.get(path)
+                    if cached is not None:
+                        cached.update(keys)
+                    self._pending.difference_update(keys)
+
+
+def _fsync_dir(directory):
+    """
+    Entry file bucket baru ikut tersimpan (sama seperti journal)
+    """
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+_dedupe = None
+_init_lock = threading.Lock()
+
+
+def get_dedupe():
+    global _dedupe
+    with _init_lock:
+        if _dedupe is None:
+            _dedupe = TxDedupe(DEDUPE_DIR, DEDUPE_CAPACITY, DEDUPE_FP_RATE)
+    return _dedupe
@@ -0,0 +1,346 @@
+import json
+import os
+import secrets
+import time
+from decimal import Decimal
+from config import (
+    BOT_WALLET,
+    TOKEN_CONTRACTS,
+    DEPOSIT_POLL_INTERVAL,
+    DEPOSIT_CONFIRMATIONS,
+    DEPOSIT_BLOCK_RANGE,
+    DEPOSIT_NATIVE_RANGE,
+    DEPOSIT_MAX_RANGES,
+    DEPOSIT_LOOKBACK,
+    DEPOSIT_TAG_DECIMALS,
+    DEPOSIT_CURSOR_FILE,
+    DEPOSIT_INTENTS_FILE,
+    SELL_INTENT_TTL
+)
+from executors import get_pool
+from locks import user_lock
+from dedupe import normalize as normalize_tx
+from tx_verify import TRANSFER_TOPIC
+
+# =========================
+# DEPOSIT WATCHER (AUTO SELL)
+# =========================
+# Setelah user mengisi jumlah sell, bot mencatat "intent" (token, network,
+# wallet pengirim, jumlah). Jumlah diberi kode unik acak di digit desimal
+# terakhir (DEPOSIT_TAG_DECIMALS), jadi transfer orang lain yang kebetulan
+# terlihat on-chain tidak bisa diklaim: jumlah dipilih bot, bukan user.
+# Job deposit_watch_job per network:
+#   1. eth_blockNumber → hanya blok dengan DEPOSIT_CONFIRMATIONS konfirmasi
+#      yang dibaca (aman dari reorg)
+#   2. eth_getLogs Transfer(*, BOT_WALLET) untuk semua token ERC20 network
+#      itu, maksimal DEPOSIT_BLOCK_RANGE blok per request
+#   3. native coin: blok dibaca (batch) hanya kalau ada intent native terbuka
+#   4. transfer yang cocok dengan intent (pengirim + jumlah PERSIS) dikredit
+# Posisi blok terakhir disimpan di DEPOSIT_CURSOR_FILE dan intent terbuka
+# (termasuk kode unik) di DEPOSIT_INTENTS_FILE, jadi setelah restart
+# watcher lanjut dari blok yang sama dan deposit tetap bisa dicocokkan. Cursor tidak pernah lompat ke head;
+# kalau tertinggal lebih dari DEPOSIT_LOOKBACK blok, scan mulai dari batas
+# itu. Transfer tanpa kode unik tetap bisa diproses lewat TX hash manual.
+
+TAG_MAX = 9999        # kode unik 1..9999
+
+
+def _addr(address):
+    return address.lower().removeprefix("0x")
+
+
+class SellIntents:
+    def __init__(self, ttl, path):
+        self.ttl = ttl
+        self.path = path
+        self._intents = {}   # uid → intent
+        self._dirty = False
+
+    # =========================
+    # PERSIST
+    # =========================
+    def load(self):
+        """
+        Dipanggil sekali saat bot start (sebelum handler jalan)
+        """
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            data = {}
+        now = time.time()
+        self._intents = {uid: i for uid, i in data.items() if i["expires"] > now}
+
+    async def save(self):
+        """
+        Tulis snapshot intent di pool disk kalau ada perubahan.
+        Gagal → tetap dirty, dicoba lagi di putaran watcher berikutnya.
+        """
+        if not self._dirty:
+            return
+        self._dirty = False
+        try:
+            await get_pool("disk").run(_write_json, self.path, dict(self._intents))
+        except Exception as e:
+            self._dirty = True
+            print("⚠️ Gagal simpan intent sell:", e)
+
+    def open(self, uid, token, network, sender_wallet, amount_token, fee_rp):
+        """
+        Catat intent + pilih jumlah unik. Return jumlah yang harus dikirim
+        user (string, presisi penuh), None kalau token tidak dikenal.
+        """
+        data = TOKEN_CONTRACTS.get(token, {}).get(network)
+        if not data:
+            return None
+        decimals = data["decimals"]
+        places = min(decimals, DEPOSIT_TAG_DECIMALS.get(token, DEPOSIT_TAG_DECIMALS["default"]))
+        unit = 10 ** (decimals - places)
+
+        self.close(uid)
+        taken = {i["expected_raw"] for i in self.open_for(network) if i["token"] == token}
+        base = int(Decimal(str(amount_token)) * (10 ** places)) * unit
+        expected_raw = None
+        for _ in range(TAG_MAX):
+            candidate = base + (1 + secrets.randbelow(TAG_MAX)) * unit
+            if candidate not in taken:
+                expected_raw = candidate
+                break
+        if expected_raw is None:
+            return None   # semua kode terpakai → hanya jalur TX hash manual
+
+        send_amount = f"{Decimal(expected_raw) / (10 ** decimals):.{places}f}"
+        self._dirty = True
+        self._intents[str(uid)] = {
+            "uid": str(uid),
+            "token": token,
+            "network": network,
+            "sender": _addr(sender_wallet),
+            "sender_wallet": sender_wallet,
+            "amount_token": send_amount,
+            "expected_raw": expected_raw,
+            "fee_rp": fee_rp,
+            "expires": time.time() + self.ttl,
+        }
+        return send_amount
+
+    def close(self, uid):
+        intent = self._intents.pop(str(uid), None)
+        if intent is not None:
+            self._dirty = True
+        return intent
+
+    def is_open(self, intent):
+        return self._intents.get(intent["uid"]) is intent
+
+    def open_for(self, network, native=None):
+        now = time.time()
+        for uid in [u for u, i in self._intents.items() if i["expires"] <= now]:
+            del self._intents[uid]
+            self._dirty = True
+
+        result = [i for i in self._intents.values() if i["network"] == network]
+        if native is not None:
+            result = [i for i in result if (TOKEN_CONTRACTS[i["token"]][network]["address"] is None) == native]
+        return result
+
+    def match(self, network, token, sender, value):
+        """
+        Intent dari pengirim ini dengan jumlah unik yang sama persis
+        """
+        for intent in self.open_for(network):
+            if intent["token"] == token and intent["sender"] == sender and intent["expected_raw"] == value:
+                return intent
+        return None
+
+
+intents = SellIntents(SELL_INTENT_TTL, DEPOSIT_INTENTS_FILE)
+
+
+# =========================
+# CURSOR (PERSIST)
+# =========================
+def _load_cursors():
+    try:
+        with open(DEPOSIT_CURSOR_FILE, "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _write_json(path, data):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _save_cursors(cursors):
+    _write_json(DEPOSIT_CURSOR_FILE, cursors)
+
+
+_cursors = None
+
+
+# =========================
+# SCAN
+# =========================
+def _tokens(network):
+    """
+    {alamat_token_lowercase: symbol} + symbol native (kalau ada)
+    """
+    erc20, native = {}, None
+    for token, networks in TOKEN_CONTRACTS.items():
+        data = networks.get(network)
+        if not data:
+            continue
+        if data["address"] is None:
+            native = token
+        else:
+            erc20["0x" + _addr(data["address"])] = token
+    return erc20, native
+
+
+async def _scan_logs(chain, network, erc20, start, end):
+    bot_topic = "0x" + "0" * 24 + _addr(BOT_WALLET)
+    (logs,) = await chain.batch([("eth_getLogs", [{
+        "fromBlock": hex(start),
+        "toBlock": hex(end),
+        "address": list(erc20),
+        "topics": [TRANSFER_TOPIC, None, bot_topic],
+    }])], network)
+
+    found = []
+    for log in logs or []:
+        topics = log.get("topics") or []
+        token = erc20.get(log["address"].lower())
+        if not token or len(topics) < 3 or log.get("removed"):
+            continue
+        data = log["data"]
+        found.append({
+            "token": token,
+            "sender": topics[1][-40:].lower(),
+            "value": int(data, 16) if data not in ("0x", "") else 0,
+            "tx_hash": log["transactionHash"],
+        })
+    return found
+
+
+async def _scan_native(chain, network, token, start, end):
+    blocks = await chain.batch(
+        [("eth_getBlockByNumber", [hex(n), True]) for n in range(start, end + 1)],
+        network
+    )
+    bot = _addr(BOT_WALLET)
+
+    found = []
+    for block in blocks:
+        if block is None:
+            raise Exception("Blok belum tersedia di RPC")
+        for tx in block.get("transactions") or []:
+            if tx.get("to") and _addr(tx["to"]) == bot and int(tx["value"], 16) > 0:
+                found.append({
+                    "token": token,
+                    "sender": _addr(tx["from"]),
+                    "value": int(tx["value"], 16),
+                    "tx_hash": tx["hash"],
+                })
+    return found
+
+
+async def scan_network(app, network):
+    from chain import chain
+
+    global _cursors
+    if _cursors is None:
+        _cursors = await get_pool("disk").run(_load_cursors)
+
+    (head,) = await chain.batch([("eth_blockNumber", [])], network)
+    safe = int(head, 16) - DEPOSIT_CONFIRMATIONS.get(network, DEPOSIT_CONFIRMATIONS["default"])
+
+    # cursor tidak lompat ke head; hanya dibatasi maksimal DEPOSIT_LOOKBACK
+    # blok di belakang, supaya transfer yang ter-mine sesaat sebelum intent
+    # tercatat tetap discan begitu intent-nya terbuka
+    floor = safe - DEPOSIT_LOOKBACK.get(network, DEPOSIT_LOOKBACK["default"])
+    cursor = _cursors.get(network)
+    if cursor is None or cursor < floor:
+        cursor = floor
+        _cursors[network] = cursor
+        await get_pool("disk").run(_save_cursors, dict(_cursors))
+
+    if not intents.open_for(network):
+        return
+
+    erc20, native = _tokens(network)
+    for _ in range(DEPOSIT_MAX_RANGES):
+        start = cursor + 1
+        if start > safe:
+            break
+
+        scan_native = native is not None and intents.open_for(network, native=True)
+        end = min(safe, start + (DEPOSIT_NATIVE_RANGE if scan_native else DEPOSIT_BLOCK_RANGE) - 1)
+
+        transfers = []
+        if erc20 and intents.open_for(network, native=False):
+            transfers += await _scan_logs(chain, network, erc20, start, end)
+        if scan_native:
+            transfers += await _scan_native(chain, network, native, start, end)
+
+        for t in transfers:
+            intent = intents.match(network, t["token"], t["sender"], t["value"])
+            if intent:
+                await _credit(app, intent, t)
+
+        cursor = end
+        _cursors[network] = cursor
+        await get_pool("disk").run(_save_cursors, dict(_cursors))
+
+
+async def _credit(app, intent, transfer):
+    from database import is_tx_used
+    from sell import credit_sell, clear_sell_state
+
+    uid = intent["uid"]
+    tx_hash = normalize_tx(transfer["tx_hash"])
+    decimals = TOKEN_CONTRACTS[intent["token"]][intent["network"]]["decimals"]
+
+    # lock sama seperti sell_tx (per user + per tx hash)
+    async with user_lock(uid):
+        async with user_lock(f"tx:{tx_hash}"):
+            if is_tx_used(tx_hash):
+                return
+            if not intents.is_open(intent):
+                return  # sudah diproses manual lewat sell_tx / dibatalkan
+
+            credited = await credit_sell(
+                app.bot,
+                uid,
+                intent["token"],
+                intent["network"],
+                intent["sender_wallet"],
+                tx_hash,
+                transfer["value"] / (10 ** decimals),
+                intent["fee_rp"],
+                auto=True
+            )
+            # gagal kredit (mis. harga tidak tersedia) → intent tetap terbuka
+            if credited:
+                intents.close(uid)
+                clear_sell_state(app, uid)
+
+
+async def deposit_watch_job(context):
+    networks = {n for networks in TOKEN_CONTRACTS.values() for n in networks}
+    for network in networks:
+        try:
+            await scan_network(context.application, network)
+        except Exception as e:
+            print(f"⚠️ Error deposit watcher {network}:", e)
+    await intents.save()
+
+
+def start_deposit_watcher(app, interval=DEPOSIT_POLL_INTERVAL):
+    intents.load()
+    app.job_queue.run_repeating(deposit_watch_job, interval=interval, first=10)
@@ -0,0 +1,192 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from config import EXECUTOR_POOLS, EXECUTOR_DEFAULT
+
+# =========================
+# POOL PER RESOURCE (BOUNDED)
+# =========================
+# Pekerjaan blocking / lambat dibagi per kelas resource:
+#   rpc:<network>  → request ke node (per network, 1 RPC lambat tidak ganggu yang lain)
+#   disk           → flush DB / ledger / dedupe, arsip, riwayat harga
+#   price          → refresh harga sync
+# Tiap pool punya N worker + antrian maksimal. Kalau penuh, pemanggil
+# langsung dapat PoolBusy (pesan "sedang sibuk") daripada menumpuk kerja.
+# Pool yang sama dipakai untuk fungsi blocking (run / submit, di thread)
+# dan I/O async (slot, dibatasi semaphore).
+
+BUSY_MESSAGE = "⏳ Sistem sedang sibuk, coba lagi beberapa saat lagi."
+
+
+class PoolBusy(Exception):
+    def __init__(self, pool):
+        super().__init__(BUSY_MESSAGE)
+        self.pool = pool
+
+
+class BoundedPool:
+    def __init__(self, name, workers, max_queue):
+        self.name = name
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = None
+        self._semaphore = None
+        self._lock = threading.Lock()
+
+        self.inflight = 0     # jalan + antri
+        self.running = 0
+        self.submitted = 0
+        self.rejected = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.run_total = 0.0
+        self.run_max = 0.0
+
+    @property
+    def queued(self):
+        return max(0, self.inflight - self.running)
+
+    def busy(self):
+        return self.inflight >= self.workers + self.max_queue
+
+    def _enter(self):
+        with self._lock:
+            if self.inflight >= self.workers + self.max_queue:
+                self.rejected += 1
+                raise PoolBusy(self.name)
+            self.inflight += 1
+            self.submitted += 1
+        return time.monotonic()
+
+    def _started(self, queued_at):
+        waited = time.monotonic() - queued_at
+        with self._lock:
+            self.running += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+        return time.monotonic()
+
+    def _done(self, started):
+        ran = time.monotonic() - started if started else 0.0
+        with self._lock:
+            if started:
+                self.running -= 1
+                self.run_total += ran
+                self.run_max = max(self.run_max, ran)
+            self.inflight -= 1
+
+    def _wrap(self, fn, args, kwargs, queued_at):
+        def job():
+            started = self._started(queued_at)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._done(started)
+        return job
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix=self.name)
+            return self._executor
+
+    # =========================
+    # API
+    # =========================
+    async def run(self, fn, *args, **kwargs):
+        """
+        Jalankan fungsi blocking di thread pool ini, tunggu hasilnya
+        """
+        queued_at = self._enter()
+        job = self._wrap(fn, args, kwargs, queued_at)
+        try:
+            future = self._get_executor().submit(job)
+        except Exception:
+            self._done(None)
+            raise
+        return await asyncio.wrap_future(future)
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Fire-and-forget dari kode sync. Raise PoolBusy kalau penuh.
+        """
+        queued_at = self._enter()
+        try:
+            return self._get_executor().submit(self._wrap(fn, args, kwargs, queued_at))
+        except Exception:
+            self._done(None)
+            raise
+
+    @asynccontextmanager
+    async def slot(self):
+        """
+        Batasi I/O async (mis. AsyncWeb3) dengan batas yang sama
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.workers)
+
+        queued_at = self._enter()
+        started = None
+        try:
+            async with self._semaphore:
+                started = self._started(queued_at)
+                yield
+        finally:
+            self._done(started)
+
+    def stats(self):
+        with self._lock:
+            done = self.submitted - self.inflight
+            return {
+                "name": self.name,
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "running": self.running,
+                "queued": self.queued,
+                "submitted": self.submitted,
+                "rejected": self.rejected,
+                "avg_wait": self.wait_total / done if done else 0.0,
+                "max_wait": self.wait_max,
+                "avg_run": self.run_total / done if done else 0.0,
+                "max_run": self.run_max,
+            }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(name):
+    """
+    Pool per nama, ukuran dari EXECUTOR_POOLS (rpc:<network> pakai entry "rpc")
+    """
+    with _pools_lock:
+        pool = _pools.get(name)
+        if pool is None:
+            size = EXECUTOR_POOLS.get(name) or EXECUTOR_POOLS.get(name.split(":")[0], EXECUTOR_DEFAULT)
+            pool = _pools[name] = BoundedPool(name, *size)
+        return pool
+
+
+def rpc_executor(network):
+    return get_pool(f"rpc:{network or 'lain'}")
+
+
+def all_stats():
+    with _pools_lock:
+        pools = list(_pools.values())
+    return [p.stats() for p in pools]
+
+
+def shutdown_all():
+    with _pools_lock:
+        pools = list(_pools.values())
+    for p in pools:
+        p.shutdown()
@@ -0,0 +1,153 @@
+import threading
+import time
+from collections import deque
+from config import (
+    RPC_BY_NETWORK,
+    FEE_POLL_INTERVAL,
+    FEE_HISTORY_BLOCKS,
+    FEE_MAX_AGE,
+    FEE_PRIORITY_PERCENTILE,
+    FEE_DEFAULT_PRIORITY_GWEI
+)
+
+# =========================
+# FEE ORACLE (CACHE GAS)
+# =========================
+# Job fee_poll_job tiap FEE_POLL_INTERVAL detik ambil eth_feeHistory
+# (base fee blok terakhir + persentil priority fee) per network dan simpan
+# di memory. send_token tinggal baca, tidak perlu get_block / gas_price lagi.
+# chain_id cukup di-query sekali per RPC.
+#
+# maxFeePerGas = 2 × base fee blok berikutnya + priority, jadi tx tetap
+# masuk walau base fee naik beberapa blok sejak data terakhir di-poll.
+# Chain tanpa EIP-1559 (baseFee kosong / nol) → gasPrice legacy.
+
+PERCENTILES = [25, 50, 75]
+
+
+class FeeOracle:
+    def __init__(self, history_blocks, max_age):
+        self.history_blocks = history_blocks
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._chain_ids = {}   # key → chain_id
+        self._fees = {}        # key → {"base_fees", "rewards", "gas_price", "updated"}
+
+    def _key(self, w3):
+        return getattr(w3.provider, "endpoint_uri", None) or id(w3)
+
+    def chain_id(self, w3):
+        key = self._key(w3)
+        chain_id = self._chain_ids.get(key)
+        if chain_id is None:
+            chain_id = self._chain_ids[key] = w3.eth.chain_id
+        return chain_id
+
+    async def chain_id_async(self, w3):
+        key = self._key(w3)
+        chain_id = self._chain_ids.get(key)
+        if chain_id is None:
+            chain_id = self._chain_ids[key] = await w3.eth.chain_id
+        return chain_id
+
+    def _store(self, w3, history, gas_price):
+        entry = {
+            "base_fees": deque(maxlen=self.history_blocks + 1),
+            "rewards": {p: deque(maxlen=self.history_blocks) for p in PERCENTILES},
+            "gas_price": gas_price,
+            "updated": time.monotonic(),
+        }
+        if history:
+            # elemen terakhir = base fee blok berikutnya
+            entry["base_fees"].extend(history["baseFeePerGas"])
+            for block in history.get("reward") or []:
+                for p, value in zip(PERCENTILES, block):
+                    entry["rewards"][p].append(value)
+
+        with self._lock:
+            self._fees[self._key(w3)] = entry
+        return entry
+
+    def update(self, w3):
+        """
+        1 request eth_feeHistory (+ gas_price untuk chain legacy)
+        """
+        try:
+            history = w3.eth.fee_history(self.history_blocks, "latest", PERCENTILES)
+        except Exception:
+            history = None
+
+        if history and any(history.get("baseFeePerGas") or []):
+            return self._store(w3, history, None)
+        return self._store(w3, None, w3.eth.gas_price)
+
+    async def update_async(self, w3):
+        try:
+            history = await w3.eth.fee_history(self.history_blocks, "latest", PERCENTILES)
+        except Exception:
+            history = None
+
+        if history and any(history.get("baseFeePerGas") or []):
+            return self._store(w3, history, None)
+        return self._store(w3, None, await w3.eth.gas_price)
+
+    def _fresh(self, w3):
+        with self._lock:
+            entry = self._fees.get(self._key(w3))
+        if entry is None or time.monotonic() - entry["updated"] > self.max_age:
+            return None
+        return entry
+
+    def _params(self, w3, entry):
+        if entry["gas_price"] is not None:
+            return {"gasPrice": entry["gas_price"]}
+
+        rewards = sorted(entry["rewards"][FEE_PRIORITY_PERCENTILE])
+        if rewards:
+            max_priority = rewards[len(rewards) // 2]
+        else:
+            max_priority = w3.to_wei(FEE_DEFAULT_PRIORITY_GWEI, "gwei")
+
+        return {
+            "type": 2,
+            "maxFeePerGas": 2 * entry["base_fees"][-1] + max_priority,
+            "maxPriorityFeePerGas": max_priority
+        }
+
+    def params(self, w3):
+        """
+        Parameter gas untuk tx, dari cache (fetch kalau belum ada / terlalu lama)
+        """
+        return self._params(w3, self._fresh(w3) or self.update(w3))
+
+    async def params_async(self, w3):
+        return self._params(w3, self._fresh(w3) or await self.update_async(w3))
+
+    def recent_base_fees(self, w3):
+        with self._lock:
+            entry = self._fees.get(self._key(w3))
+            return list(entry["base_fees"]) if entry else []
+
+
+fee_oracle = FeeOracle(FEE_HISTORY_BLOCKS, FEE_MAX_AGE)
+
+
+# =========================
+# BACKGROUND POLLER
+# =========================
+async def fee_poll_job(context):
+    from chain import chain
+
+    for network, rpc in RPC_BY_NETWORK.items():
+        if not rpc:
+            continue
+        try:
+            w3 = await chain.w3(network)
+            await fee_oracle.chain_id_async(w3)
+            await fee_oracle.update_async(w3)
+        except Exception as e:
+            print(f"⚠️ Error poll fee {network}:", e)
+
+
+def start_fee_oracle(app, interval=FEE_POLL_INTERVAL):
+    app.job_queue.run_repeating(fee_poll_job, interval=interval, first=0)
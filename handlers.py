@@ -7,7 +7,18 @@ from telegram.ext import (
     ContextTypes,
     filters
 )
-from database import load_db, save_db, get_user
+from database import load_db, save_db, get_user, list_by_status
+import ledger
+import archive
+from pricing import price_note
+from price_history import price_history
+from rpc_pool import web3_pool
+from executors import get_pool, all_stats, PoolBusy, BUSY_MESSAGE
+from liquidity import liquidity
+from deposits import intents
+import treasury
+from receipts import receipts
+from datetime import datetime
 
 # =========================
 # IMPORT MODULE
@@ -67,7 +78,8 @@ from states import (
 
 # =========================
 # IMPORT CONFIG UNTUK HARGA REALTIME
-# =========================                                                                                                                                                                                          from config import FEATURES_ENABLED, ADMIN_IDS, get_realtime_price
+# =========================
+from config import FEATURES_ENABLED, ADMIN_IDS, get_realtime_price_async
 
 # =========================
 # TEXT ROUTER (STATE BASED)
@@ -136,6 +148,274 @@ async def toggle_feature(update, context):
     FEATURES_ENABLED[feature] = (status == "on")
     await update.message.reply_text(f"⚡ Fitur {feature} sekarang {'aktif' if status=='on' else 'mati'}")
 
+# =========================
+# ADMIN PENDING QUEUE
+# =========================
+PENDING_LIMIT = 20
+
+async def pending_queue(update, context):
+    uid = str(update.effective_user.id)
+    if uid not in [str(a) for a in ADMIN_IDS]:
+        await update.message.reply_text("❌ Kamu bukan admin.")
+        return
+
+    db = load_db()
+    lines = ["📋 *ANTRIAN PENDING*"]
+
+    for table, title in (("topups", "TOPUP"), ("withdraws", "WITHDRAW")):
+        items = list_by_status(db, table, "pending")
+        if table == "withdraws":
+            items += list_by_status(db, table, "need_fix_name")
+
+        lines.append(f"\n*{title}* ({len(items)})")
+        for rid, rec in items[:PENDING_LIMIT]:
+            lines.append(
+                f"`{rid}` • User `{rec['user_id']}` • Rp {rec['amount']:,} • "
+                f"{rec.get('method', '-')} • `{rec['status']}`"
+            )
+        if len(items) > PENDING_LIMIT:
+            lines.append(f"... +{len(items) - PENDING_LIMIT} lagi")
+
+    await update.message.reply_text("\n".join(lines), parse_mode="Markdown")
+
+# =========================
+# ADMIN AUDIT SALDO (LEDGER)
+# =========================
+async def audit_balance(update, context):
+    uid = str(update.effective_user.id)
+    if uid not in [str(a) for a in ADMIN_IDS]:
+        await update.message.reply_text("❌ Kamu bukan admin.")
+        return
+
+    if len(context.args) != 1:
+        await update.message.reply_text("Gunakan format: /audit [user_id]")
+        return
+
+    target = context.args[0]
+    db = load_db()
+    user = db["users"].get(target)
+    if not user:
+        await update.message.reply_text("❌ User tidak ditemukan")
+        return
+
+    # baca file ledger di pool disk, event loop tidak ikut menunggu flush / fsync
+    disk = get_pool("disk")
+    try:
+        ledger_balance, replayed = await disk.run(ledger.replay, target)
+        entries = await disk.run(ledger.history, target, 5)
+    except PoolBusy:
+        await update.message.reply_text(BUSY_MESSAGE)
+        return
+
+    status = "✅ Cocok" if ledger_balance == user["balance"] else "⚠️ TIDAK COCOK"
+
+    lines = [
+        f"🧾 *AUDIT SALDO* `{target}`",
+        f"Saldo DB     : Rp {user['balance']:,}",
+        f"Saldo ledger : Rp {ledger_balance:,} ({replayed} entry di-replay)",
+        status,
+        "",
+        "*Entry terakhir:*"
+    ]
+    for e in entries:
+        lines.append(f"#{e['seq']} {e['legs'][0][1]:+,} • {e['reason']} • Rp {e['balance']:,}")
+
+    await update.message.reply_text("\n".join(lines), parse_mode="Markdown")
+
+# =========================
+# ADMIN CARI DATA ARSIP
+# =========================
+async def archive_lookup(update, context):
+    uid = str(update.effective_user.id)
+    if uid not in [str(a) for a in ADMIN_IDS]:
+        await update.message.reply_text("❌ Kamu bukan admin.")
+        return
+
+    if len(context.args) != 2:
+        await update.message.reply_text("Gunakan format: /arsip [topup|withdraw|order|tx] [id]")
+        return
+
+    table, record_id = context.args
+    try:
+        rec = await get_pool("disk").run(archive.lookup, table.lower(), record_id)
+    except PoolBusy:
+        await update.message.reply_text(BUSY_MESSAGE)
+        return
+    if not rec:
+        await update.message.reply_text("❌ Data tidak ditemukan di arsip")
+        return
+
+    lines = [f"📦 *ARSIP* {table} `{record_id}`"]
+    lines += [f"{k}: `{v}`" for k, v in rec.items()]
+    await update.message.reply_text("\n".join(lines), parse_mode="Markdown")
+
+# =========================
+# ADMIN STATUS RPC
+# =========================
+async def rpc_status(update, context):
+    uid = str(update.effective_user.id)
+    if uid not in [str(a) for a in ADMIN_IDS]:
+        await update.message.reply_text("❌ Kamu bukan admin.")
+        return
+
+    # /rpc reset → buang semua koneksi, dibuat ulang saat dipakai
+    if context.args and context.args[0].lower() == "reset":
+        web3_pool.invalidate()
+        await update.message.reply_text("✅ Semua koneksi RPC di-reset")
+        return
+
+    clients = web3_pool.health()
+    if not clients:
+        await update.message.reply_text("Belum ada koneksi RPC yang dipakai")
+        return
+
+    lines = ["🔌 *STATUS RPC*"]
+    for c in clients:
+        last_ok = datetime.fromtimestamp(c["last_ok"]).strftime("%H:%M:%S") if c["last_ok"] else "-"
+        status = "✅" if c["failures"] == 0 else f"⚠️ gagal {c['failures']}x"
+        lines.append(f"{c['network'] or '-'} ({c['kind']}) {status} • {c['requests']} request • ok terakhir {last_ok}")
+        if c["last_error"]:
+            lines.append(f"   error terakhir: `{c['last_error'][:100]}`")
+    await update.message.reply_text("\n".join(lines), parse_mode="Markdown")
+
+# =========================
+# ADMIN STATUS THREAD POOL
+# =========================
+async def pool_status(update, context):
+    uid = str(update.effective_user.id)
+    if uid not in [str(a) for a in ADMIN_IDS]:
+        await update.message.reply_text("❌ Kamu bukan admin.")
+        return
+
+    stats = all_stats()
+    if not stats:
+        await update.message.reply_text("Belum ada pool yang dipakai")
+        return
+
+    lines = ["🧵 *STATUS POOL*"]
+    for p in stats:
+        lines.append(
+            f"`{p['name']}` jalan {p['running']}/{p['workers']} • antri {p['queued']}/{p['max_queue']} • "
+            f"ditolak {p['rejected']}\n"
+            f"   tunggu avg {p['avg_wait'] * 1000:.0f}ms max {p['max_wait'] * 1000:.0f}ms • "
+            f"jalan avg {p['avg_run'] * 1000:.0f}ms max {p['max_run'] * 1000:.0f}ms"
+        )
+    await update.message.reply_text("\n".join(lines), parse_mode="Markdown")
+
+# =========================
+# ADMIN TREASURY (SALDO HOT WALLET)
+# =========================
+async def treasury_status(update, context):
+    uid = str(update.effective_user.id)
+    if uid not in [str(a) for a in ADMIN_IDS]:
+        await update.message.reply_text("❌ Kamu bukan admin.")
+        return
+
+    try:
+        balances, errors = await treasury.snapshot()
+    except PoolBusy:
+        await update.message.reply_text(BUSY_MESSAGE)
+        return
+
+    try:
+        rates = await get_realtime_price_async()
+    except Exception:
+        rates = {}
+
+    cached = liquidity.snapshot()
+    total_rp = 0
+    lines = ["🏦 *TREASURY HOT WALLET*"]
+
+    for network, tokens in balances.items():
+        lines.append("")
+        lines.append(f"*{network}*")
+        for token, balance in tokens.items():
+            if balance is None:
+                lines.append(f"{token}: ⚠️ gagal dibaca")
+                continue
+            reserved = cached.get((network, token), {}).get("reserved", 0)
+            inflight = cached.get((network, token), {}).get("inflight", 0)
+            value_rp = int(balance * rates.get(token, 0))
+            total_rp += value_rp
+            lines.append(
+                f"{token}: {balance:,.6f} (reservasi {reserved:,.6f}, in-flight {inflight:,.6f}) ≈ Rp {value_rp:,}"
+            )
+
+    for network, e in errors.items():
+        lines.append("")
+        lines.append(f"*{network}*: ⚠️ `{str(e)[:100]}`")
+
+    lines.append("")
+    lines.append(f"Total ≈ Rp {total_rp:,}")
+    await update.message.reply_text("\n".join(lines), parse_mode="Markdown")
+
+# =========================
+# ADMIN TINDAK LANJUT PAYOUT STUCK
+# =========================
+BUY_REFUND_REPLIES = {
+    "confirmed": "✅ Receipt ditemukan, order #{oid} terkonfirmasi (tidak di-refund)",
+    "failed": "❌ Receipt ditemukan (gagal), order #{oid} sudah di-refund",
+    "pending": "⏳ Nonce payout order #{oid} belum terpakai, TX masih bisa masuk blok. Belum bisa di-refund (ganti nonce-nya dulu).",
+    "manual": "⚠️ Order #{oid} tidak punya nonce tercatat, cek manual di explorer.",
+    "refunded": "↩️ Order #{oid} di-refund (buy_rollback)",
+}
+
+async def buy_refund(update, context):
+    uid = str(update.effective_user.id)
+    if uid not in [str(a) for a in ADMIN_IDS]:
+        await update.message.reply_text("❌ Kamu bukan admin.")
+        return
+
+    if len(context.args) != 1:
+        await update.message.reply_text("Gunakan format: /buyrefund [order_id]")
+        return
+
+    oid = context.args[0]
+    try:
+        status = await receipts.refund_stuck(oid)
+    except PoolBusy:
+        await update.message.reply_text(BUSY_MESSAGE)
+        return
+    except Exception as e:
+        await update.message.reply_text(f"⚠️ Gagal cek TX: {str(e)[:100]}")
+        return
+
+    if status is None:
+        await update.message.reply_text("❌ Order buy stuck tidak ditemukan")
+        return
+
+    reply = BUY_REFUND_REPLIES.get(status, "Order #{oid}: " + status)
+    await update.message.reply_text(reply.format(oid=oid))
+
+# =========================
+# RIWAYAT HARGA
+# =========================
+HARGA_WINDOWS = [("5m", 300), ("1j", 3600), ("24j", 86400)]
+
+async def harga(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    symbols = [a.upper() for a in context.args] or list(price_history.rings)
+
+    lines = ["📈 *RIWAYAT HARGA*"]
+    for s in symbols:
+        lines.append("")
+        lines.append(f"*{s}*")
+
+        if not price_history.stats(s, HARGA_WINDOWS[-1][1]):
+            lines.append("Belum ada data")
+            continue
+
+        for label, seconds in HARGA_WINDOWS:
+            st = price_history.stats(s, seconds)
+            lines.append(
+                f"`{label:>3}` TWAP Rp {st['twap']:,.0f} • "
+                f"min {st['min']:,.0f} • max {st['max']:,.0f} • "
+                f"vol {st['volatility']:.2f}%"
+            )
+        lines.append(f"Terakhir: Rp {st['last']:,.0f}")
+
+    lines.append(price_note(symbols))
+    await update.message.reply_text("\n".join(lines), parse_mode="Markdown")
+
 # =========================
 # COMMANDS
 # =========================
@@ -146,14 +426,14 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     save_db(db)
 
     try:
-        rates = get_realtime_price()
+        rates = await get_realtime_price_async()
         usdt_price = rates.get("USDT", 0)
     except Exception:
         usdt_price = 0
 
     await update.message.reply_text(
         f"👋 *Selamat datang di Paxi Tip Bot*\n\n"
-        f"Harga realtime USDT: Rp {usdt_price:,}\n\n"
+        f"Harga realtime USDT: Rp {usdt_price:,}{price_note(['USDT'])}\n\n"
         "/topup – Isi saldo\n"
         "/saldo – Cek saldo\n"
         "/buy – Beli crypto\n"
@@ -170,18 +450,20 @@ async def saldo(update: Update, context: ContextTypes.DEFAULT_TYPE):
     save_db(db)
 
     try:
-        rates = get_realtime_price()
+        rates = await get_realtime_price_async()
         usdt_price = rates.get("USDT", 0)
     except Exception:
         usdt_price = 0
 
     await update.message.reply_text(
         f"💰 *Saldo kamu*\nRp {user['balance']:,}\n\n"
-        f"Harga USDT realtime: Rp {usdt_price:,}",
+        f"Harga USDT realtime: Rp {usdt_price:,}{price_note(['USDT'])}",
         parse_mode="Markdown"
     )
 
 async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    liquidity.release_all(str(update.effective_user.id))
+    intents.close(update.effective_user.id)
     context.user_data.clear()
     await update.message.reply_text("❌ Proses dibatalkan.")
 
@@ -206,6 +488,14 @@ def register(app):
     app.add_handler(CommandHandler("cancel", cancel))
     app.add_handler(CommandHandler("setmaintenance", maintenance_set))
     app.add_handler(CommandHandler("stopmaintenance", maintenance_stop))
+    app.add_handler(CommandHandler("pending", pending_queue))
+    app.add_handler(CommandHandler("audit", audit_balance))
+    app.add_handler(CommandHandler("arsip", archive_lookup))
+    app.add_handler(CommandHandler("harga", harga))
+    app.add_handler(CommandHandler("rpc", rpc_status))
+    app.add_handler(CommandHandler("pool", pool_status))
+    app.add_handler(CommandHandler("treasury", treasury_status))
+    app.add_handler(CommandHandler("buyrefund", buy_refund))
 
     # ---------- CALLBACK ----------
     app.add_handler(CallbackQueryHandler(pay_callback, pattern="^pay_"))
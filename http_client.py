@@ -0,0 +1,60 @@
+import asyncio
+import httpx
+from config import HTTP_TIMEOUT, HTTP_CONNECT_TIMEOUT, HTTP_RETRIES, HTTP_MAX_CONNECTIONS
+
+# =========================
+# ASYNC HTTP CLIENT (POOLED)
+# =========================
+# Satu httpx.AsyncClient untuk seluruh bot: koneksi keep-alive dipakai ulang,
+# HTTP/2 otomatis aktif kalau paket h2 terpasang. Timeout pendek + retry
+# dengan backoff kecil supaya upstream yang lambat tidak menahan user lain.
+
+try:
+    import h2  # noqa: F401
+    HTTP2 = True
+except ImportError:
+    HTTP2 = False
+
+# status yang layak dicoba ulang
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class AsyncHttp:
+    def __init__(self):
+        self._client = None
+
+    def client(self):
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                http2=HTTP2,
+                timeout=httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+                limits=httpx.Limits(
+                    max_connections=HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=HTTP_MAX_CONNECTIONS,
+                    keepalive_expiry=60
+                ),
+                headers={"Accept": "application/json"}
+            )
+        return self._client
+
+    async def get_json(self, url, params=None, headers=None):
+        for attempt in range(HTTP_RETRIES + 1):
+            try:
+                res = await self.client().get(url, params=params, headers=headers)
+                if res.status_code in RETRY_STATUS and attempt < HTTP_RETRIES:
+                    await asyncio.sleep(0.2 * 2 ** attempt)
+                    continue
+                res.raise_for_status()
+                return res.json()
+            except httpx.TransportError:
+                if attempt == HTTP_RETRIES:
+                    raise
+                await asyncio.sleep(0.2 * 2 ** attempt)
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+http = AsyncHttp()
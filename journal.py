@@ -0,0 +1,193 @@
+import json
+import os
+import threading
+import time
+
+# =========================
+# JOURNAL STORE
+# =========================
+# Snapshot (db.json) + journal append-only (db.journal).
+# Setiap mutasi ditulis sebagai 1 baris JSON kecil:
+#   {"t": "users", "k": "123", "v": {...}}   -> upsert record
+#   {"t": "topups", "k": "5", "d": 1}        -> hapus record
+#   {"t": "maintenance", "v": {...}}         -> nilai tunggal (tanpa key)
+# Replay = snapshot lalu semua baris journal (last-writer-wins per record).
+
+
+def _apply(state, rec):
+    table = rec["t"]
+
+    if "k" not in rec:
+        state[table] = rec.get("v")
+        return
+
+    rows = state.get(table)
+    if not isinstance(rows, dict):
+        rows = state[table] = {}
+
+    if rec.get("d"):
+        rows.pop(rec["k"], None)
+    else:
+        rows[rec["k"]] = rec["v"]
+
+
+class JournalStore:
+    def __init__(self, snapshot_file, journal_file, group_commit_ms=5, compact_every=5000):
+        self.snapshot_file = snapshot_file
+        self.journal_file = journal_file
+        self.group_commit_window = group_commit_ms / 1000
+        self.compact_every = compact_every
+
+        self._cond = threading.Condition()
+        self._buf = []
+        self._enqueued = 0      # nomor batch terakhir yang masuk antrian
+        self._settled = 0       # nomor batch terakhir yang sudah ada hasilnya
+        self._durable = 0       # nomor batch terakhir yang sudah di-fsync
+        self._failed = []       # grup yang gagal ditulis: {"from", "upto", "error", "left"}
+        self._leader = False
+        self._journal_lines = self._count_lines()
+
+    # =========================
+    # READ
+    # =========================
+    def _count_lines(self):
+        if not os.path.exists(self.journal_file):
+            return 0
+        with open(self.journal_file, "rb") as f:
+            return sum(1 for _ in f)
+
+    def _read_snapshot(self):
+        if not os.path.exists(self.snapshot_file):
+            return {}
+        with open(self.snapshot_file, "r") as f:
+            try:
+                return json.load(f)
+            except json.JSONDecodeError:
+                return {}
+
+    def load(self):
+        """
+        Baca snapshot lalu replay journal.
+        Baris terakhir yang terpotong (crash saat nulis) diabaikan.
+        """
+        state = self._read_snapshot()
+
+        if os.path.exists(self.journal_file):
+            with open(self.journal_file, "r") as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                    except json.JSONDecodeError:
+                        break
+                    _apply(state, rec)
+
+        return state
+
+    # =========================
+    # WRITE (GROUP COMMIT)
+    # =========================
+    def append(self, records):
+        """
+        Tulis record ke journal dan tunggu sampai durable.
+        Penulis yang datang dalam window group commit berbagi 1 fsync.
+        Tulis / fsync grup gagal → SEMUA penulis di grup itu dapat error yang
+        sama (bukan sukses palsu), pemanggil yang mengantri ulang record.
+        """
+        if not records:
+            return
+
+        lines = [json.dumps(r, separators=(",", ":")) + "\n" for r in records]
+
+        with self._cond:
+            self._buf.extend(lines)
+            self._enqueued += 1
+            my_batch = self._enqueued
+
+            while self._settled < my_batch:
+                if not self._leader:
+                    self._leader = True
+                    break
+                self._cond.wait()
+            else:
+                error = self._failure(my_batch)
+                if error is not None:
+                    raise error
+                return
+
+        # leader: tunggu sebentar supaya penulis lain ikut 1 fsync
+        time.sleep(self.group_commit_window)
+
+        with self._cond:
+            pending = self._buf
+            self._buf = []
+            first = self._settled + 1
+            upto = self._enqueued
+
+        error = None
+        try:
+            with open(self.journal_file, "a") as f:
+                f.writelines(pending)
+                f.flush()
+                os.fsync(f.fileno())
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            with self._cond:
+                self._settled = upto
+                if error is None:
+                    self._durable = upto
+                    self._journal_lines += len(pending)
+                elif upto > first:
+                    # follower di grup ini ikut gagal (leader raise sendiri)
+                    self._failed.append({"from": first, "upto": upto, "error": error, "left": upto - first})
+                self._leader = False
+                self._cond.notify_all()
+
+        if self._journal_lines >= self.compact_every:
+            self.compact()
+
+    def _failure(self, batch):
+        """
+        Error grup yang memuat batch ini (None kalau sukses).
+        Dipanggil dengan _cond dipegang.
+        """
+        for failed in self._failed:
+            if failed["from"] <= batch <= failed["upto"]:
+                failed["left"] -= 1
+                if not failed["left"]:
+                    self._failed.remove(failed)
+                return failed["error"]
+        return None
+
+    # =========================
+    # COMPACTION
+    # =========================
+    def compact(self):
+        """
+        Gulung journal ke snapshot baru lalu kosongkan journal.
+        Replay bersifat idempotent, jadi crash di antara dua langkah aman.
+        """
+        with self._cond:
+            while self._leader:
+                self._cond.wait()
+            self._leader = True
+
+        try:
+            state = self.load()
+
+            tmp = self.snapshot_file + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump(state, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.snapshot_file)
+
+            with open(self.journal_file, "w") as f:
+                f.flush()
+                os.fsync(f.fileno())
+        finally:
+            with self._cond:
+                self._journal_lines = 0
+                self._leader = False
+                self._cond.notify_all()
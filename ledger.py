@@ -0,0 +1,238 @@
+import json
+import os
+import threading
+from datetime import datetime
+from config import LEDGER_DIR, LEDGER_SNAPSHOT_EVERY
+
+# =========================
+# LEDGER SALDO (DOUBLE ENTRY)
+# =========================
+# Setiap perubahan saldo = 1 entry dengan 2 leg yang jumlahnya nol:
+#   legs: [["user:123", +50000], ["kas_fiat", -50000]]
+# Entry disimpan per user di ledger/<uid>.log (append-only),
+# jadi menulis ledger user A tidak pernah menyentuh file user B.
+# Tiap LEDGER_SNAPSHOT_EVERY entry ditulis ledger/<uid>.snap berisi
+# saldo + offset file, audit cukup replay tail setelah snapshot.
+
+# akun lawan per alasan perubahan saldo
+CONTRA_ACCOUNTS = {
+    "saldo_awal": "ekuitas_awal",
+    "topup": "kas_fiat",
+    "withdraw": "kas_fiat",
+    "buy": "penjualan_crypto",
+    "buy_rollback": "penjualan_crypto",
+    "buy_refund": "penjualan_crypto",
+    "sell": "pembelian_crypto",
+}
+
+_lock = threading.Lock()
+_flush_lock = threading.Lock()
+_users = {}       # uid → {"seq", "balance", "since_snap"}
+_pending = {}     # uid → [entry, ...] belum ditulis ke disk
+_loaded = False   # True setelah load(): uid tanpa state = user baru, tanpa baca disk
+
+
+def _log_file(uid):
+    return os.path.join(LEDGER_DIR, f"{uid}.log")
+
+
+def _snap_file(uid):
+    return os.path.join(LEDGER_DIR, f"{uid}.snap")
+
+
+def _read_snapshot(uid):
+    try:
+        with open(_snap_file(uid), "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {"seq": 0, "balance": 0, "offset": 0}
+
+
+def _read_tail(uid, offset):
+    """
+    Baca entry setelah offset snapshot (maksimal ~LEDGER_SNAPSHOT_EVERY baris)
+    """
+    entries = []
+    try:
+        with open(_log_file(uid), "rb") as f:
+            f.seek(offset)
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    break
+    except FileNotFoundError:
+        pass
+    return entries
+
+
+def _read_state(uid):
+    snap = _read_snapshot(uid)
+    tail = _read_tail(uid, snap["offset"])
+    return {
+        "seq": tail[-1]["seq"] if tail else snap["seq"],
+        "balance": tail[-1]["balance"] if tail else snap["balance"],
+        "since_snap": len(tail),
+    }
+
+
+def load():
+    """
+    Baca state semua user sekali saat start (init_db), supaya record()
+    yang jalan di event loop tidak pernah baca disk
+    """
+    global _loaded
+    uids = set()
+    if os.path.isdir(LEDGER_DIR):
+        for name in os.listdir(LEDGER_DIR):
+            uid, ext = os.path.splitext(name)
+            if ext in (".log", ".snap"):
+                uids.add(uid)
+
+    states = {uid: _read_state(uid) for uid in uids}
+    with _lock:
+        for uid, st in states.items():
+            _users.setdefault(uid, st)
+        _loaded = True
+
+
+def _state(uid):
+    st = _users.get(uid)
+    if st is None:
+        # sudah load() → belum ada file ledger, tidak perlu cek disk
+        st = {"seq": 0, "balance": 0, "since_snap": 0} if _loaded else _read_state(uid)
+        _users[uid] = st
+    return st
+
+
+# =========================
+# RECORD
+# =========================
+def record(user_id, amount, balance, reason, ref=None):
+    """
+    Catat perubahan saldo (amount bertanda, balance = saldo sesudah).
+    Hanya antri di memory, ditulis ke disk oleh flush().
+    """
+    uid = str(user_id)
+    contra = CONTRA_ACCOUNTS.get(reason, reason)
+
+    with _lock:
+        st = _state(uid)
+        queue = _pending.setdefault(uid, [])
+
+        # user lama yang belum punya ledger: buka dengan saldo awal
+        opening = balance - amount
+        if st["seq"] == 0 and not queue and opening != 0:
+            queue.append(_entry(st, uid, opening, opening, "saldo_awal", None))
+
+        queue.append(_entry(st, uid, amount, balance, reason, ref, contra))
+
+
+def _entry(st, uid, amount, balance, reason, ref, contra=None):
+    st["seq"] += 1
+    st["balance"] = balance
+    return {
+        "seq": st["seq"],
+        "time": datetime.now().isoformat(),
+        "reason": reason,
+        "ref": ref,
+        "legs": [[f"user:{uid}", amount], [contra or CONTRA_ACCOUNTS[reason], -amount]],
+        "balance": balance,
+    }
+
+
+# =========================
+# FLUSH (1 FILE PER USER)
+# =========================
+def flush():
+    """
+    Tulis semua entry yang antri. Aman dipanggil dari thread.
+    """
+    with _flush_lock:
+        with _lock:
+            pending = dict(_pending)
+            _pending.clear()
+
+        if not pending:
+            return
+
+        try:
+            os.makedirs(LEDGER_DIR, exist_ok=True)
+            _write_pending(pending)
+        except Exception:
+            # entry yang belum tertulis masuk antrian lagi (di depan entry
+            # baru), dicoba flush berikutnya; tidak boleh hilang
+            with _lock:
+                for uid, entries in pending.items():
+                    _pending[uid] = entries + _pending.get(uid, [])
+            raise
+
+
+def _write_pending(pending):
+    """
+    Uid yang sudah tertulis dibuang dari pending, sisanya di-requeue flush()
+    """
+    for uid in list(pending):
+        entries = pending[uid]
+        data = "".join(json.dumps(e, separators=(",", ":")) + "\n" for e in entries)
+
+        with open(_log_file(uid), "a") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+            offset = f.tell()
+        del pending[uid]
+
+        with _lock:
+            st = _users[uid]
+            st["since_snap"] += len(entries)
+            take_snapshot = st["since_snap"] >= LEDGER_SNAPSHOT_EVERY
+            if take_snapshot:
+                st["since_snap"] = 0
+
+        if take_snapshot:
+            last = entries[-1]
+            _write_snapshot(uid, {"seq": last["seq"], "balance": last["balance"], "offset": offset})
+
+
+def _write_snapshot(uid, snap):
+    tmp = _snap_file(uid) + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(snap, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, _snap_file(uid))
+
+
+# =========================
+# AUDIT
+# =========================
+def replay(user_id):
+    """
+    Hitung ulang saldo: snapshot terakhir + jumlah leg user di tail.
+    Return (saldo, jumlah entry yang di-replay). Baca disk → jalankan di pool disk.
+    """
+    uid = str(user_id)
+    with _flush_lock:
+        snap = _read_snapshot(uid)
+        tail = _read_tail(uid, snap["offset"])
+        with _lock:
+            tail += _pending.get(uid, [])
+
+    balance = snap["balance"]
+    for e in tail:
+        balance += e["legs"][0][1]
+    return balance, len(tail)
+
+
+def history(user_id, limit=10):
+    """
+    Entry terakhir user (dari tail setelah snapshot + antrian)
+    """
+    uid = str(user_id)
+    with _flush_lock:
+        snap = _read_snapshot(uid)
+        entries = _read_tail(uid, snap["offset"])
+        with _lock:
+            entries += _pending.get(uid, [])
+    return entries[-limit:]
@@ -0,0 +1,130 @@
+import time
+from config import LIQUIDITY_REFRESH_INTERVAL, LIQUIDITY_RESERVE_TTL
+
+# =========================
+# LIKUIDITAS HOT WALLET
+# =========================
+# Saldo hot wallet per (network, token) disimpan di memory dan di-refresh
+# job background, jadi cek likuiditas di buy_amount tidak perlu RPC.
+# Buy yang sudah lolos cek memegang reservasi sampai payout terkirim
+# (atau kadaluarsa setelah LIQUIDITY_RESERVE_TTL), sehingga 2 user tidak
+# bisa sama-sama lolos cek untuk saldo yang sama.
+#   tersedia = saldo on-chain - payout in-flight - reservasi aktif user lain
+# Payout yang sudah terkirim tapi belum mined masih termasuk saldo "latest"
+# hasil refresh, jadi dicatat sebagai in-flight per order sampai receipts.py
+# memutuskan order itu (confirmed / failed). Sesaat setelah mined dan sebelum
+# receipt dibaca jumlahnya terhitung dua kali (lebih konservatif, bukan lebih).
+
+
+class LiquidityTracker:
+    def __init__(self, reserve_ttl):
+        self.reserve_ttl = reserve_ttl
+        self._balances = {}       # (network, token) → (saldo, waktu refresh)
+        self._reservations = {}   # (network, token) → {owner: (jumlah, expire)}
+        self._inflight = {}       # (network, token) → {order id: jumlah} payout belum mined
+
+    def _active(self, key, now):
+        reserved = self._reservations.get(key, {})
+        for owner in [o for o, (_, exp) in reserved.items() if exp <= now]:
+            del reserved[owner]
+        return reserved
+
+    # =========================
+    # SALDO
+    # =========================
+    def set_balance(self, network, token, balance):
+        self._balances[(network, token)] = (float(balance), time.time())
+
+    def balance(self, network, token):
+        entry = self._balances.get((network, token))
+        return entry[0] if entry else None
+
+    def available(self, network, token, owner=None):
+        """
+        Saldo yang masih bisa dijanjikan (None kalau saldo belum pernah dibaca)
+        """
+        key = (network, token)
+        balance = self.balance(network, token)
+        if balance is None:
+            return None
+        reserved = self._active(key, time.time())
+        return balance - self.inflight(network, token) - sum(a for o, (a, _) in reserved.items() if o != owner)
+
+    def inflight(self, network, token):
+        return sum(self._inflight.get((network, token), {}).values())
+
+    # =========================
+    # RESERVASI
+    # =========================
+    def reserve(self, network, token, amount, owner):
+        """
+        Pegang amount untuk owner (menggantikan reservasi owner sebelumnya).
+        Return (berhasil, tersedia)
+        """
+        available = self.available(network, token, owner)
+        if available is None or amount > available:
+            return False, available or 0
+
+        reserved = self._reservations.setdefault((network, token), {})
+        reserved[owner] = (amount, time.time() + self.reserve_ttl)
+        return True, available
+
+    def release(self, network, token, owner):
+        self._reservations.get((network, token), {}).pop(owner, None)
+
+    def release_all(self, owner):
+        for reserved in self._reservations.values():
+            reserved.pop(owner, None)
+
+    def spent(self, network, token, amount, ref, owner=None):
+        """
+        Payout terkirim: lepas reservasi owner, jumlahnya jadi in-flight
+        (ref = id order) sampai settled() dipanggil receipts
+        """
+        if owner is not None:
+            self.release(network, token, owner)
+        self._inflight.setdefault((network, token), {})[str(ref)] = amount
+
+    def settled(self, network, token, ref):
+        """
+        Order sudah confirmed (saldo refresh sudah berkurang) / failed (token tidak keluar)
+        """
+        self._inflight.get((network, token), {}).pop(str(ref), None)
+
+    def snapshot(self):
+        now = time.time()
+        return {
+            key: {
+                "balance": balance,
+                "reserved": sum(a for a, _ in self._active(key, now).values()),
+                "inflight": self.inflight(*key),
+                "updated": updated,
+            }
+            for key, (balance, updated) in self._balances.items()
+        }
+
+
+liquidity = LiquidityTracker(LIQUIDITY_RESERVE_TTL)
+
+
+# =========================
+# REFRESH SALDO
+# =========================
+# Saldo dibaca lewat treasury (Multicall3), 1 RPC per network.
+async def refresh_balance(network, token):
+    from treasury import snapshot_network
+
+    balances = await snapshot_network(network)
+    return balances.get(token)
+
+
+async def liquidity_refresh_job(context):
+    from treasury import snapshot
+
+    _, errors = await snapshot()
+    for network, e in errors.items():
+        print(f"⚠️ Error refresh saldo hot wallet {network}:", e)
+
+
+def start_liquidity_refresher(app, interval=LIQUIDITY_REFRESH_INTERVAL):
+    app.job_queue.run_repeating(liquidity_refresh_job, interval=interval, first=0)
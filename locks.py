@@ -0,0 +1,75 @@
+import asyncio
+from contextlib import asynccontextmanager
+from functools import wraps
+
+# =========================
+# PER-USER LOCK MANAGER
+# =========================
+# Update dari user berbeda jalan paralel (concurrent_updates),
+# update dari user yang sama yang mengubah saldo jalan berurutan.
+
+
+class UserLockManager:
+    def __init__(self):
+        self._locks = {}
+        self._refs = {}
+
+    @asynccontextmanager
+    async def hold(self, key):
+        key = str(key)
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        self._refs[key] = self._refs.get(key, 0) + 1
+
+        try:
+            async with lock:
+                yield
+        finally:
+            # buang lock yang sudah tidak dipakai supaya dict tidak tumbuh terus
+            self._refs[key] -= 1
+            if self._refs[key] == 0:
+                del self._refs[key]
+                del self._locks[key]
+
+    def active(self):
+        return len(self._locks)
+
+
+user_locks = UserLockManager()
+
+
+def user_lock(user_id):
+    return user_locks.hold(user_id)
+
+
+# =========================
+# DECORATOR HANDLER
+# =========================
+def per_user(handler):
+    """
+    Serialisasi handler per user yang mengirim update
+    """
+    @wraps(handler)
+    async def wrapper(update, context, *args, **kwargs):
+        async with user_lock(update.effective_user.id):
+            return await handler(update, context, *args, **kwargs)
+    return wrapper
+
+
+def per_key(key_fn):
+    """
+    Serialisasi handler per key hasil key_fn(update, context),
+    misalnya user pemilik topup / withdraw di callback admin.
+    key None → handler jalan tanpa lock.
+    """
+    def decorator(handler):
+        @wraps(handler)
+        async def wrapper(update, context, *args, **kwargs):
+            key = key_fn(update, context)
+            if key is None:
+                return await handler(update, context, *args, **kwargs)
+            async with user_lock(key):
+                return await handler(update, context, *args, **kwargs)
+        return wrapper
+    return decorator
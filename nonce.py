@@ -0,0 +1,138 @@
+import threading
+from config import BOT_WALLET
+
+# =========================
+# NONCE MANAGER (HOT WALLET)
+# =========================
+# Nonce dibagi di memory per RPC, tidak lagi get_transaction_count per kirim.
+#   - pertama kali dipakai → sync dari jumlah tx "pending" wallet bot
+#   - allocate() atomic → 2 payout bersamaan tidak pernah dapat nonce sama
+#   - kirim gagal sebelum masuk mempool (build / sign / ditolak node)
+#     → release(), nonce itu dipakai lagi oleh kirim berikutnya supaya tidak
+#     ada celah (tx sesudahnya macet)
+#   - error "nonce too low" dll → resync dari chain
+#   - timeout / koneksi putus saat send_raw_transaction → tx mungkin sudah
+#     di mempool: nonce TIDAK di-release, resync dari "pending" dan pemanggil
+#     dapat BroadcastUnknown (order dilacak lewat receipt, bukan dibatalkan)
+
+
+class NonceManager:
+    def __init__(self, address):
+        self.address = address
+        self._lock = threading.Lock()
+        self._next = {}       # key → nonce berikutnya
+        self._released = {}   # key → set nonce yang batal dipakai (celah)
+
+    def _key(self, w3):
+        return getattr(w3.provider, "endpoint_uri", None) or id(w3)
+
+    def _seed(self, key, pending):
+        # chain lebih maju (ada tx dari luar bot) → ikut chain
+        self._next[key] = max(pending, self._next.get(key, 0))
+        self._released[key] = {n for n in self._released.get(key, ()) if n >= pending}
+
+    def _sync(self, w3, key):
+        self._seed(key, w3.eth.get_transaction_count(self.address, "pending"))
+
+    def _take(self, key):
+        released = self._released[key]
+        if released:
+            nonce = min(released)
+            released.discard(nonce)
+            return nonce
+
+        nonce = self._next[key]
+        self._next[key] += 1
+        return nonce
+
+    def allocate(self, w3):
+        key = self._key(w3)
+        with self._lock:
+            if key not in self._next:
+                self._sync(w3, key)
+            return self._take(key)
+
+    async def allocate_async(self, w3):
+        """
+        Sama seperti allocate, untuk AsyncWeb3 (nonce dibagi dengan versi sync
+        karena key = URL RPC)
+        """
+        key = self._key(w3)
+        if key not in self._next:
+            pending = await w3.eth.get_transaction_count(self.address, "pending")
+            with self._lock:
+                if key not in self._next:
+                    self._seed(key, pending)
+        with self._lock:
+            return self._take(key)
+
+    def release(self, w3, nonce):
+        """
+        Tx dengan nonce ini tidak jadi terkirim
+        """
+        key = self._key(w3)
+        with self._lock:
+            released = self._released.setdefault(key, set())
+            released.add(nonce)
+            # celah di ujung → cukup mundurkan counter
+            while self._next.get(key, 0) - 1 in released:
+                self._next[key] -= 1
+                released.discard(self._next[key])
+
+    def forget(self, w3):
+        """
+        Buang state nonce RPC ini, allocate berikutnya sync ulang dari chain
+        """
+        key = self._key(w3)
+        with self._lock:
+            self._next.pop(key, None)
+            self._released.pop(key, None)
+
+    def resync(self, w3):
+        key = self._key(w3)
+        with self._lock:
+            self._next.pop(key, None)
+            self._released.pop(key, None)
+            self._sync(w3, key)
+
+    async def resync_async(self, w3):
+        key = self._key(w3)
+        pending = await w3.eth.get_transaction_count(self.address, "pending")
+        with self._lock:
+            self._next.pop(key, None)
+            self._released.pop(key, None)
+            self._seed(key, pending)
+
+
+class BroadcastUnknown(Exception):
+    """
+    send_raw_transaction gagal tanpa jawaban pasti dari node (timeout,
+    koneksi putus): tx dengan hash + nonce ini mungkin sudah tersiar.
+    Jangan rollback; lacak receipt-nya.
+    """
+    def __init__(self, tx_hash, nonce, error, batched=False, index=0):
+        super().__init__(f"TX belum pasti terkirim ({error})")
+        self.tx_hash = tx_hash
+        self.nonce = nonce
+        self.error = error
+        self.batched = batched
+        self.index = index
+
+
+def is_nonce_error(error):
+    msg = str(error).lower()
+    return any(s in msg for s in ("nonce too low", "already known", "replacement transaction underpriced"))
+
+
+def is_rejected(error):
+    """
+    Node menjawab dengan error JSON-RPC (insufficient funds, gas, ...) →
+    tx pasti tidak masuk mempool node itu
+    """
+    if getattr(error, "rpc_response", None):   # web3 v7 (Web3RPCError)
+        return True
+    arg = error.args[0] if isinstance(error, ValueError) and error.args else None
+    return isinstance(arg, dict) and "message" in arg   # web3 v6
+
+
+nonces = NonceManager(BOT_WALLET)
@@ -0,0 +1,240 @@
+import asyncio
+import time
+from web3 import Web3
+from chain import chain
+from nonce import BroadcastUnknown
+from config import (
+    BOT_WALLET,
+    DISPERSE_CONTRACTS,
+    PAYOUT_BATCH_WINDOW,
+    PAYOUT_BATCH_MAX,
+    PAYOUT_DIRECT_MIN_RP
+)
+
+# =========================
+# PAYOUT BATCHER (DISPERSE)
+# =========================
+# Payout buy dikumpulkan per (network, token) selama PAYOUT_BATCH_WINDOW
+# detik lalu dibayar dalam 1 tx ke kontrak disperse (disperse.app):
+#   disperseToken(token, [penerima], [jumlah]) / disperseEther([penerima], [jumlah])
+# N buy → 1 tx, 1 nonce, 1 base fee. Tiap penerima tetap dapat tx hash
+# batch + posisinya, jadi order bisa dilacak.
+#
+# Langsung transfer biasa (tanpa batch) kalau:
+#   - network belum punya kontrak di DISPERSE_CONTRACTS
+#   - order besar (>= PAYOUT_DIRECT_MIN_RP)
+#   - tx batch gagal SEBELUM terkirim (build, approve, nonce, ditolak node)
+#     → semua item di batch dikirim satu per satu
+# Kalau kirim tx batch sendiri tidak pasti (timeout / koneksi putus,
+# BroadcastUnknown) tx itu mungkin sudah tersiar: item TIDAK dikirim ulang,
+# semua future gagal dengan BroadcastUnknown(batched, index) supaya order
+# dilacak lewat receipt / dicek admin, bukan dibayar dua kali.
+# DISPERSE_CONTRACTS bisa diarahkan ke kontrak di node lokal (anvil) untuk tes.
+
+DISPERSE_ABI = [
+    {
+        "name": "disperseEther",
+        "type": "function",
+        "stateMutability": "payable",
+        "inputs": [
+            {"name": "recipients", "type": "address[]"},
+            {"name": "values", "type": "uint256[]"}
+        ],
+        "outputs": []
+    },
+    {
+        "name": "disperseToken",
+        "type": "function",
+        "stateMutability": "nonpayable",
+        "inputs": [
+            {"name": "token", "type": "address"},
+            {"name": "recipients", "type": "address[]"},
+            {"name": "values", "type": "uint256[]"}
+        ],
+        "outputs": []
+    }
+]
+
+ALLOWANCE_ABI = [
+    {
+        "name": "allowance",
+        "type": "function",
+        "stateMutability": "view",
+        "inputs": [
+            {"name": "_owner", "type": "address"},
+            {"name": "_spender", "type": "address"}
+        ],
+        "outputs": [{"name": "", "type": "uint256"}]
+    },
+    {
+        "name": "approve",
+        "type": "function",
+        "stateMutability": "nonpayable",
+        "inputs": [
+            {"name": "_spender", "type": "address"},
+            {"name": "_value", "type": "uint256"}
+        ],
+        "outputs": [{"name": "", "type": "bool"}]
+    }
+]
+
+MAX_UINT = 2 ** 256 - 1
+GAS_BASE = 60000
+GAS_PER_RECIPIENT = 40000
+
+
+class Payout:
+    def __init__(self, ref, to, amount, decimals):
+        self.ref = ref              # referensi order, mis. "buy:USDT:BEP20:0x..."
+        self.to = Web3.to_checksum_address(to)
+        self.amount = amount
+        self.decimals = decimals
+        self.value = int(amount * (10 ** decimals))
+        self.future = asyncio.get_running_loop().create_future()
+
+
+class PayoutBatcher:
+    def __init__(self, contracts, window, max_batch):
+        self.contracts = contracts
+        self.window = window
+        self.max_batch = max_batch
+        self._queues = {}       # (network, token_address) → [Payout]
+        self._timers = {}       # (network, token_address) → asyncio.TimerHandle
+        self._approved = set()  # (network, token_address) yang sudah approve ke kontrak
+        self.recent = []        # batch terakhir: {"tx_hash", "network", "items": [(ref, to, amount)]}
+
+    # =========================
+    # API
+    # =========================
+    async def pay(self, token_address, to, amount, decimals, network, ref=None, amount_rp=0):
+        """
+        Return {"tx_hash", "nonce", "batched", "index"} setelah payout terkirim.
+        Raise kalau gagal (caller yang rollback saldo), BroadcastUnknown
+        kalau tx mungkin sudah tersiar (caller jangan rollback).
+        """
+        if amount_rp >= PAYOUT_DIRECT_MIN_RP or not self.contracts.get(network):
+            sent = await chain.send_token(token_address, to, amount, decimals, network=network)
+            return {**sent, "batched": False, "index": 0}
+
+        key = (network, token_address)
+        item = Payout(ref, to, amount, decimals)
+        queue = self._queues.setdefault(key, [])
+        queue.append(item)
+
+        if len(queue) >= self.max_batch:
+            self._flush_soon(key)
+        elif key not in self._timers:
+            loop = asyncio.get_running_loop()
+            self._timers[key] = loop.call_later(self.window, self._flush_soon, key)
+
+        return await item.future
+
+    def _flush_soon(self, key):
+        timer = self._timers.pop(key, None)
+        if timer:
+            timer.cancel()
+        items = self._queues.pop(key, [])
+        if items:
+            asyncio.ensure_future(self._flush(key, items))
+
+    # =========================
+    # KIRIM BATCH
+    # =========================
+    async def _flush(self, key, items):
+        network, token_address = key
+
+        if len(items) == 1:
+            await self._send_single(token_address, network, items[0])
+            return
+
+        try:
+            sent = await self._send_batch(network, token_address, items)
+        except BroadcastUnknown as e:
+            print(f"⚠️ Batch payout {network} belum pasti terkirim, tidak dikirim ulang:", e)
+            for index, item in enumerate(items):
+                if not item.future.done():
+                    item.future.set_exception(
+                        BroadcastUnknown(e.tx_hash, e.nonce, e.error, batched=True, index=index)
+                    )
+            return
+        except Exception as e:
+            print(f"⚠️ Batch payout {network} gagal, kirim satu per satu:", e)
+            for item in items:
+                await self._send_single(token_address, network, item)
+            return
+
+        self.recent = (self.recent + [{
+            "tx_hash": sent["tx_hash"],
+            "network": network,
+            "time": time.time(),
+            "items": [(i.ref, i.to, i.amount) for i in items],
+        }])[-50:]
+
+        for index, item in enumerate(items):
+            if not item.future.done():
+                item.future.set_result({**sent, "batched": True, "index": index})
+
+    async def _send_single(self, token_address, network, item):
+        try:
+            sent = await chain.send_token(token_address, item.to, item.amount, item.decimals, network=network)
+        except Exception as e:
+            if not item.future.done():
+                item.future.set_exception(e)
+            return
+        if not item.future.done():
+            item.future.set_result({**sent, "batched": False, "index": 0})
+
+    async def _send_batch(self, network, token_address, items):
+        disperse = Web3.to_checksum_address(self.contracts[network])
+        recipients = [i.to for i in items]
+        values = [i.value for i in items]
+        gas = GAS_BASE + GAS_PER_RECIPIENT * len(items)
+
+        def contract(w3):
+            return w3.eth.contract(address=disperse, abi=DISPERSE_ABI)
+
+        if token_address is None:
+            return await chain.send_call(
+                lambda w3: contract(w3).functions.disperseEther(recipients, values),
+                gas=gas,
+                value=sum(values),
+                network=network
+            )
+
+        token = Web3.to_checksum_address(token_address)
+        try:
+            await self._ensure_allowance(network, token, disperse, sum(values))
+        except BroadcastUnknown as e:
+            # approve tidak membayar siapa pun → batch belum terkirim, aman fallback
+            raise Exception(f"Approve disperse belum pasti terkirim: {e}") from e
+        return await chain.send_call(
+            lambda w3: contract(w3).functions.disperseToken(token, recipients, values),
+            gas=gas,
+            network=network
+        )
+
+    async def _ensure_allowance(self, network, token, spender, total):
+        """
+        Kontrak disperse menarik token via transferFrom → perlu approve sekali.
+        Nonce approve < nonce batch, jadi approve pasti diproses duluan.
+        """
+        if (network, token) in self._approved:
+            return
+
+        def erc20(w3):
+            return w3.eth.contract(address=token, abi=ALLOWANCE_ABI)
+
+        allowance = await chain.call(
+            lambda w3: erc20(w3).functions.allowance(Web3.to_checksum_address(BOT_WALLET), spender),
+            network=network
+        )
+        if allowance < total:
+            await chain.send_call(
+                lambda w3: erc20(w3).functions.approve(spender, MAX_UINT),
+                gas=80000,
+                network=network
+            )
+        self._approved.add((network, token))
+
+
+payouts = PayoutBatcher(DISPERSE_CONTRACTS, PAYOUT_BATCH_WINDOW, PAYOUT_BATCH_MAX)
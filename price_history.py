@@ -0,0 +1,133 @@
+import os
+import time
+import numpy as np
+from config import COINGECKO_IDS, PRICE_HISTORY_SIZE, PRICE_HISTORY_FILE
+
+# =========================
+# RIWAYAT HARGA (RING BUFFER)
+# =========================
+# Tiap symbol punya 2 array NumPy ukuran tetap (timestamp, harga).
+# Append O(1), statistik window (TWAP, min/max, volatilitas) dihitung
+# vektor sekaligus. Disimpan ke file .npz supaya tetap ada setelah restart.
+
+
+class PriceRing:
+    def __init__(self, size):
+        self.size = size
+        self.ts = np.zeros(size, dtype=np.float64)
+        self.px = np.zeros(size, dtype=np.float64)
+        self.head = 0
+        self.count = 0
+
+    def append(self, ts, price):
+        self.ts[self.head] = ts
+        self.px[self.head] = price
+        self.head = (self.head + 1) % self.size
+        self.count = min(self.count + 1, self.size)
+
+    def ordered(self):
+        """
+        Data urut dari yang paling lama
+        """
+        if self.count < self.size:
+            return self.ts[:self.count], self.px[:self.count]
+        return (
+            np.concatenate((self.ts[self.head:], self.ts[:self.head])),
+            np.concatenate((self.px[self.head:], self.px[:self.head]))
+        )
+
+    def last(self):
+        if not self.count:
+            return None
+        return float(self.px[self.head - 1])
+
+    def _window(self, seconds, now):
+        ts, px = self.ordered()
+        start = now - seconds
+        # ikutkan titik terakhir sebelum window: harga itu masih berlaku di awal window
+        i = max(int(np.searchsorted(ts, start, side="right")) - 1, 0)
+        return ts[i:], px[i:], start
+
+    def twap(self, seconds, now=None):
+        now = now or time.time()
+        ts, px, start = self._window(seconds, now)
+        if not len(ts):
+            return None
+
+        t = np.maximum(ts, start)
+        dt = np.diff(np.append(t, now))
+        total = dt.sum()
+        if total <= 0:
+            return float(px[-1])
+        return float(np.dot(px, dt) / total)
+
+    def stats(self, seconds, now=None):
+        now = now or time.time()
+        ts, px, _ = self._window(seconds, now)
+        if not len(px):
+            return None
+
+        returns = np.diff(np.log(px[px > 0])) if len(px) > 1 else np.zeros(0)
+        return {
+            "n": int(len(px)),
+            "last": float(px[-1]),
+            "twap": self.twap(seconds, now),
+            "min": float(px.min()),
+            "max": float(px.max()),
+            # standar deviasi log return per titik, dalam persen
+            "volatility": float(returns.std() * 100) if len(returns) else 0.0,
+        }
+
+
+class PriceHistory:
+    def __init__(self, symbols, size, path):
+        self.path = path
+        self.rings = {s: PriceRing(size) for s in symbols}
+
+    def record(self, prices, ts=None):
+        ts = ts or time.time()
+        for s, price in prices.items():
+            ring = self.rings.get(s)
+            if ring is not None and price:
+                ring.append(ts, price)
+
+    def twap(self, symbol, seconds):
+        ring = self.rings.get(symbol)
+        return ring.twap(seconds) if ring else None
+
+    def stats(self, symbol, seconds):
+        ring = self.rings.get(symbol)
+        return ring.stats(seconds) if ring else None
+
+    # =========================
+    # PERSIST (BINARY .npz)
+    # =========================
+    def save(self):
+        arrays = {}
+        for s, ring in self.rings.items():
+            ts, px = ring.ordered()
+            arrays[f"{s}_ts"] = ts
+            arrays[f"{s}_px"] = px
+
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, **arrays)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with np.load(self.path) as data:
+                for s, ring in self.rings.items():
+                    if f"{s}_ts" not in data:
+                        continue
+                    for ts, px in zip(data[f"{s}_ts"], data[f"{s}_px"]):
+                        ring.append(float(ts), float(px))
+        except Exception as e:
+            print("⚠️ Gagal load riwayat harga:", e)
+
+
+price_history = PriceHistory(list(COINGECKO_IDS), PRICE_HISTORY_SIZE, PRICE_HISTORY_FILE)
@@ -0,0 +1,253 @@
+import asyncio
+import statistics
+from http_client import http
+from config import (
+    COINGECKO_IDS,
+    PRICE_SOURCES,
+    PRICE_QUORUM,
+    PRICE_HEDGE_DELAY,
+    PRICE_FETCH_TIMEOUT,
+    PRICE_OUTLIER_PCT,
+    COINGECKO_URL,
+    INDODAX_URL,
+    COINBASE_URL,
+    CMC_URL,
+    CMC_API_KEY
+)
+
+# =========================
+# SUMBER HARGA (PLUGGABLE)
+# =========================
+# Tiap sumber cukup punya name + async fetch(symbols) → {symbol: harga_idr}.
+# Urutan di PRICE_SOURCES = prioritas, contoh:
+#   PRICE_SOURCES=coingecko,indodax,coinbase,cmc
+#   PRICE_SOURCES=json:http://127.0.0.1:9001/prices,json:http://127.0.0.1:9002/prices
+# (sumber "json:<url>" membaca {"USDT": 16000, ...}, cocok untuk stub server lokal)
+
+
+class PriceSource:
+    name = "base"
+
+    async def fetch(self, symbols):
+        raise NotImplementedError
+
+
+class CoinGeckoSource(PriceSource):
+    name = "coingecko"
+
+    def __init__(self, url=COINGECKO_URL):
+        self.url = url
+
+    async def fetch(self, symbols):
+        ids = [COINGECKO_IDS.get(s, s.lower()) for s in symbols]
+        data = await http.get_json(self.url, params={"ids": ",".join(ids), "vs_currencies": "idr"})
+
+        result = {}
+        for s in symbols:
+            price = data.get(COINGECKO_IDS.get(s, s.lower()), {}).get("idr")
+            if price is not None:
+                result[s] = float(price)
+        return result
+
+
+class IndodaxSource(PriceSource):
+    name = "indodax"
+
+    def __init__(self, url=INDODAX_URL):
+        self.url = url
+
+    async def fetch(self, symbols):
+        tickers = (await http.get_json(self.url)).get("tickers", {})
+
+        result = {}
+        for s in symbols:
+            ticker = tickers.get(f"{s.lower()}_idr")
+            if ticker and ticker.get("last"):
+                result[s] = float(ticker["last"])
+        return result
+
+
+class CoinbaseSource(PriceSource):
+    """
+    Tanpa API key, jadi selalu ada sebagai cadangan hedge. 1 request per symbol.
+    """
+    name = "coinbase"
+
+    def __init__(self, url=COINBASE_URL):
+        self.url = url
+
+    async def _one(self, symbol):
+        data = await http.get_json(self.url, params={"currency": symbol})
+        rate = data.get("data", {}).get("rates", {}).get("IDR")
+        return float(rate) if rate is not None else None
+
+    async def fetch(self, symbols):
+        rates = await asyncio.gather(*(self._one(s) for s in symbols), return_exceptions=True)
+        result = {s: r for s, r in zip(symbols, rates) if isinstance(r, float)}
+        if not result and rates and isinstance(rates[0], Exception):
+            raise rates[0]
+        return result
+
+
+class CoinMarketCapSource(PriceSource):
+    name = "cmc"
+
+    def __init__(self, api_key=CMC_API_KEY, url=CMC_URL):
+        self.api_key = api_key
+        self.url = url
+
+    async def fetch(self, symbols):
+        data = await http.get_json(
+            self.url,
+            params={"symbol": ",".join(symbols), "convert": "IDR"},
+            headers={"X-CMC_PRO_API_KEY": self.api_key}
+        )
+
+        result = {}
+        for s, item in data.get("data", {}).items():
+            if isinstance(item, list):
+                item = item[0] if item else {}
+            price = item.get("quote", {}).get("IDR", {}).get("price")
+            if s in symbols and price is not None:
+                result[s] = float(price)
+        return result
+
+
+class JsonUrlSource(PriceSource):
+    def __init__(self, url):
+        self.url = url
+        self.name = f"json:{url}"
+
+    async def fetch(self, symbols):
+        data = await http.get_json(self.url)
+        return {s: float(data[s]) for s in symbols if data.get(s) is not None}
+
+
+def build_sources(spec=PRICE_SOURCES):
+    sources = []
+    for item in filter(None, (x.strip() for x in spec.split(","))):
+        if item.startswith("json:"):
+            sources.append(JsonUrlSource(item[len("json:"):]))
+        elif item == "coingecko":
+            sources.append(CoinGeckoSource())
+        elif item == "indodax":
+            sources.append(IndodaxSource())
+        elif item == "coinbase":
+            sources.append(CoinbaseSource())
+        elif item == "cmc" and CMC_API_KEY:
+            sources.append(CoinMarketCapSource())
+        elif item != "cmc":
+            print(f"⚠️ Sumber harga tidak dikenal: {item}")
+    return sources
+
+
+# =========================
+# AGGREGATOR (HEDGED + MEDIAN)
+# =========================
+class PriceAggregator:
+    """
+    Mulai dari `quorum` sumber teratas. Kalau belum cukup jawaban dalam
+    hedge_delay, atau ada sumber gagal / tidak sepakat, sumber cadangan
+    berikutnya ikut ditanya. Hasil = median setelah outlier dibuang.
+    Fail closed: symbol tanpa `quorum` sumber yang sepakat tidak diberi
+    harga (pricing tetap pakai harga cache / trade ditolak kalau basi).
+    """
+    def __init__(self, sources, quorum, hedge_delay, timeout, outlier_pct):
+        self.sources = sources
+        self.quorum = max(1, quorum)
+        if len(sources) < self.quorum:
+            print(f"⚠️ Sumber harga ({len(sources)}) kurang dari quorum ({self.quorum}), harga tidak akan pernah sepakat")
+        elif len(sources) == self.quorum:
+            print("⚠️ Tidak ada sumber harga cadangan, 1 sumber gagal = harga tidak diperbarui")
+        self.hedge_delay = hedge_delay
+        self.timeout = timeout
+        self.outlier_pct = outlier_pct
+
+    async def _ask(self, source, symbols):
+        try:
+            return await source.fetch(symbols)
+        except Exception as e:
+            print(f"⚠️ Error fetch price {source.name}:", e)
+            return None
+
+    def _combine(self, answers, symbols):
+        """
+        Return (harga, symbol yang belum bisa diputuskan)
+        """
+        prices, unresolved = {}, []
+        for s in symbols:
+            values = [a[s] for a in answers if a.get(s)]
+            if not values:
+                unresolved.append(s)
+                continue
+
+            med = statistics.median(values)
+            kept = [v for v in values if abs(v - med) / med * 100 <= self.outlier_pct]
+
+            if len(kept) >= self.quorum:
+                prices[s] = statistics.median(kept)
+            else:
+                unresolved.append(s)
+        return prices, unresolved
+
+    async def fetch(self, symbols):
+        if not self.sources:
+            raise Exception("Tidak ada sumber harga")
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+        backups = list(self.sources)
+        pending, answers = set(), []
+
+        def launch(n=1):
+            for _ in range(n):
+                if backups:
+                    src = backups.pop(0)
+                    pending.add(asyncio.ensure_future(self._ask(src, symbols)))
+
+        launch(self.quorum)
+
+        try:
+            while pending:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+
+                wait = min(self.hedge_delay, remaining) if backups else remaining
+                done, pending = await asyncio.wait(pending, timeout=wait, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    # latency budget habis → hedge ke sumber cadangan
+                    launch()
+                    continue
+
+                for task in done:
+                    result = task.result()
+                    if result:
+                        answers.append(result)
+                    else:
+                        launch()
+
+                prices, unresolved = self._combine(answers, symbols)
+                if not unresolved:
+                    return prices
+                if not pending:
+                    launch()
+        finally:
+            for task in pending:
+                task.cancel()
+
+        # waktu habis: hanya symbol yang sudah quorum, sisanya tidak diberi harga
+        prices, _ = self._combine(answers, symbols)
+        if not prices:
+            raise Exception("Semua sumber harga gagal / tidak sepakat")
+        return prices
+
+
+aggregator = PriceAggregator(
+    build_sources(),
+    PRICE_QUORUM,
+    PRICE_HEDGE_DELAY,
+    PRICE_FETCH_TIMEOUT,
+    PRICE_OUTLIER_PCT
+)
@@ -0,0 +1,275 @@
+import asyncio
+import threading
+import time
+import requests
+from price_sources import aggregator
+from price_history import price_history
+from executors import get_pool, PoolBusy
+from config import (
+    COINGECKO_URL,
+    COINGECKO_IDS,
+    RATE_RP,
+    PRICE_CACHE_TTL,
+    PRICE_MAX_STALE,
+    PRICE_STALE_AFTER,
+    PRICE_USE_TWAP,
+    PRICE_TWAP_WINDOW,
+    get_realtime_price_async
+)
+
+# =========================
+# PRICE CACHE (TTL + SINGLE-FLIGHT)
+# =========================
+# Harga disimpan per symbol dengan waktu fetch.
+#   umur < TTL         → langsung dari cache
+#   TTL <= umur < MAX  → harga lama dipakai, refresh jalan di background
+#   tidak ada / > MAX  → fetch sekarang
+# Hanya 1 request upstream yang jalan pada satu waktu (single-flight),
+# pemanggil lain menunggu hasil request yang sama. Tiap fetch mengambil
+# semua token di COINGECKO_IDS sekaligus.
+#
+# Saat bot jalan, price_refresh_job (JobQueue) yang refresh harga dan
+# handler hanya membaca snapshot (mode background, tanpa request sama sekali).
+# Snapshot lebih tua dari PRICE_STALE_AFTER → RATE_RP + tanda harga cadangan.
+#
+# Versi async (get_async / refresh_async) memakai http_client yang pooled,
+# jadi fetch harga tidak pernah mem-block event loop. Harga async diambil
+# dari beberapa sumber sekaligus lewat price_sources.aggregator (median).
+#
+# Setiap harga yang berhasil di-refresh juga dicatat ke price_history
+# (ring buffer), dipakai untuk /harga dan harga TWAP buy/sell.
+# Buy/sell (get_trade_price) tidak pernah memakai harga cadangan: harga basi
+# → PriceUnavailable, transaksi ditolak sebelum saldo berubah.
+
+
+def fetch_coingecko(symbols):
+    """
+    1 request ke Coingecko, return {symbol: price_idr} (yang tersedia saja)
+    """
+    ids = [COINGECKO_IDS.get(s, s.lower()) for s in symbols]
+    params = {"ids": ",".join(ids), "vs_currencies": "idr"}
+    res = requests.get(COINGECKO_URL, params=params, timeout=5)
+    data = res.json()
+
+    result = {}
+    for s in symbols:
+        price = data.get(COINGECKO_IDS.get(s, s.lower()), {}).get("idr")
+        if price is not None:
+            result[s] = float(price)
+    return result
+
+
+class PriceCache:
+    def __init__(self, fetcher, async_fetcher, ttl, max_stale, stale_after):
+        self.fetcher = fetcher
+        self.async_fetcher = async_fetcher
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.stale_after = stale_after
+        self.background = False   # True → hanya refresher job yang fetch
+        self.updated_at = None    # waktu (epoch) snapshot terakhir berhasil
+        self.upstream_calls = 0
+
+        self._lock = threading.Lock()
+        self._entries = {}       # symbol → (price, fetched_at)
+        self._inflight = None    # threading.Event milik fetch yang sedang jalan
+        self._failed_at = None   # fetch gagal → jangan retry sebelum TTL lewat
+        self._async_inflight = None  # asyncio.Task fetch async yang sedang jalan
+
+    def _age(self, symbol, now):
+        entry = self._entries.get(symbol)
+        return now - entry[1] if entry else None
+
+    def _refresh(self, symbols):
+        """
+        Single-flight: kalau sudah ada fetch jalan, tunggu hasilnya saja
+        """
+        with self._lock:
+            event = self._inflight
+            leader = event is None
+            if leader:
+                event = self._inflight = threading.Event()
+
+        if not leader:
+            event.wait(timeout=10)
+            return
+
+        try:
+            wanted = sorted(set(COINGECKO_IDS) | set(symbols))
+            self.upstream_calls += 1
+            self._publish(self.fetcher(wanted))
+        except Exception as e:
+            self._failed(e)
+        finally:
+            with self._lock:
+                self._inflight = None
+            event.set()
+
+    def _publish(self, prices):
+        now = time.monotonic()
+        with self._lock:
+            for s, price in prices.items():
+                self._entries[s] = (price, now)
+            self._failed_at = None
+            self.updated_at = time.time()
+        price_history.record(prices, self.updated_at)
+
+    def _failed(self, e):
+        print("⚠️ Error fetch price:", e)
+        with self._lock:
+            self._failed_at = time.monotonic()
+
+    # =========================
+    # ASYNC (EVENT LOOP)
+    # =========================
+    async def refresh_async(self, symbols=()):
+        """
+        Single-flight versi asyncio: semua pemanggil menunggu task yang sama
+        """
+        task = self._async_inflight
+        if task is None or task.done():
+            task = self._async_inflight = asyncio.ensure_future(self._fetch_async(symbols))
+        await asyncio.shield(task)
+
+    async def _fetch_async(self, symbols):
+        try:
+            wanted = sorted(set(COINGECKO_IDS) | set(symbols))
+            self.upstream_calls += 1
+            self._publish(await self.async_fetcher(wanted))
+        except Exception as e:
+            self._failed(e)
+
+    async def get_async(self, symbols):
+        if self.background:
+            return self._read(symbols, self.stale_after)
+
+        now = time.monotonic()
+        with self._lock:
+            ages = {s: self._age(s, now) for s in symbols}
+            backoff = self._failed_at is not None and now - self._failed_at < self.ttl
+        refreshing = self._async_inflight is not None and not self._async_inflight.done()
+
+        missing = [s for s, age in ages.items() if age is None or age >= self.max_stale]
+        stale = [s for s, age in ages.items() if age is not None and self.ttl <= age < self.max_stale]
+
+        if backoff:
+            pass
+        elif missing:
+            await self.refresh_async(symbols)
+        elif stale and not refreshing:
+            # stale-while-revalidate
+            self._async_inflight = asyncio.ensure_future(self._fetch_async(symbols))
+
+        return self._read(symbols, self.max_stale)
+
+    def is_stale(self, symbols=None):
+        symbols = symbols or list(COINGECKO_IDS)
+        limit = self.stale_after if self.background else self.max_stale
+        now = time.monotonic()
+        with self._lock:
+            return any(
+                self._age(s, now) is None or self._age(s, now) >= limit
+                for s in symbols
+            )
+
+    def get(self, symbols):
+        if self.background:
+            return self._read(symbols, self.stale_after)
+
+        now = time.monotonic()
+        with self._lock:
+            ages = {s: self._age(s, now) for s in symbols}
+            refreshing = self._inflight is not None
+            backoff = self._failed_at is not None and now - self._failed_at < self.ttl
+
+        missing = [s for s, age in ages.items() if age is None or age >= self.max_stale]
+        stale = [s for s, age in ages.items() if age is not None and self.ttl <= age < self.max_stale]
+
+        if backoff:
+            pass
+        elif missing:
+            self._refresh(symbols)
+        elif stale and not refreshing:
+            # stale-while-revalidate
+            try:
+                get_pool("price").submit(self._refresh, symbols)
+            except PoolBusy:
+                pass
+
+        return self._read(symbols, self.max_stale)
+
+    def _read(self, symbols, limit):
+        now = time.monotonic()
+        with self._lock:
+            result = {}
+            for s in symbols:
+                age = self._age(s, now)
+                if age is not None and age < limit:
+                    result[s] = self._entries[s][0]
+                else:
+                    # fallback
+                    result[s] = float(RATE_RP.get(s, 0))
+            return result
+
+
+price_cache = PriceCache(
+    fetch_coingecko,
+    aggregator.fetch,
+    PRICE_CACHE_TTL,
+    PRICE_MAX_STALE,
+    PRICE_STALE_AFTER
+)
+
+
+# =========================
+# BACKGROUND REFRESHER
+# =========================
+async def price_refresh_job(context):
+    await price_cache.refresh_async()
+
+
+def start_price_refresher(app, interval):
+    price_cache.background = True
+    app.job_queue.run_repeating(price_refresh_job, interval=interval, first=0)
+
+
+def price_note(symbols=None):
+    """
+    Tanda untuk pesan user kalau harga yang tampil adalah harga cadangan
+    """
+    if not price_cache.is_stale(symbols):
+        return ""
+    return "\n⚠️ Harga cadangan (data harga realtime sedang tidak tersedia)"
+
+
+# =========================
+# HARGA TRANSAKSI (SPOT / TWAP)
+# =========================
+PRICE_UNAVAILABLE_MESSAGE = "⚠️ Harga realtime sedang tidak tersedia, transaksi ditunda. Coba lagi beberapa saat lagi."
+
+
+class PriceUnavailable(Exception):
+    """
+    Harga realtime basi / tidak ada → buy/sell ditolak (fail closed),
+    harga cadangan RATE_RP hanya untuk tampilan
+    """
+
+
+async def get_trade_price(symbol):
+    """
+    Harga untuk buy/sell. Kalau PRICE_USE_TWAP aktif, pakai TWAP
+    PRICE_TWAP_WINDOW detik terakhir (tahan lonjakan sesaat), selain itu
+    harga spot biasa. Raise PriceUnavailable kalau harga basi atau <= 0.
+    """
+    spot = await get_realtime_price_async(symbol)
+    if price_cache.is_stale([symbol]) or not spot or spot <= 0:
+        raise PriceUnavailable(f"Harga {symbol} tidak tersedia")
+    if not PRICE_USE_TWAP:
+        return spot
+
+    twap = price_history.twap(symbol, PRICE_TWAP_WINDOW)
+    return twap or spot
+
+
+async def price_history_save_job(context):
+    await get_pool("disk").run(price_history.save)
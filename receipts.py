@@ -0,0 +1,290 @@
+import asyncio
+import time
+from datetime import datetime
+from config import (
+    BOT_WALLET,
+    TRANSACTION_CHANNEL_ID,
+    BLOCK_TIMES,
+    RECEIPT_MIN_INTERVAL,
+    RECEIPT_MAX_BACKOFF,
+    RECEIPT_BATCH_MAX,
+    RECEIPT_TIMEOUT
+)
+from database import load_db, save_db, add_balance, set_status, list_by_status
+from executors import PoolBusy
+from locks import user_lock
+from liquidity import liquidity
+
+# =========================
+# RECEIPT TRACKER (PAYOUT BUY)
+# =========================
+# Tiap payout buy dicatat sebagai order "sent" + tx hash. Per network ada
+# 1 task yang membaca receipt SEMUA hash pending dalam 1 request batch
+# JSON-RPC (maks RECEIPT_BATCH_MAX hash per request), jadi jumlah RPC tetap
+# walau ratusan payout menunggu. Beberapa order bisa berbagi 1 hash (batch
+# disperse) → hash hanya ditanya sekali.
+#   status 1  → order "confirmed"
+#   status 0  → order "failed", saldo user dikembalikan (buy_refund)
+#   tanpa receipt > RECEIPT_TIMEOUT → "stuck", user + admin dikabari. Tidak
+#     di-refund otomatis: TX yang sudah tersiar bisa saja masih ter-mine dan
+#     user dapat token + saldo. Admin menindaklanjuti lewat /buyrefund [order]
+#     (refund_stuck): refund (buy_rollback) hanya kalau receipt tetap tidak
+#     ada DAN nonce payout sudah terpakai tx lain (eth_getTransactionCount
+#     "latest" > nonce order) → tx itu tidak mungkin ter-mine lagi.
+#     RPC yang "lupa" tx (getTransactionByHash null) bukan bukti tx batal.
+# Interval polling mulai dari block time network, dobel tiap putaran tanpa
+# receipt baru (maks RECEIPT_MAX_BACKOFF x), reset saat ada payout baru.
+# Saat start, order "sent" di DB didaftarkan ulang.
+
+
+class ReceiptTracker:
+    def __init__(self, block_times, batch_max, timeout):
+        self.block_times = block_times
+        self.batch_max = batch_max
+        self.timeout = timeout
+        self._pending = {}   # network → {tx_hash: {"since", "orders": [oid]}}
+        self._tasks = {}     # network → asyncio.Task
+        self._reset = set()  # network yang baru dapat hash → interval direset
+        self._bot = None
+
+    def start(self, app):
+        self._bot = app.bot
+        db = load_db()
+        for oid, rec in list_by_status(db, "orders", "sent"):
+            if rec.get("tx_hash") and rec.get("network"):
+                liquidity.spent(rec["network"], rec["token"], rec["token_amount"], oid)
+                self.track(rec["network"], rec["tx_hash"], oid)
+        # stuck: token mungkin masih keluar → tetap dihitung in-flight
+        for oid, rec in list_by_status(db, "orders", "stuck"):
+            if rec.get("network"):
+                liquidity.spent(rec["network"], rec["token"], rec["token_amount"], oid)
+
+    def track(self, network, tx_hash, oid):
+        entry = self._pending.setdefault(network, {}).setdefault(
+            tx_hash.lower(), {"since": time.time(), "orders": []}
+        )
+        entry["orders"].append(str(oid))
+        self._reset.add(network)
+
+        if network not in self._tasks:
+            self._tasks[network] = asyncio.ensure_future(self._run(network))
+
+    def pending(self):
+        return {n: sum(len(e["orders"]) for e in p.values()) for n, p in self._pending.items() if p}
+
+    # =========================
+    # POLLING
+    # =========================
+    async def _run(self, network):
+        base = max(RECEIPT_MIN_INTERVAL, self.block_times.get(network, self.block_times["default"]))
+        delay = base
+        try:
+            while self._pending.get(network):
+                if network in self._reset:
+                    self._reset.discard(network)
+                    delay = base
+                await asyncio.sleep(delay)
+
+                try:
+                    resolved = await self._poll(network)
+                except PoolBusy:
+                    resolved = 0
+                except Exception as e:
+                    print(f"⚠️ Error receipt tracker {network}:", e)
+                    resolved = 0
+
+                delay = base if resolved else min(delay * 2, base * RECEIPT_MAX_BACKOFF)
+        finally:
+            self._tasks.pop(network, None)
+
+    async def _poll(self, network):
+        from chain import chain
+
+        pending = self._pending[network]
+        hashes = list(pending)
+        resolved = 0
+
+        for i in range(0, len(hashes), self.batch_max):
+            chunk = hashes[i:i + self.batch_max]
+            receipts = await chain.batch([("eth_getTransactionReceipt", [h]) for h in chunk], network)
+
+            for tx_hash, receipt in zip(chunk, receipts):
+                entry = pending[tx_hash]
+                if receipt is None:
+                    if time.time() - entry["since"] > self.timeout:
+                        del pending[tx_hash]
+                        await self._stuck(network, tx_hash, entry["orders"])
+                    continue
+
+                del pending[tx_hash]
+                resolved += 1
+                await self._resolve(network, tx_hash, receipt, entry["orders"])
+
+        return resolved
+
+    # =========================
+    # UPDATE ORDER
+    # =========================
+    async def _resolve(self, network, tx_hash, receipt, oids):
+        ok = int(receipt.get("status") or "0x0", 16) == 1
+        block = int(receipt["blockNumber"], 16)
+        now = datetime.now().isoformat()
+
+        for oid in oids:
+            rec = load_db()["orders"].get(oid)
+            if not rec:
+                continue
+            uid = rec["user_id"]
+
+            # refund menyentuh saldo → lock user, sama seperti handler
+            async with user_lock(uid):
+                if rec.get("status") not in ("sent", "stuck"):
+                    continue
+                db = load_db()
+                if ok:
+                    set_status(db, "orders", oid, "confirmed", block=block, confirmed_at=now)
+                else:
+                    set_status(db, "orders", oid, "failed", block=block, failed_at=now)
+                    add_balance(db, uid, rec["amount_rp"], reason="buy_refund", ref=f"order:{oid}")
+                save_db(db)
+            liquidity.settled(rec["network"], rec["token"], oid)
+
+            await self._notify(oid, rec, ok, block)
+
+    async def _stuck(self, network, tx_hash, oids):
+        db = load_db()
+        stuck = []
+        for oid in oids:
+            rec = db["orders"].get(oid)
+            if rec and rec.get("status") == "sent":
+                set_status(db, "orders", oid, "stuck", stuck_at=datetime.now().isoformat())
+                stuck.append((oid, rec))
+        save_db(db)
+
+        if not self._bot:
+            return
+
+        for oid, rec in stuck:
+            await self._send(
+                rec["user_id"],
+                "⏳ *PAYOUT BELUM TERKONFIRMASI*\n\n"
+                f"Order        : #{oid}\n"
+                f"Token        : {rec['token']}\n"
+                f"Network      : {rec['network']}\n\n"
+                "TX belum masuk blok. Admin sedang mengecek; kalau TX batal,\n"
+                f"saldo Rp {rec['amount_rp']:,} dikembalikan.\n\n"
+                f"TX Hash:\n`{rec['tx_hash']}`"
+            )
+
+        if TRANSACTION_CHANNEL_ID:
+            await self._send(
+                TRANSACTION_CHANNEL_ID,
+                "⚠️ *PAYOUT TANPA RECEIPT*\n"
+                f"Network : {network}\n"
+                f"Order   : {', '.join(oid for oid, _ in stuck) or '-'}\n"
+                f"TX      : `{tx_hash}`\n"
+                "Cek manual lalu /buyrefund [order] kalau TX batal."
+            )
+
+    async def refund_stuck(self, oid):
+        """
+        Tindak lanjut order "stuck" (admin):
+          receipt ada             → diproses biasa (confirmed / failed + refund)
+          nonce belum terpakai    → "pending", jangan refund (masih bisa ter-mine)
+          nonce tidak tercatat    → "manual", cek sendiri di explorer
+          nonce sudah terpakai    → saldo dikembalikan (buy_rollback), "refunded"
+        Return status akhir, None kalau order bukan buy yang stuck.
+        """
+        from chain import chain
+
+        oid = str(oid)
+        rec = load_db()["orders"].get(oid)
+        if not rec or rec.get("type") != "buy" or rec.get("status") != "stuck":
+            return None
+
+        receipt, mined = await chain.batch([
+            ("eth_getTransactionReceipt", [rec["tx_hash"]]),
+            ("eth_getTransactionCount", [BOT_WALLET, "latest"]),
+        ], rec["network"])
+
+        if receipt is not None:
+            await self._resolve(rec["network"], rec["tx_hash"], receipt, [oid])
+            return load_db()["orders"][oid]["status"]
+        if rec.get("nonce") is None:
+            return "manual"
+        if int(mined, 16) <= rec["nonce"]:
+            return "pending"
+
+        # nonce sudah dipakai tx lain tapi receipt tx ini belum terlihat:
+        # cek ulang sekali (receipt bisa baru masuk di blok yang sama)
+        (receipt,) = await chain.batch([("eth_getTransactionReceipt", [rec["tx_hash"]])], rec["network"])
+        if receipt is not None:
+            await self._resolve(rec["network"], rec["tx_hash"], receipt, [oid])
+            return load_db()["orders"][oid]["status"]
+
+        uid = rec["user_id"]
+        async with user_lock(uid):
+            if rec.get("status") != "stuck":
+                return rec.get("status")
+            db = load_db()
+            set_status(db, "orders", oid, "refunded", refunded_at=datetime.now().isoformat())
+            add_balance(db, uid, rec["amount_rp"], reason="buy_rollback", ref=f"order:{oid}")
+            save_db(db)
+        liquidity.settled(rec["network"], rec["token"], oid)
+
+        if self._bot:
+            await self._send(
+                uid,
+                "↩️ *PAYOUT DIBATALKAN*\n\n"
+                f"Order        : #{oid}\n"
+                f"Token        : {rec['token']}\n"
+                f"Saldo dikembalikan: Rp {rec['amount_rp']:,}"
+            )
+        return "refunded"
+
+    # =========================
+    # NOTIFIKASI
+    # =========================
+    async def _notify(self, oid, rec, ok, block):
+        if not self._bot:
+            return
+
+        if ok:
+            text = (
+                "✅ *BELI BERHASIL (TERKONFIRMASI)*\n\n"
+                f"Order        : #{oid}\n"
+                f"Token        : {rec['token']}\n"
+                f"Jumlah       : {rec['token_amount']:.6f}\n"
+                f"Network      : {rec['network']}\n"
+                f"Blok         : {block}\n\n"
+                f"TX Hash:\n`{rec['tx_hash']}`"
+            )
+        else:
+            text = (
+                "❌ *PAYOUT GAGAL DI BLOCKCHAIN*\n\n"
+                f"Order        : #{oid}\n"
+                f"Token        : {rec['token']}\n"
+                f"Network      : {rec['network']}\n"
+                f"Saldo dikembalikan: Rp {rec['amount_rp']:,}\n\n"
+                f"TX Hash:\n`{rec['tx_hash']}`"
+            )
+        await self._send(rec["user_id"], text)
+
+        if TRANSACTION_CHANNEL_ID:
+            await self._send(
+                TRANSACTION_CHANNEL_ID,
+                ("✅ *BUY CONFIRMED*\n" if ok else "❌ *BUY FAILED (REFUND)*\n")
+                + f"Order : #{oid}\n"
+                f"User  : `{rec['user_id']}`\n"
+                f"Blok  : {block}\n"
+                f"TX    : `{rec['tx_hash']}`"
+            )
+
+    async def _send(self, chat_id, text):
+        try:
+            await self._bot.send_message(chat_id, text, parse_mode="Markdown")
+        except Exception as e:
+            print("⚠️ Gagal kirim notifikasi receipt:", e)
+
+
+receipts = ReceiptTracker(BLOCK_TIMES, RECEIPT_BATCH_MAX, RECEIPT_TIMEOUT)
@@ -0,0 +1,256 @@
+import asyncio
+import threading
+import time
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+from web3 import AsyncWeb3, AsyncHTTPProvider, Web3
+from web3.middleware import async_geth_poa_middleware, geth_poa_middleware
+from config import RPC_POOL_SIZE, RPC_POOL_SIZES, RPC_TIMEOUT, RPC_MAX_FAILURES
+
+# =========================
+# WEB3 POOL (1 CLIENT PER RPC)
+# =========================
+# Web3 + requests.Session dibuat sekali per URL RPC lalu dipakai ulang,
+# jadi koneksi HTTP (keep-alive) tetap hangat antar buy / sell / cek saldo.
+# Ukuran pool koneksi per network diatur di RPC_POOL_SIZES.
+# Setiap request RPC dicatat (ok / gagal). Setelah RPC_MAX_FAILURES gagal
+# berturut-turut client dibuang dan dibuat ulang di pemakaian berikutnya.
+# Client async (AsyncWeb3 + aiohttp, dipakai chain.py) ada di registry yang
+# sama: health dicatat dengan cara yang sama, tampil di /rpc, dan ikut
+# dibuang + dibuat ulang oleh invalidate() / "/rpc reset".
+
+
+class _Health:
+    kind = "sync"
+
+    def __init__(self, network, url):
+        self.network = network
+        self.url = url
+        self.created = time.time()
+        self.requests = 0
+        self.failures = 0         # gagal berturut-turut
+        self.last_ok = None
+        self.last_error = None
+
+
+class _Client(_Health):
+    def __init__(self, network, url, size):
+        super().__init__(network, url)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.w3 = Web3(Web3.HTTPProvider(
+            url,
+            request_kwargs={"timeout": RPC_TIMEOUT},
+            session=self.session
+        ))
+        # ✅ FIX UNTUK BSC / POA CHAIN
+        self.w3.middleware_onion.inject(geth_poa_middleware, layer=0)
+
+    def close(self):
+        self.session.close()
+
+
+class _AsyncClient(_Health):
+    kind = "async"
+
+    def __init__(self, network, url, size):
+        super().__init__(network, url)
+        self.loop = asyncio.get_running_loop()
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=size),
+            timeout=aiohttp.ClientTimeout(total=RPC_TIMEOUT)
+        )
+        self.provider = AsyncHTTPProvider(
+            url,
+            request_kwargs={"timeout": aiohttp.ClientTimeout(total=RPC_TIMEOUT)}
+        )
+        self.w3 = AsyncWeb3(self.provider)
+        # ✅ FIX UNTUK BSC / POA CHAIN
+        self.w3.middleware_onion.inject(async_geth_poa_middleware, layer=0)
+        self.ready = asyncio.ensure_future(self.provider.cache_async_session(self.session))
+
+    def close(self):
+        # bisa dipanggil dari thread mana saja, session ditutup di loop pemiliknya
+        if self.loop.is_closed():
+            return
+        self.loop.call_soon_threadsafe(lambda: asyncio.ensure_future(self.session.close()))
+
+    async def aclose(self):
+        await self.session.close()
+
+
+class Web3Pool:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clients = {}         # url → _Client
+        self._async_clients = {}   # url → _AsyncClient
+
+    def _client(self, url, network):
+        with self._lock:
+            client = self._clients.get(url)
+            if client is None:
+                size = RPC_POOL_SIZES.get(network, RPC_POOL_SIZE)
+                client = self._clients[url] = _Client(network, url, size)
+                client.w3.middleware_onion.add(self._health_middleware(client), name="health")
+            return client
+
+    def get(self, url, network=None):
+        return self._client(url, network).w3
+
+    async def _async_client(self, url, network):
+        with self._lock:
+            client = self._async_clients.get(url)
+            if client is None:
+                size = RPC_POOL_SIZES.get(network, RPC_POOL_SIZE)
+                client = self._async_clients[url] = _AsyncClient(network, url, size)
+                client.w3.middleware_onion.add(self._async_health_middleware(client), name="health")
+        await asyncio.shield(client.ready)
+        return client
+
+    async def get_async(self, url, network=None):
+        """
+        AsyncWeb3 untuk url ini (dibuat ulang setelah invalidate)
+        """
+        return (await self._async_client(url, network)).w3
+
+    def batch(self, url, calls, network=None):
+        """
+        Kirim beberapa call JSON-RPC dalam 1 HTTP request.
+        calls: [(method, params), ...] → list result mentah (urutan sama).
+        Error per call dikembalikan sebagai None.
+        """
+        client = self._client(url, network)
+        client.requests += 1
+        try:
+            res = client.session.post(url, json=_batch_payload(calls), timeout=RPC_TIMEOUT)
+            res.raise_for_status()
+            replies = res.json()
+        except Exception as e:
+            self._failed(client, e)
+            raise
+        client.failures = 0
+        client.last_ok = time.time()
+        return _batch_results(calls, replies)
+
+    async def batch_async(self, url, calls, network=None):
+        """
+        Versi async dari batch(), lewat session aiohttp client async
+        """
+        client = await self._async_client(url, network)
+        client.requests += 1
+        try:
+            async with client.session.post(url, json=_batch_payload(calls)) as res:
+                res.raise_for_status()
+                replies = await res.json(content_type=None)
+        except Exception as e:
+            self._failed(client, e)
+            raise
+        client.failures = 0
+        client.last_ok = time.time()
+        return _batch_results(calls, replies)
+
+    def _health_middleware(self, client):
+        def factory(make_request, w3):
+            def middleware(method, params):
+                client.requests += 1
+                try:
+                    response = make_request(method, params)
+                except Exception as e:
+                    self._failed(client, e)
+                    raise
+                client.failures = 0
+                client.last_ok = time.time()
+                return response
+            return middleware
+        return factory
+
+    def _async_health_middleware(self, client):
+        async def factory(make_request, w3):
+            async def middleware(method, params):
+                client.requests += 1
+                try:
+                    response = await make_request(method, params)
+                except Exception as e:
+                    self._failed(client, e)
+                    raise
+                client.failures = 0
+                client.last_ok = time.time()
+                return response
+            return middleware
+        return factory
+
+    def _failed(self, client, error):
+        client.failures += 1
+        client.last_error = f"{type(error).__name__}: {error}"
+        if client.failures >= RPC_MAX_FAILURES:
+            print(f"⚠️ RPC {client.network or client.url} gagal {client.failures}x, koneksi dibuat ulang")
+            self.invalidate(client.url)
+
+    def invalidate(self, url=None):
+        """
+        Buang client sync + async (url=None → semua). Request berikutnya membuat client baru.
+        """
+        with self._lock:
+            clients = []
+            for registry in (self._clients, self._async_clients):
+                if url is None:
+                    clients += registry.values()
+                    registry.clear()
+                elif url in registry:
+                    clients.append(registry.pop(url))
+        for client in clients:
+            client.close()
+
+    async def close_async(self):
+        """
+        Tutup semua session aiohttp (saat bot berhenti)
+        """
+        with self._lock:
+            clients = list(self._async_clients.values())
+            self._async_clients.clear()
+        for client in clients:
+            await client.aclose()
+
+    def health(self):
+        with self._lock:
+            return [
+                {
+                    "kind": c.kind,
+                    "network": c.network,
+                    "url": c.url,
+                    "requests": c.requests,
+                    "failures": c.failures,
+                    "last_ok": c.last_ok,
+                    "last_error": c.last_error,
+                }
+                for c in [*self._clients.values(), *self._async_clients.values()]
+            ]
+
+
+def _batch_payload(calls):
+    return [
+        {"jsonrpc": "2.0", "id": i, "method": method, "params": params}
+        for i, (method, params) in enumerate(calls)
+    ]
+
+
+def _batch_results(calls, replies):
+    """
+    Balasan batch → list result sesuai urutan calls (error per call → None)
+    """
+    if not isinstance(replies, list):
+        # RPC tidak mendukung batch
+        raise Exception(replies.get("error", {}).get("message", "RPC batch tidak didukung"))
+
+    results = [None] * len(calls)
+    for reply in replies:
+        if isinstance(reply.get("id"), int) and reply["id"] < len(calls):
+            results[reply["id"]] = reply.get("result")
+    return results
+
+
+web3_pool = Web3Pool()
@@ -1,83 +1,16 @@
 from maintenance import check_maintenance
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 from web3 import Web3
-from config import CRYPTO_LIST, TOKEN_CONTRACTS, BOT_WALLET, BSC_RPC, TRANSACTION_CHANNEL_ID, FEATURES_ENABLED, MIN_SELL_FEE_RP, RPC_BY_NETWORK, get_realtime_price
-from database import load_db, save_db
+from config import CRYPTO_LIST, TOKEN_CONTRACTS, BOT_WALLET, BSC_RPC, TRANSACTION_CHANNEL_ID, FEATURES_ENABLED, MIN_SELL_FEE_RP, RPC_BY_NETWORK, DEPOSIT_CONFIRMATIONS, get_realtime_price_async
+from database import load_db, save_db, get_user, add_balance, lock_tx, is_tx_used
+from pricing import price_note, get_trade_price, PriceUnavailable, PRICE_UNAVAILABLE_MESSAGE
 from states import SELL_SENDER, SELL_AMOUNT, SELL_TX
 from datetime import datetime
-from wallet import get_w3
-from web3.middleware import geth_poa_middleware
-
-TRANSFER_TOPIC = Web3.keccak(text="Transfer(address,address,uint256)").hex()
-
-# =========================
-# GET TOKEN AMOUNT FROM TX
-# =========================
-def get_token_amount_from_tx(
-    tx_hash,
-    token_address,
-    bot_wallet,
-    sender_wallet,
-    decimals,
-    w3
-):
-    tx = w3.eth.get_transaction(tx_hash)
-    receipt = w3.eth.get_transaction_receipt(tx_hash)
-
-    if not receipt or receipt.status != 1:
-        raise Exception("TX gagal atau belum confirmed")
-
-    # =========================
-    # ✅ NATIVE COIN (ETH / BNB)
-    # =========================
-    if token_address is None:
-        if tx["to"] is None:
-            raise Exception("TX contract creation tidak valid")
-
-        if tx["from"].lower() != sender_wallet.lower():
-            raise Exception("Alamat pengirim tidak sesuai")
-
-        if tx["to"].lower() != bot_wallet.lower():
-            raise Exception("Wallet tujuan tidak sesuai")
-
-        return w3.from_wei(tx["value"], "ether")
-
-    # =========================
-    # ✅ ERC20 TOKEN
-    # =========================
-    transfer_topic = Web3.keccak(
-        text="Transfer(address,address,uint256)"
-    ).hex()
-
-    total_amount = 0
-
-    for log in receipt.logs:
-        if log.address.lower() != token_address.lower():
-            continue
-
-        if log.topics[0].hex() != transfer_topic:
-            continue
-
-        from_addr = Web3.to_checksum_address(
-            "0x" + log.topics[1].hex()[-40:]
-        )
-        to_addr = Web3.to_checksum_address(
-            "0x" + log.topics[2].hex()[-40:]
-        )
-
-        if from_addr.lower() != sender_wallet.lower():
-            continue
-
-        if to_addr.lower() != bot_wallet.lower():
-            continue
-
-        amount_int = int.from_bytes(log.data, byteorder="big")
-        total_amount += amount_int
-
-    if total_amount == 0:
-        raise Exception("Transfer valid tidak ditemukan")
-
-    return total_amount / (10 ** decimals)
+from locks import per_user, per_key
+from dedupe import normalize as normalize_tx
+from executors import PoolBusy, BUSY_MESSAGE
+from tx_verify import verify_transfer_async
+from deposits import intents
 
 # =========================
 # START SELL
@@ -96,8 +29,9 @@ async def sell(update, context):
 
     # Tampilkan harga realtime token (opsional)
     try:
-        rates = get_realtime_price()
+        rates = await get_realtime_price_async()
         rate_text = "\n".join([f"{t}: Rp {int(rates.get(t,0)):,}" for t in CRYPTO_LIST])
+        rate_text += price_note(list(CRYPTO_LIST))
     except Exception:
         rate_text = "⚠️ Gagal fetch harga realtime"
 
@@ -158,12 +92,14 @@ async def sell_amount(update, context):
         return
 
     token = context.user_data["token"]
+    network = context.user_data["network"]
+    uid = str(update.effective_user.id)
 
 # =========================
     # ESTIMASI NILAI SELL
     # =========================
     try:
-        rates = get_realtime_price()
+        rates = await get_realtime_price_async()
         rate = rates.get(token, 0)
         gross_rp = int(amount_token * rate)
     except Exception:
@@ -182,6 +118,21 @@ async def sell_amount(update, context):
     # =========================
     # SIMPAN DATA (TIDAK MERUBAH SISTEM)
     # =========================
+    # jumlah + kode unik di digit terakhir → bukti transfer milik user ini
+    send_amount = intents.open(uid, token, network, context.user_data["sender_wallet"], amount_token, fee_rp)
+    await intents.save()   # kode unik harus tetap ada walau bot restart
+    if send_amount:
+        amount_token = float(send_amount)
+        confirmations = DEPOSIT_CONFIRMATIONS.get(network, DEPOSIT_CONFIRMATIONS["default"])
+        auto_note = (
+            "Kirim jumlah *PERSIS* seperti di atas (digit terakhir = kode unik),\n"
+            f"saldo masuk otomatis setelah {confirmations} konfirmasi blok,\n"
+            "atau kirim *TX HASH* di sini supaya langsung diproses."
+        )
+    else:
+        send_amount = amount_token
+        auto_note = "Setelah transfer, kirim *TX HASH* di sini."
+
     context.user_data["amount_token"] = amount_token
     context.user_data["gross_rp"] = gross_rp
     context.user_data["fee_rp"] = fee_rp
@@ -193,7 +144,7 @@ async def sell_amount(update, context):
 📤 *KIRIM TOKEN*
 
 Token        : {token}
-Jumlah       : {amount_token}
+Jumlah       : `{send_amount}`
 Estimasi Rp  : Rp {gross_rp:,}
 Fee admin    : Rp {fee_rp:,}
 Diterima     : Rp {net_rp:,}
@@ -201,7 +152,7 @@ Diterima     : Rp {net_rp:,}
 Silakan transfer token ke wallet BOT:
 `{BOT_WALLET}`
 
-Setelah transfer berhasil, kirim *TX HASH* di sini.
+{auto_note}
 """,
         parse_mode="Markdown"
     )
@@ -209,13 +160,30 @@ Setelah transfer berhasil, kirim *TX HASH* di sini.
 # =========================
 # PROCESS TX & ADD BALANCE
 # =========================
+def _sell_tx_key(update, context):
+    # verifikasi TX async → hash yang sama dari 2 user berbeda harus berurutan,
+    # kalau tidak keduanya bisa lolos is_tx_used sebelum lock_tx
+    # key dari hash yang sudah dinormalisasi (sama seperti lock_tx / dedupe),
+    # jadi "0xABC.." dan "abc.." dapat lock yang sama
+    if context.user_data.get("state") != SELL_TX or not update.message or not update.message.text:
+        return None
+    tx_hash = normalize_tx(update.message.text)
+    return f"tx:{tx_hash}" if tx_hash else None
+
+
+@per_user
+@per_key(_sell_tx_key)
 async def sell_tx(update, context):
     if context.user_data.get("state") != SELL_TX:
         return
 
-    tx_hash = update.message.text.strip()
+    tx_hash = normalize_tx(update.message.text)
     uid = str(update.effective_user.id)
 
+    if tx_hash is None:
+        await update.message.reply_text("❌ Format TX hash tidak valid, kirim ulang TX hash.")
+        return
+
     token = context.user_data["token"]
     network = context.user_data["network"]
     sender_wallet = context.user_data["sender_wallet"]
@@ -231,53 +199,33 @@ async def sell_tx(update, context):
         context.user_data.clear()
         return
 
-    db = load_db()
-    db.setdefault("_used_tx", {})
-
-    if tx_hash in db["_used_tx"]:
+    if is_tx_used(tx_hash):
         await update.message.reply_text("❌ TX ini sudah pernah digunakan")
         context.user_data.clear()
         return
 
     try:
-        w3 = get_w3(network)
         decimals = token_data["decimals"]
 
-        # =========================
-        # NATIVE COIN (ETH / BNB)
-        # =========================
-        if token_data["address"] is None:
-            tx = w3.eth.get_transaction(tx_hash)
-
-            if not tx:
-                raise Exception("TX tidak ditemukan")
-
-            if not tx.get("to") or tx["to"].lower() != BOT_WALLET.lower():
-                raise Exception("TX bukan ke wallet bot")
-
-            if tx["from"].lower() != sender_wallet.lower():
-                raise Exception("Pengirim TX tidak sesuai")
+        # tx + receipt dalam 1 batch RPC (async, loop tidak ter-block)
+        result = await verify_transfer_async(
+            tx_hash=tx_hash,
+            token_address=token_data["address"],
+            bot_wallet=BOT_WALLET,
+            sender_wallet=sender_wallet,
+            decimals=decimals,
+            network=network
+        )
+        if not result.ok:
+            raise Exception(result.reason)
 
-            amount_token = float(w3.from_wei(tx["value"], "ether"))
-
-        # =========================
-        # ERC20 TOKEN
-        # =========================
-        else:
-            amount_token = float(get_token_amount_from_tx(
-                tx_hash=tx_hash,
-                token_address=token_data["address"],
-                bot_wallet=BOT_WALLET,
-                sender_wallet=sender_wallet,
-                decimals=decimals,
-                w3=w3
-            ))
+        amount_token = result.amount
 
         # =========================
         # SAFE COMPARISON (WEI)
         # =========================
         expected_wei = int(expected_amount * (10 ** decimals))
-        actual_wei = int(amount_token * (10 ** decimals))
+        actual_wei = result.amount_raw
 
         # toleransi 0.5% (anti float & rounding)
         tolerance = max(1, expected_wei // 200)
@@ -287,6 +235,11 @@ async def sell_tx(update, context):
                 f"Jumlah token di TX ({amount_token}) kurang dari input sell ({expected_amount})"
             )
 
+    except PoolBusy:
+        # state tetap, user bisa kirim ulang TX hash
+        await update.message.reply_text(BUSY_MESSAGE)
+        return
+
     except Exception as e:
         await update.message.reply_text(
             f"❌ TX tidak valid atau tidak sesuai\n{str(e)}"
@@ -294,46 +247,63 @@ async def sell_tx(update, context):
         context.user_data.clear()
         return
 
+    credited = await credit_sell(
+        context.bot,
+        uid,
+        token,
+        network,
+        sender_wallet,
+        tx_hash,
+        amount_token,
+        int(context.user_data.get("fee_rp", MIN_SELL_FEE_RP))
+    )
+    # gagal kredit (mis. harga tidak tersedia) → intent + state tetap,
+    # user bisa kirim ulang TX hash yang sama
+    if credited:
+        intents.close(uid)
+        context.user_data.clear()
+
+
+# =========================
+# KREDIT SALDO SELL
+# =========================
+# Dipakai sell_tx (TX hash manual) dan deposit watcher (deteksi otomatis).
+# Pemanggil wajib memegang lock user + lock tx hash dan sudah cek is_tx_used.
+async def credit_sell(bot, uid, token, network, sender_wallet, tx_hash, amount_token, fee_rp, auto=False):
     # =========================
     # HITUNG NILAI RP (GROSS)
     # =========================
+    # harga basi / 0 → tidak dikredit (tidak pakai harga cadangan RATE_RP)
     try:
-        rates = get_realtime_price()
-        rp_value = int(amount_token * rates.get(token, 0))
-    except Exception:
+        rp_value = int(amount_token * await get_trade_price(token))
+    except PriceUnavailable:
         rp_value = 0
 
     if rp_value <= 0:
-        await update.message.reply_text("❌ Harga token tidak tersedia")
-        context.user_data.clear()
-        return
+        await bot.send_message(uid, PRICE_UNAVAILABLE_MESSAGE)
+        return False
 
     # =========================
     # FEE SELL
     # =========================
-    fee_rp = int(context.user_data.get("fee_rp", MIN_SELL_FEE_RP))
     net_rp = rp_value - fee_rp
 
     if net_rp <= 0:
-        await update.message.reply_text("❌ Nilai sell habis oleh fee admin")
-        context.user_data.clear()
-        return
+        await bot.send_message(uid, "❌ Nilai sell habis oleh fee admin")
+        return False
 
-  # =========================
+    # =========================
     # UPDATE USER BALANCE
     # =========================
-    db.setdefault("users", {})
-    if uid not in db["users"]:
-        db["users"][uid] = {"balance": 0, "wallet": None}
-
-    saldo_sebelum = int(db["users"][uid].get("balance", 0))
+    db = load_db()
+    saldo_sebelum = int(get_user(db, uid).get("balance", 0))
+    add_balance(db, uid, net_rp, reason="sell", ref=tx_hash)
     saldo_sesudah = saldo_sebelum + net_rp
-    db["users"][uid]["balance"] = saldo_sesudah
 
     # =========================
     # LOCK TX HASH (FINAL)
     # =========================
-    db["_used_tx"][tx_hash] = {
+    lock_tx(db, tx_hash, {
         "uid": uid,
         "token": token,
         "network": network,
@@ -341,17 +311,19 @@ async def sell_tx(update, context):
         "gross": rp_value,
         "fee": fee_rp,
         "net": net_rp,
+        "auto": auto,
         "time": datetime.now().isoformat()
-    }
+    })
 
     save_db(db)
-    context.user_data.clear()
 
     # =========================
     # OUTPUT USER
     # =========================
-    await update.message.reply_text(
-        "✅ *SELL BERHASIL (FULL VERIFIED)*\n\n"
+    title = "TERDETEKSI OTOMATIS" if auto else "FULL VERIFIED"
+    await bot.send_message(
+        uid,
+        f"✅ *SELL BERHASIL ({title})*\n\n"
         f"Pengirim     : `{sender_wallet}`\n"
         f"Token        : {token}\n"
         f"Jumlah token : {amount_token:.6f}\n"
@@ -367,7 +339,7 @@ async def sell_tx(update, context):
     # =========================
     # CHANNEL TRANSPARANSI
     # =========================
-    await context.bot.send_message(
+    await bot.send_message(
         TRANSACTION_CHANNEL_ID,
         "💸 *SELL TRANSACTION*\n"
         f"User ID : `{uid}`\n"
@@ -381,3 +353,13 @@ async def sell_tx(update, context):
         f"Waktu   : {datetime.now().strftime('%d-%m-%Y %H:%M:%S')}",
         parse_mode="Markdown"
     )
+    return True
+
+
+def clear_sell_state(app, uid):
+    """
+    Sell selesai lewat deposit watcher → user tidak perlu kirim TX hash lagi
+    """
+    data = app.user_data.get(int(uid))
+    if data and data.get("state") == SELL_TX:
+        data.clear()
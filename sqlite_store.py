@@ -0,0 +1,330 @@
+import json
+import sqlite3
+import sys
+import threading
+
+# =========================
+# SQLITE STORE
+# =========================
+# Backend alternatif untuk database.py (DB_BACKEND=sqlite).
+# Interface sama dengan JournalStore: load(), append(records), compact().
+# Bedanya, load() tidak membaca seluruh isi DB: tiap tabel berupa
+# SqliteTable yang mengambil record per key lewat primary key / index.
+
+# nama tabel di db dict → nama tabel SQL
+TABLES = {
+    "users": "users",
+    "topups": "topups",
+    "withdraws": "withdraws",
+    "orders": "orders",
+    "_used_tx": "used_tx",
+    "_seq": "sequences",
+}
+
+# kolom index per tabel SQL (selain id + data JSON)
+COLUMNS = {
+    "users": ("balance",),
+    "topups": ("user_id", "status", "created"),
+    "withdraws": ("user_id", "status", "created"),
+    "orders": ("user_id", "status", "created"),
+    "used_tx": ("user_id", "created"),
+    "sequences": (),
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id TEXT PRIMARY KEY,
+    balance INTEGER NOT NULL DEFAULT 0,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS topups (
+    id TEXT PRIMARY KEY,
+    user_id TEXT,
+    status TEXT,
+    created TEXT,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS withdraws (
+    id TEXT PRIMARY KEY,
+    user_id TEXT,
+    status TEXT,
+    created TEXT,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS orders (
+    id TEXT PRIMARY KEY,
+    user_id TEXT,
+    status TEXT,
+    created TEXT,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS used_tx (
+    id TEXT PRIMARY KEY,
+    user_id TEXT,
+    created TEXT,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sequences (
+    id TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS maintenance (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    data TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_topups_user ON topups(user_id);
+CREATE INDEX IF NOT EXISTS idx_topups_status ON topups(status);
+CREATE INDEX IF NOT EXISTS idx_topups_created ON topups(created);
+CREATE INDEX IF NOT EXISTS idx_withdraws_user ON withdraws(user_id);
+CREATE INDEX IF NOT EXISTS idx_withdraws_status ON withdraws(status);
+CREATE INDEX IF NOT EXISTS idx_withdraws_created ON withdraws(created);
+CREATE INDEX IF NOT EXISTS idx_orders_user ON orders(user_id);
+CREATE INDEX IF NOT EXISTS idx_orders_status ON orders(status);
+CREATE INDEX IF NOT EXISTS idx_orders_created ON orders(created);
+CREATE INDEX IF NOT EXISTS idx_used_tx_user ON used_tx(user_id);
+CREATE INDEX IF NOT EXISTS idx_used_tx_created ON used_tx(created);
+"""
+
+
+def _columns(name, rec):
+    """
+    Nilai kolom index tabel dari record (nama field beda-beda per tabel)
+    """
+    if not isinstance(rec, dict):
+        rec = {}
+    values = {
+        "balance": int(rec.get("balance", 0)),
+        "user_id": rec.get("user_id") or rec.get("buyer_id") or rec.get("uid"),
+        "status": rec.get("status"),
+        "created": rec.get("created") or rec.get("time"),
+    }
+    return [values[c] for c in COLUMNS[name]]
+
+
+# =========================
+# LAZY TABLE
+# =========================
+class SqliteTable(dict):
+    """
+    Dict yang isinya diambil dari SQLite saat dibutuhkan.
+    Lookup by key = 1 query primary key; iterasi baru memuat semua baris.
+    Perubahan tetap ditulis lewat database.touch() + save_db().
+    """
+    def __init__(self, store, table):
+        super().__init__()
+        self._store = store
+        self._table = table
+        self._all = False
+
+    def __missing__(self, key):
+        if self._all:
+            raise KeyError(key)
+        value = self._store.get(self._table, key)
+        if value is None:
+            raise KeyError(key)
+        dict.__setitem__(self, key, value)
+        return value
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        if dict.__contains__(self, key):
+            return True
+        return self.get(key) is not None
+
+    def preload(self):
+        """
+        Muat semua baris ke memory (mode resident)
+        """
+        self._load_all()
+
+    def by_status(self, status):
+        """
+        Record dengan status tertentu lewat index status SQLite (tanpa muat
+        seluruh tabel). Record yang sudah dimuat ke memory menang, karena
+        bisa sudah diubah tapi belum disimpan.
+        """
+        found = dict(self._store.select(self._table, status=status))
+        for key, rec in dict.items(self):
+            if rec.get("status") == status:
+                found[key] = rec
+            else:
+                found.pop(key, None)
+        return [(k, found[k]) for k in sorted(found, key=int)]
+
+    def _load_all(self):
+        if self._all:
+            return
+        for key, value in self._store.rows(self._table):
+            dict.setdefault(self, key, value)
+        self._all = True
+
+    def __len__(self):
+        self._load_all()
+        return dict.__len__(self)
+
+    def __iter__(self):
+        self._load_all()
+        return dict.__iter__(self)
+
+    def keys(self):
+        self._load_all()
+        return dict.keys(self)
+
+    def values(self):
+        self._load_all()
+        return dict.values(self)
+
+    def items(self):
+        self._load_all()
+        return dict.items(self)
+
+
+# =========================
+# STORE
+# =========================
+class SqliteStore:
+    def __init__(self, db_file):
+        self.db_file = db_file
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_file, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    # =========================
+    # READ
+    # =========================
+    def load(self):
+        state = {name: SqliteTable(self, name) for name in TABLES}
+        state["maintenance"] = self.get_maintenance()
+        return state
+
+    def get(self, table, key):
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT data FROM {TABLES[table]} WHERE id = ?", (str(key),)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def rows(self, table):
+        with self._lock:
+            rows = self._conn.execute(f"SELECT id, data FROM {TABLES[table]}").fetchall()
+        return [(k, json.loads(v)) for k, v in rows]
+
+    def select(self, table, user_id=None, status=None, limit=None):
+        """
+        Cari record lewat index user_id / status, urut created
+        """
+        sql = f"SELECT id, data FROM {TABLES[table]}"
+        where, args = [], []
+        if user_id is not None:
+            where.append("user_id = ?")
+            args.append(str(user_id))
+        if status is not None:
+            where.append("status = ?")
+            args.append(status)
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY created"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+
+        with self._lock:
+            rows = self._conn.execute(sql, args).fetchall()
+        return [(k, json.loads(v)) for k, v in rows]
+
+    def get_maintenance(self):
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM maintenance WHERE id = 1").fetchone()
+        return json.loads(row[0]) if row and row[0] else None
+
+    # =========================
+    # WRITE
+    # =========================
+    def append(self, records):
+        """
+        Tulis record (format journal) dalam satu transaksi
+        """
+        if not records:
+            return
+
+        with self._lock:
+            cur = self._conn.cursor()
+            cur.execute("BEGIN")
+            try:
+                for rec in records:
+                    self._write(cur, rec)
+                cur.execute("COMMIT")
+            except Exception:
+                cur.execute("ROLLBACK")
+                raise
+
+    def _write(self, cur, rec):
+        table = rec["t"]
+
+        if table == "maintenance":
+            cur.execute(
+                "INSERT OR REPLACE INTO maintenance (id, data) VALUES (1, ?)",
+                (json.dumps(rec.get("v")),)
+            )
+            return
+
+        name = TABLES[table]
+        if rec.get("d"):
+            cur.execute(f"DELETE FROM {name} WHERE id = ?", (rec["k"],))
+            return
+
+        value = rec["v"]
+        columns = ("id",) + COLUMNS[name] + ("data",)
+        cur.execute(
+            f"INSERT OR REPLACE INTO {name} ({', '.join(columns)}) "
+            f"VALUES ({', '.join('?' * len(columns))})",
+            (rec["k"], *_columns(name, value), json.dumps(value))
+        )
+
+    def compact(self):
+        with self._lock:
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# =========================
+# IMPORT DARI db.json
+# =========================
+def import_json(json_file, db_file):
+    """
+    Import sekali jalan dari db.json (+ journal kalau ada) ke SQLite
+    """
+    from journal import JournalStore
+    from config import DB_JOURNAL_FILE
+
+    state = JournalStore(json_file, DB_JOURNAL_FILE).load()
+
+    records = []
+    for table in TABLES:
+        for key, value in (state.get(table) or {}).items():
+            records.append({"t": table, "k": str(key), "v": value})
+    records.append({"t": "maintenance", "v": state.get("maintenance")})
+
+    store = SqliteStore(db_file)
+    store.append(records)
+    store.close()
+    return len(records) - 1
+
+
+if __name__ == "__main__":
+    from config import DB_FILE, DB_SQLITE_FILE
+
+    src = sys.argv[1] if len(sys.argv) > 1 else DB_FILE
+    dst = sys.argv[2] if len(sys.argv) > 2 else DB_SQLITE_FILE
+    count = import_json(src, dst)
+    print(f"✅ {count} record diimport dari {src} ke {dst}")
@@ -0,0 +1,172 @@
+import asyncio
+
+from web3 import Web3
+
+import payouts as payouts_module
+from nonce import BroadcastUnknown
+from payouts import PayoutBatcher
+
+DISPERSE = "0x" + "dd" * 20
+TOKEN = "0x7193c21Ca1960b92FdCc92CFb918F337C7bd165e"
+
+
+def wallet(i):
+    return Web3.to_checksum_address("0x" + f"{i:040x}")
+
+
+class FakeChain:
+    """
+    Ganti chain async: catat tx yang dikirim, tanpa RPC
+    """
+    def __init__(self, batch_error=None, approve_error=None, allowance=2 ** 256 - 1):
+        self.w3 = Web3()
+        self.batch_error = batch_error
+        self.approve_error = approve_error
+        self.allowance = allowance
+        self.calls = []     # (fn_name, args, value)
+        self.singles = []   # (to, amount)
+
+    async def send_call(self, make_call, gas, value=0, network=None, rpc=None):
+        fn = make_call(self.w3)
+        self.calls.append((fn.fn_name, fn.args, value))
+        if fn.fn_name.startswith("disperse") and self.batch_error:
+            raise self.batch_error
+        if fn.fn_name == "approve" and self.approve_error:
+            raise self.approve_error
+        return {"tx_hash": f"0xbatch{len(self.calls)}", "nonce": len(self.calls)}
+
+    async def send_token(self, token_address, to, amount, decimals, network=None, rpc=None):
+        self.singles.append((to, amount))
+        return {"tx_hash": f"0xsingle{len(self.singles)}", "nonce": 100 + len(self.singles)}
+
+    async def call(self, make_call, network=None, rpc=None):
+        return self.allowance
+
+
+def run(chain, coro_factory, monkeypatch):
+    monkeypatch.setattr(payouts_module, "chain", chain)
+
+    async def main():
+        batcher = PayoutBatcher({"BEP20": DISPERSE}, window=0.05, max_batch=3)
+        return batcher, await coro_factory(batcher)
+
+    return asyncio.run(main())
+
+
+def pay_many(n, network="BEP20", token=TOKEN, amount_rp=10_000):
+    async def factory(batcher):
+        return await asyncio.gather(*(
+            batcher.pay(token, wallet(i + 1), i + 1, 18, network, ref=f"buy:{i}", amount_rp=amount_rp)
+            for i in range(n)
+        ))
+    return factory
+
+
+# =========================
+# BATCH FLUSH
+# =========================
+def test_batch_penuh_jadi_satu_tx_disperse(monkeypatch):
+    chain = FakeChain()
+    batcher, results = run(chain, pay_many(3), monkeypatch)
+
+    disperse = [c for c in chain.calls if c[0] == "disperseToken"]
+    assert len(disperse) == 1
+    _, (token, recipients, values), _ = disperse[0]
+    assert token == TOKEN
+    assert recipients == [wallet(1), wallet(2), wallet(3)]
+    assert values == [1 * 10 ** 18, 2 * 10 ** 18, 3 * 10 ** 18]
+
+    assert {r["tx_hash"] for r in results} == {"0xbatch1"}
+    assert all(r["batched"] for r in results)
+    assert chain.singles == []
+    assert batcher.recent[-1]["items"][0] == ("buy:0", wallet(1), 1)
+
+
+def test_batch_native_kirim_value_total(monkeypatch):
+    chain = FakeChain()
+    _, results = run(chain, pay_many(2, token=None), monkeypatch)
+
+    name, (recipients, values), value = chain.calls[0]
+    assert name == "disperseEther"
+    assert value == sum(values) == 3 * 10 ** 18
+    assert [r["index"] for r in results] == [0, 1]
+
+
+# =========================
+# INDEX PER PENERIMA
+# =========================
+def test_index_menunjuk_penerima_yang_benar(monkeypatch):
+    chain = FakeChain()
+
+    async def factory(batcher):
+        # wallet tidak berurutan, index harus tetap menunjuk penerimanya
+        tasks = [
+            asyncio.ensure_future(batcher.pay(TOKEN, wallet(i), i, 18, "BEP20", amount_rp=10_000))
+            for i in (7, 3, 9, 5)
+        ]
+        return await asyncio.gather(*tasks)
+
+    _, results = run(chain, factory, monkeypatch)
+
+    recipients = next(args[1] for name, args, _ in chain.calls if name == "disperseToken")
+
+    # max_batch 3 → [7, 3, 9] penuh, [5] sendiri via transfer biasa
+    for i, r in zip((7, 3, 9, 5), results):
+        if r["batched"]:
+            assert recipients[r["index"]] == wallet(i)
+        else:
+            assert chain.singles[0] == (wallet(i), i)
+            assert r["index"] == 0
+
+
+# =========================
+# FALLBACK
+# =========================
+def test_batch_gagal_dikirim_satu_per_satu(monkeypatch):
+    chain = FakeChain(batch_error=Exception("revert"))
+    batcher, results = run(chain, pay_many(3), monkeypatch)
+
+    assert chain.singles == [(wallet(1), 1), (wallet(2), 2), (wallet(3), 3)]
+    assert [r["tx_hash"] for r in results] == ["0xsingle1", "0xsingle2", "0xsingle3"]
+    assert not any(r["batched"] for r in results)
+    assert batcher.recent == []
+
+
+def test_batch_tidak_pasti_terkirim_tidak_dikirim_ulang(monkeypatch):
+    chain = FakeChain(batch_error=BroadcastUnknown("0xbatchtimeout", 12, TimeoutError()))
+
+    async def factory(batcher):
+        return await asyncio.gather(*(
+            batcher.pay(TOKEN, wallet(i + 1), i + 1, 18, "BEP20", amount_rp=10_000)
+            for i in range(3)
+        ), return_exceptions=True)
+
+    _, results = run(chain, factory, monkeypatch)
+
+    assert chain.singles == []
+    assert all(isinstance(r, BroadcastUnknown) for r in results)
+    assert {r.tx_hash for r in results} == {"0xbatchtimeout"}
+    assert all(r.batched and r.nonce == 12 for r in results)
+    assert [r.index for r in results] == [0, 1, 2]
+
+
+def test_approve_tidak_pasti_tetap_fallback_satu_per_satu(monkeypatch):
+    chain = FakeChain(approve_error=BroadcastUnknown("0xapprove", 3, TimeoutError()), allowance=0)
+    _, results = run(chain, pay_many(2), monkeypatch)
+
+    assert not any(c[0].startswith("disperse") for c in chain.calls)
+    assert [r["tx_hash"] for r in results] == ["0xsingle1", "0xsingle2"]
+
+
+def test_order_besar_dan_network_tanpa_kontrak_langsung_transfer(monkeypatch):
+    chain = FakeChain()
+
+    async def factory(batcher):
+        big = await batcher.pay(TOKEN, wallet(1), 1, 18, "BEP20", amount_rp=payouts_module.PAYOUT_DIRECT_MIN_RP)
+        arb = await batcher.pay(None, wallet(2), 1, 18, "ARB", amount_rp=10_000)
+        return big, arb
+
+    _, (big, arb) = run(chain, factory, monkeypatch)
+    assert not big["batched"] and not arb["batched"]
+    assert chain.calls == []
+    assert len(chain.singles) == 2
@@ -0,0 +1,113 @@
+import asyncio
+import time
+
+import pytest
+
+from price_sources import PriceAggregator, PriceSource
+
+
+class FakeSource(PriceSource):
+    def __init__(self, name, prices=None, delay=0.0, error=None):
+        self.name = name
+        self.prices = prices or {}
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+        self.cancelled = False
+
+    async def fetch(self, symbols):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if self.error:
+            raise self.error
+        return {s: self.prices[s] for s in symbols if s in self.prices}
+
+
+def aggregate(sources, symbols=("USDT",), quorum=2, hedge_delay=0.05, timeout=0.5, outlier_pct=3):
+    agg = PriceAggregator(list(sources), quorum, hedge_delay, timeout, outlier_pct)
+    return asyncio.run(agg.fetch(list(symbols)))
+
+
+# =========================
+# OUTLIER
+# =========================
+def test_outlier_dibuang_dan_median_dari_yang_sepakat():
+    sources = [
+        FakeSource("a", {"USDT": 16000}),
+        FakeSource("b", {"USDT": 24000}),   # feed rusak
+        FakeSource("c", {"USDT": 16100}),
+    ]
+    assert aggregate(sources) == {"USDT": 16050}
+
+
+def test_sumber_cadangan_ditanya_kalau_dua_teratas_tidak_sepakat():
+    backup = FakeSource("c", {"USDT": 16020})
+    sources = [FakeSource("a", {"USDT": 16000}), FakeSource("b", {"USDT": 9000}), backup]
+    assert aggregate(sources) == {"USDT": 16010}
+    assert backup.calls == 1
+
+
+# =========================
+# QUORUM MISS (FAIL CLOSED)
+# =========================
+def test_satu_sumber_saja_tidak_cukup():
+    sources = [FakeSource("a", {"USDT": 16000}), FakeSource("b", error=Exception("down"))]
+    with pytest.raises(Exception):
+        aggregate(sources)
+
+
+def test_tidak_sepakat_tanpa_cadangan_gagal():
+    sources = [FakeSource("a", {"USDT": 16000}), FakeSource("b", {"USDT": 20000})]
+    with pytest.raises(Exception):
+        aggregate(sources)
+
+
+def test_symbol_tanpa_quorum_tidak_diberi_harga():
+    sources = [
+        FakeSource("a", {"USDT": 16000, "ETH": 50_000_000}),
+        FakeSource("b", {"USDT": 16010}),
+        FakeSource("c", {"USDT": 16005}),
+    ]
+    assert aggregate(sources, symbols=("USDT", "ETH")) == {"USDT": 16005}
+
+
+def test_sumber_kurang_dari_quorum_tidak_diturunkan():
+    with pytest.raises(Exception):
+        aggregate([FakeSource("a", {"USDT": 16000})], quorum=2)
+
+
+# =========================
+# HEDGE + TIMEOUT
+# =========================
+def test_sumber_lambat_di_hedge_ke_cadangan():
+    slow = FakeSource("lambat", {"USDT": 16000}, delay=5)
+    sources = [FakeSource("a", {"USDT": 16000}), slow, FakeSource("c", {"USDT": 16020})]
+
+    start = time.monotonic()
+    assert aggregate(sources, timeout=2) == {"USDT": 16010}
+    assert time.monotonic() - start < 1
+    assert slow.cancelled
+
+
+def test_timeout_semua_sumber_lambat():
+    sources = [FakeSource(n, {"USDT": 16000}, delay=5) for n in "abc"]
+
+    start = time.monotonic()
+    with pytest.raises(Exception):
+        aggregate(sources, timeout=0.3)
+    assert time.monotonic() - start < 1
+    assert all(s.cancelled for s in sources)
+
+
+def test_timeout_hanya_jawaban_quorum_yang_dipakai():
+    sources = [
+        FakeSource("a", {"USDT": 16000}),
+        FakeSource("b", {"USDT": 16000}, delay=5),
+        FakeSource("c", {"USDT": 16000}, delay=5),
+    ]
+    with pytest.raises(Exception):
+        aggregate(sources, timeout=0.3)
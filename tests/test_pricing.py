@@ -0,0 +1,52 @@
+import asyncio
+import time
+
+import pytest
+
+import pricing
+from pricing import PriceCache, PriceUnavailable, get_trade_price
+
+
+def cache_with(prices, age=0.0, background=True):
+    async def fetch(symbols):
+        return {}
+
+    cache = PriceCache(lambda symbols: {}, fetch, ttl=30, max_stale=300, stale_after=120)
+    cache.background = background
+    fetched_at = time.monotonic() - age
+    cache._entries = {s: (p, fetched_at) for s, p in prices.items()}
+    return cache
+
+
+def trade_price(monkeypatch, cache, symbol):
+    monkeypatch.setattr(pricing, "price_cache", cache)
+    monkeypatch.setattr(pricing, "PRICE_USE_TWAP", False)
+
+    async def realtime(symbols):
+        return (await cache.get_async([symbols]))[symbols]
+
+    monkeypatch.setattr(pricing, "get_realtime_price_async", realtime)
+    return asyncio.run(get_trade_price(symbol))
+
+
+# =========================
+# FAIL CLOSED
+# =========================
+def test_harga_segar_dipakai(monkeypatch):
+    assert trade_price(monkeypatch, cache_with({"ETH": 50_000_000}), "ETH") == 50_000_000
+
+
+def test_harga_basi_ditolak_bukan_harga_cadangan(monkeypatch):
+    cache = cache_with({"USDT": 16_100}, age=600)
+    with pytest.raises(PriceUnavailable):
+        trade_price(monkeypatch, cache, "USDT")
+
+
+def test_harga_tidak_ada_ditolak(monkeypatch):
+    with pytest.raises(PriceUnavailable):
+        trade_price(monkeypatch, cache_with({}), "ETH")
+
+
+def test_harga_nol_ditolak(monkeypatch):
+    with pytest.raises(PriceUnavailable):
+        trade_price(monkeypatch, cache_with({"ETH": 0}), "ETH")
@@ -2,9 +2,11 @@ from maintenance import check_maintenance
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 from datetime import datetime
-from config import PAYMENT_METHODS, ADMIN_IDS, TRANSACTION_CHANNEL_ID, MIN_TOPUP_RP, get_realtime_price
-from database import load_db, save_db
+from config import PAYMENT_METHODS, ADMIN_IDS, TRANSACTION_CHANNEL_ID, MIN_TOPUP_RP, get_realtime_price_async
+from database import load_db, save_db, get_user, add_balance, create_topup, set_status
+from pricing import price_note
 from states import TOPUP_AMOUNT, TOPUP_METHOD, TOPUP_NAME, TOPUP_PROOF
+from locks import per_key
 
 # =========================
 # /topup COMMAND
@@ -18,8 +20,9 @@ async def topup(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     # Tampilkan harga realtime token sebagai referensi
     try:
-        rates = get_realtime_price()  # dict: {"BTC": 500000000, "ETH": 30000000}
+        rates = await get_realtime_price_async()  # dict: {"BTC": 500000000, "ETH": 30000000}
         rate_text = "\n".join([f"{t}: Rp {int(rates[t]):,}" for t in rates])
+        rate_text += price_note()
     except Exception as e:
         rate_text = "⚠️ Gagal fetch harga realtime"
 
@@ -77,11 +80,12 @@ async def input_topup(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
         # Estimasi token dari harga realtime
         try:
-            rates = get_realtime_price()
+            rates = await get_realtime_price_async()
             rate_text = "\n".join([
                 f"{t}: {amount / rates[t]:.6f} {t}"
                 for t in rates
             ])
+            rate_text += price_note()
         except Exception:
             rate_text = "⚠️ Gagal fetch harga realtime"
 
@@ -130,17 +134,11 @@ async def input_topup(update: Update, context: ContextTypes.DEFAULT_TYPE):
         sender_name = context.user_data["sender_name"]
 
         # simpan pending topup
-        db.setdefault("topups", {})
-        topup_id = str(len(db["topups"]) + 1)
-        db["topups"][topup_id] = {
-            "user_id": uid,
-            "amount": amount,
-            "method": method,
-            "sender_name": sender_name,
-            "bukti": file_id,
-            "status": "pending",
-            "created": datetime.now().isoformat()
-        }
+        topup_id = create_topup(
+            db, uid, amount, method,
+            sender_name=sender_name,
+            bukti=file_id
+        )
         save_db(db)
 
         # tombol admin approve/reject
@@ -194,6 +192,19 @@ async def pay_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
 # =========================
 # ADMIN APPROVE / REJECT CALLBACK
 # =========================
+def _topup_owner(update, context):
+    """
+    Key lock = user pemilik topup (saldo dia yang bertambah)
+    """
+    try:
+        topup_id = update.callback_query.data.split("|")[2]
+    except (AttributeError, IndexError):
+        return None
+    topup = load_db().get("topups", {}).get(topup_id)
+    return topup["user_id"] if topup else None
+
+
+@per_key(_topup_owner)
 async def topup_admin_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     q = update.callback_query
     await q.answer()
@@ -236,11 +247,7 @@ async def topup_admin_callback(update: Update, context: ContextTypes.DEFAULT_TYP
         return
 
     # pastikan user ada di DB
-    db.setdefault("users", {})
-    user = db["users"].get(uid)
-    if not user:
-        db["users"][uid] = {"balance": 0, "wallet": None}
-        user = db["users"][uid]
+    get_user(db, uid)
 
     time_now = datetime.now().isoformat()
 
@@ -248,10 +255,8 @@ async def topup_admin_callback(update: Update, context: ContextTypes.DEFAULT_TYP
     # PROSES APPROVE / REJECT
     # -------------------------
     if action == "approve":
-        user["balance"] += amount
-        topup["status"] = "approved"
-        topup["approved_by"] = admin_uid
-        topup["approved_at"] = time_now
+        add_balance(db, uid, amount, reason="topup", ref=f"topup:{topup_id}")
+        set_status(db, "topups", topup_id, "approved", approved_by=admin_uid, approved_at=time_now)
 
         await context.bot.send_message(
             uid,
@@ -266,9 +271,7 @@ async def topup_admin_callback(update: Update, context: ContextTypes.DEFAULT_TYP
             f"💳 Metode: {method}"
         )
     else:  # reject
-        topup["status"] = "rejected"
-        topup["rejected_by"] = admin_uid
-        topup["rejected_at"] = time_now
+        set_status(db, "topups", topup_id, "rejected", rejected_by=admin_uid, rejected_at=time_now)
 
         await context.bot.send_message(
             uid,
@@ -0,0 +1,100 @@
+import asyncio
+from web3 import Web3
+from config import BOT_WALLET, TOKEN_CONTRACTS, MULTICALL3_CONTRACTS
+from liquidity import liquidity
+
+# =========================
+# TREASURY SNAPSHOT (MULTICALL3)
+# =========================
+# Semua saldo hot wallet di 1 network dibaca dengan 1 eth_call ke
+# Multicall3.aggregate3: balanceOf untuk ERC20, getEthBalance untuk native.
+# Network di-query bersamaan. Jumlah RPC = jumlah network, tidak bertambah
+# walau token di TOKEN_CONTRACTS bertambah. Hasilnya juga mengisi cache
+# liquidity (cek likuiditas buy).
+
+MULTICALL3_ABI = [
+    {
+        "name": "aggregate3",
+        "type": "function",
+        "stateMutability": "payable",
+        "inputs": [{
+            "name": "calls",
+            "type": "tuple[]",
+            "components": [
+                {"name": "target", "type": "address"},
+                {"name": "allowFailure", "type": "bool"},
+                {"name": "callData", "type": "bytes"}
+            ]
+        }],
+        "outputs": [{
+            "name": "returnData",
+            "type": "tuple[]",
+            "components": [
+                {"name": "success", "type": "bool"},
+                {"name": "returnData", "type": "bytes"}
+            ]
+        }]
+    }
+]
+
+SELECTOR_BALANCE_OF = bytes.fromhex("70a08231")     # balanceOf(address)
+SELECTOR_GET_ETH_BALANCE = bytes.fromhex("4d2301cc")  # getEthBalance(address)
+
+
+def _networks():
+    """
+    {network: [(token, address, decimals), ...]} dari TOKEN_CONTRACTS
+    """
+    result = {}
+    for token, networks in TOKEN_CONTRACTS.items():
+        for network, data in networks.items():
+            result.setdefault(network, []).append((token, data["address"], data["decimals"]))
+    return result
+
+
+async def snapshot_network(network):
+    """
+    1 eth_call → {token: saldo} untuk semua token di network ini
+    """
+    from chain import chain
+
+    multicall = Web3.to_checksum_address(MULTICALL3_CONTRACTS.get(network) or MULTICALL3_CONTRACTS["default"])
+    owner = bytes.fromhex(BOT_WALLET[2:].lower()).rjust(32, b"\0")
+    tokens = _networks().get(network, [])
+
+    calls = []
+    for _, address, _ in tokens:
+        if address is None:
+            calls.append((multicall, True, SELECTOR_GET_ETH_BALANCE + owner))
+        else:
+            calls.append((Web3.to_checksum_address(address), True, SELECTOR_BALANCE_OF + owner))
+
+    results = await chain.call(
+        lambda w3: w3.eth.contract(address=multicall, abi=MULTICALL3_ABI).functions.aggregate3(calls),
+        network=network
+    )
+
+    balances = {}
+    for (token, _, decimals), (success, data) in zip(tokens, results):
+        if not success or len(data) < 32:
+            balances[token] = None
+            continue
+        balances[token] = int.from_bytes(data[:32], "big") / (10 ** decimals)
+        liquidity.set_balance(network, token, balances[token])
+    return balances
+
+
+async def snapshot():
+    """
+    Semua network bersamaan. Return {network: {token: saldo}} dan {network: error}
+    """
+    networks = list(_networks())
+    results = await asyncio.gather(*(snapshot_network(n) for n in networks), return_exceptions=True)
+
+    balances, errors = {}, {}
+    for network, result in zip(networks, results):
+        if isinstance(result, Exception):
+            errors[network] = result
+        else:
+            balances[network] = result
+    return balances, errors
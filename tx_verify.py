@@ -0,0 +1,126 @@
+from dataclasses import dataclass
+from web3 import Web3
+from wallet import rpc_batch
+
+# =========================
+# VERIFIKASI TX SELL (BATCH RPC)
+# =========================
+# eth_getTransactionByHash + eth_getTransactionReceipt dikirim dalam
+# 1 batch JSON-RPC (1 round-trip). Hasil RPC dibaca mentah (hex string),
+# log dicocokkan langsung ke topic Transfer + alamat yang sudah dinormalisasi
+# sekali di awal, tanpa decode / checksum per log.
+
+TRANSFER_TOPIC = "0x" + Web3.keccak(text="Transfer(address,address,uint256)").hex().removeprefix("0x")
+
+
+@dataclass
+class VerifyResult:
+    ok: bool
+    reason: str = ""
+    amount_raw: int = 0        # satuan terkecil (wei)
+    amount: float = 0.0        # satuan token
+    block_number: int = None
+    logs_scanned: int = 0
+
+
+def _addr(address):
+    """
+    "0xAbC..." → "abc..." (40 hex lowercase)
+    """
+    return address.lower().removeprefix("0x")
+
+
+def _fail(reason):
+    return VerifyResult(ok=False, reason=reason)
+
+
+def verify_transfer(tx_hash, token_address, bot_wallet, sender_wallet, decimals, network=None, rpc=None):
+    """
+    Cek TX transfer dari sender_wallet ke bot_wallet.
+    token_address None = native coin (ETH / BNB).
+    """
+    tx, receipt = rpc_batch(_calls(tx_hash), network, rpc)
+    return check_transfer(tx, receipt, token_address, bot_wallet, sender_wallet, decimals)
+
+
+async def verify_transfer_async(tx_hash, token_address, bot_wallet, sender_wallet, decimals, network=None):
+    """
+    Versi async (chain.AsyncChain), tidak mem-block event loop
+    """
+    from chain import chain
+
+    tx, receipt = await chain.batch(_calls(tx_hash), network)
+    return check_transfer(tx, receipt, token_address, bot_wallet, sender_wallet, decimals)
+
+
+def _calls(tx_hash):
+    return [
+        ("eth_getTransactionByHash", [tx_hash]),
+        ("eth_getTransactionReceipt", [tx_hash]),
+    ]
+
+
+def check_transfer(tx, receipt, token_address, bot_wallet, sender_wallet, decimals):
+    """
+    Cocokkan tx + receipt mentah (JSON-RPC) dengan transfer yang diharapkan
+    """
+    if not tx:
+        return _fail("TX tidak ditemukan")
+
+    if not receipt or int(receipt.get("status") or "0x0", 16) != 1:
+        return _fail("TX gagal atau belum confirmed")
+
+    sender = _addr(sender_wallet)
+    bot = _addr(bot_wallet)
+    block_number = int(receipt["blockNumber"], 16)
+
+    # =========================
+    # NATIVE COIN (ETH / BNB)
+    # =========================
+    if token_address is None:
+        if not tx.get("to"):
+            return _fail("TX contract creation tidak valid")
+
+        if _addr(tx["from"]) != sender:
+            return _fail("Pengirim TX tidak sesuai")
+
+        if _addr(tx["to"]) != bot:
+            return _fail("TX bukan ke wallet bot")
+
+        value = int(tx["value"], 16)
+        return VerifyResult(
+            ok=True,
+            amount_raw=value,
+            amount=value / 10 ** 18,
+            block_number=block_number
+        )
+
+    # =========================
+    # ERC20 TOKEN
+    # =========================
+    token = "0x" + _addr(token_address)
+    # topic address = 32 byte, 12 byte awal nol → cukup bandingkan 40 hex terakhir
+    total = 0
+    logs = receipt.get("logs") or []
+
+    for log in logs:
+        topics = log.get("topics") or []
+        if len(topics) < 3 or topics[0].lower() != TRANSFER_TOPIC:
+            continue
+        if log["address"].lower() != token:
+            continue
+        if topics[1][-40:].lower() != sender or topics[2][-40:].lower() != bot:
+            continue
+
+        total += int(log["data"], 16) if log["data"] not in ("0x", "") else 0
+
+    if total == 0:
+        return VerifyResult(ok=False, reason="Transfer valid tidak ditemukan", logs_scanned=len(logs))
+
+    return VerifyResult(
+        ok=True,
+        amount_raw=total,
+        amount=total / 10 ** decimals,
+        block_number=block_number,
+        logs_scanned=len(logs)
+    )
@@ -1,6 +1,11 @@
+import weakref
+from functools import lru_cache
+from eth_account import Account
 from web3 import Web3
 from config import BOT_PRIVATE_KEY, BOT_WALLET, RPC_BY_NETWORK, BSC_RPC
-from web3.middleware import geth_poa_middleware
+from rpc_pool import web3_pool
+from nonce import nonces, is_nonce_error, is_rejected, BroadcastUnknown
+from fee_oracle import fee_oracle
 
 ERC20_ABI = [
     {
@@ -25,63 +30,98 @@ ERC20_ABI = [
 # =========================
 # RPC RESOLVER (AMAN)
 # =========================
-def get_w3(network=None, rpc=None):
+def resolve_rpc(network=None, rpc=None):
+    """
+    Return (url, network) RPC yang dipakai
+    """
     if rpc:
-        w3 = Web3(Web3.HTTPProvider(rpc))
-    elif network and network in RPC_BY_NETWORK:
-        w3 = Web3(Web3.HTTPProvider(RPC_BY_NETWORK[network]))
-    else:
-        w3 = Web3(Web3.HTTPProvider(BSC_RPC))
+        return rpc, None
+    if network and RPC_BY_NETWORK.get(network):
+        return RPC_BY_NETWORK[network], network
+    return BSC_RPC, "BEP20"
+
+
+def get_w3(network=None, rpc=None):
+    """
+    Web3 client dari pool (dipakai ulang, koneksi tetap hangat)
+    """
+    return web3_pool.get(*resolve_rpc(network, rpc))
 
-    # ✅ FIX UNTUK BSC / POA CHAIN
-    w3.middleware_onion.inject(geth_poa_middleware, layer=0)
-    return w3
+
+def rpc_batch(calls, network=None, rpc=None):
+    """
+    Beberapa call JSON-RPC dalam 1 round-trip (lihat Web3Pool.batch)
+    """
+    url, network = resolve_rpc(network, rpc)
+    return web3_pool.batch(url, calls, network)
 
 # =========================
-# SEND TOKEN / NATIVE
+# SIGNER + CACHE (ENGINE TX)
 # =========================
-def send_token(
-    token_address,
-    to,
-    amount,
-    decimals,
-    network=None,
-    rpc=None
-):
-    w3 = get_w3(network, rpc)
+# Dipakai wallet.send_token (sync), chain.AsyncChain (async) dan
+# send_token.py, jadi hanya ada 1 cara membangun + menandatangani tx:
+#   - LocalAccount dibuat sekali dari BOT_PRIVATE_KEY (bukan parse key tiap kirim)
+#   - checksum alamat di-cache (alamat token tetap, penerima sering berulang)
+#   - calldata transfer ERC20 = selector a9059cbb + to + value, tanpa ABI
+#     encoder / build_transaction (tidak ada estimate / call tambahan)
+#   - handle kontrak ERC20 (balanceOf) di-cache per client web3
+# Per payout tinggal: nonce + fee dari cache → sign → send_raw_transaction.
 
-    nonce = w3.eth.get_transaction_count(BOT_WALLET)
-    chain_id = w3.eth.chain_id
+TRANSFER_SELECTOR = bytes.fromhex("a9059cbb")   # transfer(address,uint256)
+GAS_NATIVE = 60000
+GAS_ERC20 = 120000
+
+_account = None
+_contracts = weakref.WeakKeyDictionary()   # w3 → {alamat token: contract}
+
+
+def get_account():
+    global _account
+    if _account is None:
+        _account = Account.from_key(BOT_PRIVATE_KEY)
+    return _account
 
-    # =========================
-    # GAS STRATEGY AUTO
-    # =========================
-    latest_block = w3.eth.get_block("latest")
-    base_fee = latest_block.get("baseFeePerGas")
-
-    if base_fee:
-        max_priority = w3.to_wei(2, "gwei")
-        max_fee = base_fee + max_priority
-        gas_params = {
-            "type": 2,
-            "maxFeePerGas": max_fee,
-            "maxPriorityFeePerGas": max_priority
-        }
-    else:
-        gas_params = {
-            "gasPrice": w3.eth.gas_price
-        }
 
+@lru_cache(maxsize=4096)
+def checksum(address):
+    return Web3.to_checksum_address(address)
+
+
+def token_contract(w3, token_address):
+    """
+    Handle kontrak ERC20 per client (Web3 / AsyncWeb3), dibuat sekali
+    """
+    by_token = _contracts.setdefault(w3, {})
+    contract = by_token.get(token_address)
+    if contract is None:
+        contract = by_token[token_address] = w3.eth.contract(address=checksum(token_address), abi=ERC20_ABI)
+    return contract
+
+
+def transfer_calldata(to, value):
+    """
+    ABI transfer(address,uint256) tanpa encoder: selector + 2 word 32 byte
+    """
+    return "0x" + (
+        TRANSFER_SELECTOR
+        + bytes.fromhex(checksum(to)[2:]).rjust(32, b"\0")
+        + int(value).to_bytes(32, "big")
+    ).hex()
+
+
+def build_transfer(token_address, to, amount, decimals, nonce, chain_id, gas_params):
+    """
+    Tx dict transfer native / ERC20, siap ditandatangani
+    """
     # =========================
     # NATIVE COIN
     # =========================
     if token_address is None:
-        tx = {
-            "from": BOT_WALLET,
-            "to": Web3.to_checksum_address(to),
-            "value": w3.to_wei(amount, "ether"),
+        return {
+            "to": checksum(to),
+            "value": Web3.to_wei(amount, "ether"),
             "nonce": nonce,
-            "gas": 60000,
+            "gas": GAS_NATIVE,
             "chainId": chain_id,
             **gas_params
         }
@@ -89,25 +129,87 @@ def send_token(
     # =========================
     # ERC20
     # =========================
-    else:
-        contract = w3.eth.contract(
-            address=Web3.to_checksum_address(token_address),
-            abi=ERC20_ABI
-        )
-        tx = contract.functions.transfer(
-            Web3.to_checksum_address(to),
-            int(amount * (10 ** decimals))
-        ).build_transaction({
-            "from": BOT_WALLET,
-            "nonce": nonce,
-            "gas": 120000,
-            "chainId": chain_id,
-            **gas_params
-        })
+    return {
+        "to": checksum(token_address),
+        "value": 0,
+        "data": transfer_calldata(to, int(amount * (10 ** decimals))),
+        "nonce": nonce,
+        "gas": GAS_ERC20,
+        "chainId": chain_id,
+        **gas_params
+    }
+
+
+def sign(tx):
+    """
+    Tandatangani dengan LocalAccount cache → raw tx (bytes)
+    """
+    return get_account().sign_transaction(tx).raw_transaction
+
+
+def warm_up():
+    """
+    Dipanggil saat start: account, checksum token dan handle kontrak
+    sudah siap sebelum payout pertama
+    """
+    from config import TOKEN_CONTRACTS
+
+    get_account()
+    for networks in TOKEN_CONTRACTS.values():
+        for network, data in networks.items():
+            if data["address"] and RPC_BY_NETWORK.get(network):
+                token_contract(get_w3(network), data["address"])
+
+
+# =========================
+# SEND TOKEN / NATIVE
+# =========================
+def send_token(
+    token_address,
+    to,
+    amount,
+    decimals,
+    network=None,
+    rpc=None
+):
+    w3 = get_w3(network, rpc)
+
+    nonce = nonces.allocate(w3)
+    try:
+        raw = _sign_transfer(w3, nonce, token_address, to, amount, decimals)
+    except Exception:
+        # belum dikirim sama sekali → nonce dipakai kirim berikutnya
+        nonces.release(w3, nonce)
+        raise
+
+    tx_hash = Web3.to_hex(Web3.keccak(raw))
+    try:
+        w3.eth.send_raw_transaction(raw)
+    except Exception as e:
+        if is_nonce_error(e):
+            nonces.resync(w3)
+            raise
+        if is_rejected(e):
+            # ditolak node → tidak masuk mempool
+            nonces.release(w3, nonce)
+            raise
+        # timeout / koneksi putus: tx mungkin sudah tersiar (lihat nonce.py)
+        try:
+            nonces.resync(w3)
+        except Exception:
+            nonces.forget(w3)
+        raise BroadcastUnknown(tx_hash, nonce, e) from e
+
+    return tx_hash
+
+
+def _sign_transfer(w3, nonce, token_address, to, amount, decimals):
+    # chain_id + gas dari cache fee_oracle (tanpa request per kirim)
+    chain_id = fee_oracle.chain_id(w3)
+    gas_params = fee_oracle.params(w3)
 
-    signed = w3.eth.account.sign_transaction(tx, BOT_PRIVATE_KEY)
-    tx_hash = w3.eth.send_raw_transaction(signed.raw_transaction)
-    return w3.to_hex(tx_hash)
+    tx = build_transfer(token_address, to, amount, decimals, nonce, chain_id, gas_params)
+    return sign(tx)
 
 
 # =========================
@@ -133,11 +235,5 @@ def get_hot_wallet_token_balance(
     # =========================
     # ERC20
     # =========================
-    contract = w3.eth.contract(
-        address=Web3.to_checksum_address(token_address),
-        abi=ERC20_ABI
-    )
-    raw = contract.functions.balanceOf(
-        Web3.to_checksum_address(BOT_WALLET)
-    ).call()
+    raw = token_contract(w3, token_address).functions.balanceOf(checksum(BOT_WALLET)).call()
     return raw / (10 ** decimals)
@@ -1,10 +1,12 @@
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 from datetime import datetime
-from config import ADMIN_IDS, WITHDRAW_METHODS, TRANSACTION_CHANNEL_ID, MIN_WITHDRAW_RP, get_realtime_price
+from config import ADMIN_IDS, WITHDRAW_METHODS, TRANSACTION_CHANNEL_ID, MIN_WITHDRAW_RP, get_realtime_price_async
+from pricing import price_note
 from states import WD_METHOD, WD_TARGET, WD_NAME, WD_AMOUNT
-from database import load_db, save_db, get_user, create_withdraw
+from database import load_db, save_db, get_user, deduct_balance, create_withdraw, set_status
 from maintenance import check_maintenance
+from locks import per_user, per_key
 
 # =========================
 # STEP 1 – START WITHDRAW
@@ -22,8 +24,9 @@ async def withdraw_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     reply_markup = InlineKeyboardMarkup(keyboard)
 
     try:
-        rates = get_realtime_price()
+        rates = await get_realtime_price_async()
         rate_text = "\n".join([f"{t}: Rp {int(rates[t]):,}" for t in rates])
+        rate_text += price_note()
     except Exception:
         rate_text = "⚠️ Gagal fetch harga realtime"
 
@@ -78,6 +81,7 @@ async def withdraw_name(update: Update, context: ContextTypes.DEFAULT_TYPE):
 # =========================
 # STEP 5 – AMOUNT & SUBMIT
 # =========================
+@per_user
 async def withdraw_amount(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if context.user_data.get("state") != WD_AMOUNT:
         return
@@ -112,8 +116,9 @@ async def withdraw_amount(update: Update, context: ContextTypes.DEFAULT_TYPE):
     name = context.user_data["name"]
 
     try:
-        rates = get_realtime_price()
+        rates = await get_realtime_price_async()
         token_estimate_text = "\n".join([f"{t}: {amount / rates[t]:.6f} {t}" for t in rates])
+        token_estimate_text += price_note()
     except Exception:
         token_estimate_text = "⚠️ Gagal fetch harga realtime"
 
@@ -149,6 +154,19 @@ async def withdraw_amount(update: Update, context: ContextTypes.DEFAULT_TYPE):
   # =========================
 # ADMIN APPROVE / REJECT
 # =========================
+def _withdraw_owner(update, context):
+    """
+    Key lock = user pemilik withdraw (saldo dia yang berubah)
+    """
+    try:
+        withdraw_id = update.callback_query.data.split("|")[2]
+    except (AttributeError, IndexError):
+        return None
+    wd = load_db().get("withdraws", {}).get(withdraw_id)
+    return wd["user_id"] if wd else None
+
+
+@per_key(_withdraw_owner)
 async def withdraw_admin(update: Update, context: ContextTypes.DEFAULT_TYPE):
     q = update.callback_query
     await q.answer()
@@ -180,10 +198,7 @@ async def withdraw_admin(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await q.edit_message_text("⚠️ Withdraw sudah diproses", reply_markup=None)
         return
 
-    user = db.get("users", {}).get(uid)
-    if not user:
-        db["users"][uid] = {"balance": 0, "wallet": None}
-        user = db["users"][uid]
+    user = get_user(db, uid)
 
     time_now = datetime.now().isoformat()
 
@@ -192,10 +207,8 @@ async def withdraw_admin(update: Update, context: ContextTypes.DEFAULT_TYPE):
             await q.answer("❌ Saldo user tidak cukup", show_alert=True)
             return
 
-        user["balance"] -= amount
-        wd["status"] = "approved"
-        wd["approved_by"] = admin_uid
-        wd["approved_at"] = time_now
+        deduct_balance(db, uid, amount, reason="withdraw", ref=f"withdraw:{withdraw_id}")
+        set_status(db, "withdraws", withdraw_id, "approved", approved_by=admin_uid, approved_at=time_now)
 
         await context.bot.send_message(uid, f"✅ Withdraw Rp {amount:,} telah disetujui oleh admin.")
 
@@ -204,9 +217,7 @@ async def withdraw_admin(update: Update, context: ContextTypes.DEFAULT_TYPE):
             f"Metode: {method}\nRekening: {target}\nPenerima: {name}"
         )
     else:  # reject
-        wd["status"] = "rejected"
-        wd["rejected_by"] = admin_uid
-        wd["rejected_at"] = time_now
+        set_status(db, "withdraws", withdraw_id, "rejected", rejected_by=admin_uid, rejected_at=time_now)
 
         await context.bot.send_message(uid, f"❌ Withdraw Rp {amount:,} ditolak admin.")
 